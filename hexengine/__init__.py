@@ -0,0 +1,40 @@
+"""GUI-free hex pattern engine shared by main.py, main2.py and the command line tools
+
+Names are imported from their submodules on first access (PEP 562), so
+`from hexengine import HexLayout` loads only the layout module and scripts and
+worker processes start without paying for the backends or NumPy.
+"""
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "HexLayout": "layout", "HexBuffer": "layout",
+    "ReplacementTemplate": "templates",
+    "PatternTemplate": "patterns",
+    "PatternMatch": "rules", "SimplePatternRule": "rules", "pattern_to_regex": "rules", "iter_matches": "rules",
+    "count_matches": "rules", "first_n": "rules", "load_rules_file": "rules", "load_location_rules_file": "rules",
+    "MatchTable": "table", "MatchView": "table", "LocationSpans": "table",
+    "BACKENDS": "backends", "MatchBackend": "backends", "NumpyPatternMatcher": "backends",
+    "select_backend": "backends", "get_backend": "backends",
+    "ChunkMatchCache": "chunk_cache",
+    "ReplacementPlan": "replacements",
+    "RenderedBatches": "lazy", "LazyOutput": "lazy",
+    "HighlightRanges": "highlight",
+    "HexProcessor": "processor",
+    "DocumentModel": "model", "DocumentPipeline": "model",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value  # Later lookups skip this function
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,83 @@
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Rough bytes held per input byte by the in-memory pipeline: raw bytes, canonical
+# text, intermediate and final results (three characters per byte each) and the match table
+PIPELINE_BYTES_PER_INPUT_BYTE = 11
+
+
+def estimate_pipeline_memory(byte_count):
+    """Approximate peak memory of process_hex_data for an input of this many bytes"""
+    return byte_count * PIPELINE_BYTES_PER_INPUT_BYTE
+
+
+def parse_size(text):
+    """Parse sizes like '512M', '2G' or '65536' into bytes"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    scale = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}[match.group(2).upper()]
+    return int(float(match.group(1)) * scale)
+
+
+def format_size(byte_count):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(byte_count) < 1024:
+            return f"{byte_count:.0f} {unit}" if unit == 'B' else f"{byte_count:.1f} {unit}"
+        byte_count /= 1024
+    return f"{byte_count:.1f} GB"
+
+
+class StageProfiler:
+    """Wall time and tracemalloc peak of each named stage; stages may nest"""
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = []  # (name, seconds, peak bytes above the stage's starting usage or None)
+        self._open = []  # [starting usage, highest peak seen by nested stages] per open stage
+        self._started_tracing = False
+    
+    def reset(self):
+        self.stages = []
+    
+    @contextmanager
+    def stage(self, name):
+        tracing = self.trace_memory
+        if tracing:
+            # Trace from the outermost stage unless something else already does
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            # The enclosing stage keeps the peak reached so far before it is reset for this one
+            if self._open:
+                self._open[-1][1] = max(self._open[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._open.append([current, current])
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            peak_bytes = None
+            if tracing:
+                start_usage, nested_peak = self._open.pop()
+                peak = max(tracemalloc.get_traced_memory()[1], nested_peak)
+                peak_bytes = peak - start_usage
+                if self._open:
+                    self._open[-1][1] = max(self._open[-1][1], peak)
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            self.stages.append((name, elapsed, peak_bytes))
+    
+    def summary(self):
+        """One line per run: 'match 12.0 ms 3.1 MB | replace ...'"""
+        parts = []
+        for name, elapsed, peak_bytes in self.stages:
+            part = f"{name} {elapsed * 1000:.1f} ms"
+            if peak_bytes is not None:
+                part += f" {format_size(peak_bytes)}"
+            parts.append(part)
+        return " | ".join(parts)
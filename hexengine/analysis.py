@@ -0,0 +1,223 @@
+from .patterns import PatternTemplate
+
+# Shortest shared literal prefix worth a grouped scan
+GROUP_MIN_PREFIX = 2
+
+
+def fixed_bytesets(template):
+    """ByteSets of a template made only of fixed-width tokens (## as a ByteSet matching anything), or None"""
+    sets = []
+    for element in template.elements:
+        if element[0] == "capture":
+            sets.append((0, 0))
+        elif element[0] == "bytes":
+            sets.append((element[1].value, element[1].mask))
+        else:
+            return None
+    return sets
+
+
+def covers(general, specific):
+    """True if every byte matching ByteSet specific also matches ByteSet general"""
+    value, mask = general
+    specific_value, specific_mask = specific
+    return mask & ~specific_mask == 0 and specific_value & mask == value
+
+
+def compatible(first, second):
+    """True if some byte matches both ByteSets"""
+    return (first[0] ^ second[0]) & first[1] & second[1] == 0
+
+
+def can_overlap_itself(sets):
+    """True if a hit can start inside another hit of the same template
+    
+    Then re.finditer skips the inner hit, so the template does not report
+    every position it matches at.
+    """
+    length = len(sets)
+    return any(all(compatible(sets[i], sets[i + shift]) for i in range(length - shift))
+               for shift in range(1, length))
+
+
+def literal_prefix(pattern_template):
+    """Leading whole literal bytes of a template, b"" if it starts with anything else"""
+    try:
+        template = PatternTemplate.parse(pattern_template)
+    except ValueError:
+        return b""
+    prefix = bytearray()
+    for element in template.elements:
+        if element[0] != "bytes" or element[1].mask != 0xFF:
+            break
+        prefix.append(element[1].value)
+    return bytes(prefix)
+
+
+class PrefixTrie:
+    """Trie of literal template prefixes; rules sharing a path can be found with one scan for it"""
+    def __init__(self):
+        self.root = {}  # Byte -> child node; key None holds the rule ids whose prefix ends here
+    
+    def insert(self, prefix, rule_id):
+        node = self.root
+        for value in prefix:
+            node = node.setdefault(value, {})
+        node.setdefault(None, []).append(rule_id)
+    
+    @staticmethod
+    def members(node):
+        found = list(node.get(None, []))
+        for key, child in node.items():
+            if key is not None:
+                found.extend(PrefixTrie.members(child))
+        return found
+    
+    def groups(self, min_prefix=GROUP_MIN_PREFIX, min_rules=2):
+        """(shared prefix, rule ids) for subtrees of at least min_rules rules whose common prefix is long enough"""
+        found = []
+        self.collect(self.root, b"", min_prefix, min_rules, found)
+        return found
+    
+    def collect(self, node, path, min_prefix, min_rules, found):
+        # Follow single-child chains: the common prefix of a subtree ends where it branches or a rule ends
+        while len(node) == 1 and None not in node:
+            (value, node), = node.items()
+            path += bytes([value])
+        members = self.members(node)
+        if len(members) < min_rules:
+            return
+        if len(path) >= min_prefix:
+            found.append((path, sorted(members)))
+            return
+        for key, child in node.items():
+            if key is not None:
+                self.collect(child, path + bytes([key]), min_prefix, min_rules, found)
+
+
+class RuleIssue:
+    """One finding of the analyzer about a rule"""
+    INVALID = "invalid"  # Does not parse, never matches
+    DUPLICATE = "duplicate"  # Same template and replacement as a rule that wins every tie
+    SHADOWED = "shadowed"  # Every match is also a match of a rule that wins the tie: never replaces anything
+    SUBSUMED = "subsumed"  # Matches only where a tie-winning rule does, but that rule can skip overlapping hits
+    
+    DEAD = (INVALID, DUPLICATE, SHADOWED)
+    
+    def __init__(self, kind, rule, other=None, message=""):
+        self.kind = kind
+        self.rule = rule
+        self.other = other  # The rule responsible, if any
+        self.message = message
+    
+    @property
+    def dead(self):
+        return self.kind in self.DEAD
+
+
+class RuleSetAnalysis:
+    """Static checks of a pattern rule list against the engine's overlap resolution
+    
+    Rules are ranked as the engine ranks them, by (priority, list position). At
+    one offset the better ranked match wins, so a rule matching only where a
+    better ranked rule matches with the same length never replaces anything.
+    Removing such dead rules keeps every output identical; the remaining rules
+    keep their order, since it decides the ties.
+    """
+    def __init__(self, pattern_rules):
+        self.rules = list(pattern_rules)
+        self.issues = []
+        self.groups = []  # (shared literal prefix, rules) that a grouped scan can match together
+        self.analyze()
+    
+    def ranked(self):
+        return sorted(range(len(self.rules)), key=lambda i: (self.rules[i].priority, i))
+    
+    def analyze(self):
+        parsed = {}  # Rule index -> (PatternTemplate, fixed ByteSets or None)
+        for index, rule in enumerate(self.rules):
+            try:
+                template = PatternTemplate.parse(rule.pattern_template)
+            except ValueError as e:
+                self.issues.append(RuleIssue(RuleIssue.INVALID, rule, message=str(e)))
+                continue
+            if not template.elements:
+                self.issues.append(RuleIssue(RuleIssue.INVALID, rule, message="Empty pattern"))
+                continue
+            parsed[index] = (template, fixed_bytesets(template))
+        
+        # Each rule is compared with the rules ranked before it that are still alive
+        winners = []
+        for index in self.ranked():
+            if index not in parsed:
+                continue
+            issue = self.check_against(index, parsed, winners)
+            if issue is not None:
+                self.issues.append(issue)
+                if issue.dead:
+                    continue
+            winners.append(index)
+        
+        trie = PrefixTrie()
+        for index in winners:
+            prefix = literal_prefix(self.rules[index].pattern_template)
+            if prefix:
+                trie.insert(prefix, index)
+        self.groups = [(prefix, [self.rules[index] for index in members]) for prefix, members in trie.groups()]
+    
+    def check_against(self, index, parsed, winners):
+        rule = self.rules[index]
+        template, sets = parsed[index]
+        key = self.template_key(template, sets)
+        subsumed_by = None
+        for winner in winners:
+            other = self.rules[winner]
+            other_template, other_sets = parsed[winner]
+            if self.template_key(other_template, other_sets) == key:
+                if (other.replacement, other.location_enabled, other.location_indices()) == \
+                        (rule.replacement, rule.location_enabled, rule.location_indices()):
+                    return RuleIssue(RuleIssue.DUPLICATE, rule, other, f"Duplicate of '{other.pattern_template}'")
+                return RuleIssue(RuleIssue.SHADOWED, rule, other,
+                                 f"Same pattern as '{other.pattern_template}', which wins every tie")
+            if sets is None or other_sets is None or len(sets) != len(other_sets):
+                continue
+            if all(covers(general, specific) for general, specific in zip(other_sets, sets)):
+                if not can_overlap_itself(other_sets):
+                    return RuleIssue(RuleIssue.SHADOWED, rule, other,
+                                     f"Every match is also matched by '{other.pattern_template}', which wins the tie")
+                if subsumed_by is None:
+                    subsumed_by = other
+        if subsumed_by is not None:
+            return RuleIssue(RuleIssue.SUBSUMED, rule, subsumed_by,
+                             f"Only fires where overlapping hits of '{subsumed_by.pattern_template}' were skipped")
+        return None
+    
+    @staticmethod
+    def template_key(template, sets):
+        if sets is not None:
+            return tuple(sets)
+        return " ".join(template.template.split()).upper()
+    
+    @property
+    def dead_rules(self):
+        return [issue.rule for issue in self.issues if issue.dead]
+    
+    def optimized_rules(self):
+        """The rule list without dead rules, in the same order, producing identical outputs"""
+        dead = {id(rule) for rule in self.dead_rules}
+        return [rule for rule in self.rules if id(rule) not in dead]
+    
+    def report(self, limit=None):
+        """Text lines: one per issue in list order, then the prefix groups"""
+        numbers = {id(rule): number for number, rule in enumerate(self.rules, 1)}
+        issues = sorted(self.issues, key=lambda issue: numbers[id(issue.rule)])
+        lines = [f"{len(self.rules)} rules: {len(self.dead_rules)} dead, "
+                 f"{sum(1 for issue in issues if not issue.dead)} to review, {len(self.groups)} prefix groups"]
+        shown = issues if limit is None else issues[:limit]
+        for issue in shown:
+            lines.append(f"  #{numbers[id(issue.rule)]} {issue.rule.pattern_template}: {issue.kind} - {issue.message}")
+        if len(shown) < len(issues):
+            lines.append(f"  ... and {len(issues) - len(shown)} more")
+        for prefix, rules in self.groups:
+            lines.append(f"  prefix {prefix.hex(' ').upper()}: {len(rules)} rules scanned together")
+        return lines
@@ -0,0 +1,401 @@
+import os
+import re
+from array import array
+
+from .layout import HexLayout
+from .codegen import MatcherCompiler
+from .analysis import PrefixTrie, literal_prefix
+from .optional import numpy as np  # The NumPy backends are optional
+
+# Thresholds used by select_backend
+NUMPY_MIN_BYTES = 64 * 1024  # Below this the regex path is already fast
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+PARALLEL_MIN_WORK = 256 * 1024 * 1024  # Input bytes x rule count
+
+
+def parse_fixed_template(pattern_template):
+    """Split a template into (length, literal positions, literal values, wildcard positions), or None if unsupported"""
+    literal_positions, literal_values, wildcard_positions = [], [], []
+    
+    for position, part in enumerate(pattern_template.split()):
+        if part == "##":
+            wildcard_positions.append(position)
+        elif re.fullmatch(r"[0-9A-Fa-f]{2}", part):
+            literal_positions.append(position)
+            literal_values.append(int(part, 16))
+        else:
+            return None
+    
+    length = len(literal_positions) + len(wildcard_positions)
+    return length, literal_positions, literal_values, wildcard_positions
+
+
+def compile_fixed(pattern_template):
+    """(length, bytes regex finding all overlapping hits, wildcard positions) or None"""
+    parsed = parse_fixed_template(pattern_template)
+    if parsed is None or parsed[0] == 0:
+        return None
+    
+    length, literal_positions, literal_values, wildcard_positions = parsed
+    literals = dict(zip(literal_positions, literal_values))
+    body = b''.join(re.escape(bytes([literals[i]])) if i in literals else b'.' for i in range(length))
+    # A zero-width lookahead reports every start, including overlapping ones
+    return length, re.compile(b'(?=' + body + b')', re.DOTALL), wildcard_positions
+
+
+def select_non_overlapping(starts, length):
+    """Keep left-most non-overlapping hits from sorted starts, mirroring re.finditer"""
+    kept = []
+    next_free = -1
+    for start in starts:
+        if start >= next_free:
+            kept.append(start)
+            next_free = start + length
+    return kept
+
+
+def add_fixed_hits(table, rule_id, data, starts, length, wildcard_positions):
+    """Apply the non-overlap rule to sorted candidate starts and append them as columns"""
+    kept = select_non_overlapping(starts, length)
+    wildcard_blob = bytes(data[start + position] for start in kept for position in wildcard_positions)
+    text_starts = array('q', (HexLayout.byte_to_text(start) for start in kept))
+    text_ends = array('q', (text_start + HexLayout.byte_end_to_text(length) for text_start in text_starts))
+    table.add_columns(rule_id, text_starts, text_ends, wildcard_blob, len(wildcard_positions))
+
+
+class NumpyPatternMatcher:
+    """Vectorized matcher for fixed-length templates over the raw input bytes"""
+    def __init__(self, data):
+        self.data = np.frombuffer(data, dtype=np.uint8)
+    
+    def candidate_starts(self, parsed, start=0, end=None):
+        """All hit offsets in [start, end), overlapping ones included"""
+        length, literal_positions, literal_values, _ = parsed
+        end = len(self.data) if end is None else end
+        window_end = min(end + length - 1, len(self.data))
+        if length == 0 or window_end - start < length:
+            return np.empty(0, dtype=np.int64)
+        
+        # Each row is a view of `length` consecutive bytes; no data is copied
+        windows = np.lib.stride_tricks.sliding_window_view(self.data[start:window_end], length)
+        hit_mask = np.ones(len(windows), dtype=bool)
+        for position, value in zip(literal_positions, literal_values):
+            hit_mask &= windows[:, position] == value
+        
+        return np.flatnonzero(hit_mask).astype(np.int64) + start
+    
+    def add_matches(self, table, rule_id, rule):
+        """Add matches of a rule to a MatchTable, same results as the regex path; False if unsupported"""
+        parsed = parse_fixed_template(rule.pattern_template)
+        if parsed is None:
+            return False
+        
+        length, _, _, wildcard_positions = parsed
+        starts = self.drop_overlapping(self.candidate_starts(parsed), length)
+        self.add_hits(table, rule_id, starts, length, wildcard_positions)
+        return True
+    
+    def add_hits(self, table, rule_id, starts, length, wildcard_positions):
+        """Append already selected hits, gathering all wildcard bytes in one fancy-indexing step"""
+        wildcard_blob = b""
+        if wildcard_positions and len(starts):
+            gathered = self.data[starts[:, None] + np.asarray(wildcard_positions)[None, :]]
+            wildcard_blob = gathered.tobytes()
+        
+        text_starts = starts * HexLayout.BYTE_WIDTH
+        text_ends = text_starts + HexLayout.byte_end_to_text(length)
+        table.add_columns(rule_id, self.to_array(text_starts), self.to_array(text_ends),
+                          wildcard_blob, len(wildcard_positions))
+    
+    @staticmethod
+    def to_array(values):
+        """Convert an int64 ndarray to array('q') without a Python-level loop"""
+        result = array('q')
+        result.frombytes(values.astype(np.int64).tobytes())
+        return result
+    
+    @staticmethod
+    def drop_overlapping(starts, length):
+        """Keep left-most non-overlapping hits, mirroring re.finditer"""
+        if len(starts) < 2 or not np.any(np.diff(starts) < length):
+            return starts
+        return np.asarray(select_non_overlapping(starts.tolist(), length), dtype=np.int64)
+
+
+class MatchBackend:
+    """Finds matches for some rules of a MatchTable and appends them to it"""
+    name = None
+    note = None  # Set by add_matches when the backend fell back or skipped work, e.g. for last_backend
+    
+    def available(self):
+        return True
+    
+    def add_matches(self, table, buffer, rule_ids):
+        """Add matches of table.rules[rule_id] for each id; returns the ids that were handled"""
+        raise NotImplementedError
+
+
+class TextRegexBackend(MatchBackend):
+    """Original engine: one regex per rule over the canonical hex text; handles any template"""
+    name = "regex"
+    
+    def add_matches(self, table, buffer, rule_ids):
+        for rule_id in rule_ids:
+            rule = table.rules[rule_id]
+            try:
+                table.add_regex_matches(rule_id, re.compile(rule.to_regex(), re.IGNORECASE), buffer.text)
+            except re.error as e:
+                print(f"Regex error for pattern {rule.pattern_template}: {e}")
+        return list(rule_ids)
+
+
+class BytesRegexBackend(MatchBackend):
+    """One bytes regex per rule over the raw bytes, a third of the text size
+    
+    Fixed-length rules use a lookahead so overlap resolution matches the other
+    fixed backends; extended templates (nibbles, masks, alternatives, gaps) run
+    their own bytes regex directly.
+    """
+    name = "bytes"
+    
+    def add_matches(self, table, buffer, rule_ids):
+        handled = []
+        for rule_id in rule_ids:
+            rule = table.rules[rule_id]
+            compiled = compile_fixed(rule.pattern_template)
+            if compiled is None:
+                if rule.pattern_template.split() and self.add_extended_matches(table, rule_id, rule, buffer.data):
+                    handled.append(rule_id)
+                continue
+            length, regex, wildcard_positions = compiled
+            starts = [match.start() for match in regex.finditer(buffer.data)]
+            add_fixed_hits(table, rule_id, buffer.data, starts, length, wildcard_positions)
+            handled.append(rule_id)
+        return handled
+    
+    def add_extended_matches(self, table, rule_id, rule, data):
+        try:
+            regex = re.compile(rule.to_bytes_regex(), re.DOTALL)
+        except re.error as e:
+            print(f"Regex error for pattern {rule.pattern_template}: {e}")
+            return False
+        table.add_bytes_regex_matches(rule_id, regex, data)
+        return True
+
+
+class NumpyBackend(MatchBackend):
+    """Vectorized literal-column comparison over a sliding window view"""
+    name = "numpy"
+    
+    def available(self):
+        return np.available()
+    
+    def add_matches(self, table, buffer, rule_ids):
+        matcher = NumpyPatternMatcher(buffer.data)
+        return [rule_id for rule_id in rule_ids if matcher.add_matches(table, rule_id, table.rules[rule_id])]
+
+
+class CodegenBackend(MatchBackend):
+    """Runs a Python function generated for the rule set: fixed-offset checks around its rarest literal"""
+    name = "codegen"
+    compiler = MatcherCompiler()  # Shared so generated functions are reused across runs
+    VERIFY_BYTES = 64 * 1024  # Size of each window of a larger input checked against the regex backend
+    VERIFY_WINDOWS = 8  # Windows spread from the start to the end of a larger input
+    VERIFY_FULL_BYTES = 1024 * 1024  # Inputs up to this size are checked whole
+    
+    def __init__(self, verify=True):
+        self.verify = verify  # Check each newly generated function once before trusting it
+    
+    def add_matches(self, table, buffer, rule_ids):
+        parsed = [(rule_id, parse_fixed_template(table.rules[rule_id].pattern_template)) for rule_id in rule_ids]
+        parsed = [(rule_id, entry) for rule_id, entry in parsed if entry is not None and entry[0] > 0]
+        if not parsed:
+            return []
+        
+        data = buffer.data
+        templates = [entry for _, entry in parsed]
+        fingerprint, function = self.compiler.compile(templates, data)
+        if self.verify and fingerprint not in self.compiler.verified and fingerprint not in self.compiler.rejected:
+            if self.matches_regex(function, templates, data):
+                self.compiler.verified.add(fingerprint)
+            else:
+                self.compiler.rejected.add(fingerprint)
+        if fingerprint in self.compiler.rejected:
+            # Left to the regex fallback; the processor reports the note with the backend name
+            self.note = f"matcher {fingerprint[:12]} rejected, regex fallback"
+            return []
+        
+        for (rule_id, (length, _, _, wildcard_positions)), (starts, wildcard_blob) in zip(parsed, function(data)):
+            text_starts = array('q', (HexLayout.byte_to_text(start) for start in starts))
+            text_ends = array('q', (text_start + HexLayout.byte_end_to_text(length) for text_start in text_starts))
+            table.add_columns(rule_id, text_starts, text_ends, wildcard_blob, len(wildcard_positions))
+        return [rule_id for rule_id, _ in parsed]
+    
+    def verify_windows(self, size):
+        """(start, end) byte ranges of an input checked against the regex backend"""
+        if size <= self.VERIFY_FULL_BYTES:
+            return [(0, size)]
+        last = size - self.VERIFY_BYTES
+        starts = [last * window // (self.VERIFY_WINDOWS - 1) for window in range(self.VERIFY_WINDOWS)]
+        return [(start, start + self.VERIFY_BYTES) for start in starts]
+    
+    def matches_regex(self, function, templates, data):
+        """True if the function finds the same hits and wildcards as the bytes regex
+        
+        Small inputs are checked whole; larger ones on windows spread across
+        them, each window scanned on its own by both.
+        """
+        bodies = []
+        for length, literal_positions, literal_values, _ in templates:
+            literals = dict(zip(literal_positions, literal_values))
+            body = b''.join(re.escape(bytes([literals[i]])) if i in literals else b'.' for i in range(length))
+            bodies.append(re.compile(body, re.DOTALL))
+        
+        for start, end in self.verify_windows(len(data)):
+            sample = bytes(data[start:end])
+            for parsed, regex, (starts, wildcard_blob) in zip(templates, bodies, function(sample)):
+                wildcard_positions = parsed[3]
+                expected = [match.start() for match in regex.finditer(sample)]
+                expected_blob = bytes(sample[hit + position] for hit in expected for position in wildcard_positions)
+                if starts != expected or wildcard_blob != expected_blob:
+                    return False
+        return True
+
+
+class GroupedPrefixBackend(MatchBackend):
+    """Rules sharing a literal prefix are matched in one scan for that prefix
+    
+    The prefixes come from a PrefixTrie of the rule set. Each hit of a shared
+    prefix is a candidate start for every rule of its group, checked with the
+    rule's anchored bytes regex; skipping candidates inside a rule's previous
+    hit gives the same results as one re.finditer per rule.
+    """
+    name = "grouped"
+    
+    def add_matches(self, table, buffer, rule_ids):
+        trie = PrefixTrie()
+        compiled = {}
+        for rule_id in rule_ids:
+            template = table.rules[rule_id].pattern_template
+            entry = compile_fixed(template)
+            prefix = literal_prefix(template)
+            if entry is not None and prefix:
+                compiled[rule_id] = entry
+                trie.insert(prefix, rule_id)
+        
+        data = buffer.data
+        handled = []
+        for prefix, members in trie.groups():
+            checks = [(rule_id, compiled[rule_id][0], self.anchored_regex(table.rules[rule_id].pattern_template))
+                      for rule_id in members]
+            starts_by_rule = [[] for _ in members]
+            next_free = [0] * len(members)
+            size = len(data)
+            start = data.find(prefix)
+            while start != -1:
+                for position, (rule_id, length, regex) in enumerate(checks):
+                    if start >= next_free[position] and start + length <= size and regex.match(data, start):
+                        starts_by_rule[position].append(start)
+                        next_free[position] = start + length
+                start = data.find(prefix, start + 1)
+            
+            for rule_id, rule_starts in zip(members, starts_by_rule):
+                length, _, wildcard_positions = compiled[rule_id]
+                add_fixed_hits(table, rule_id, data, rule_starts, length, wildcard_positions)
+                handled.append(rule_id)
+        return handled
+    
+    @staticmethod
+    def anchored_regex(pattern_template):
+        length, literal_positions, literal_values, _ = parse_fixed_template(pattern_template)
+        literals = dict(zip(literal_positions, literal_values))
+        return re.compile(b''.join(re.escape(bytes([literals[i]])) if i in literals else b'.' for i in range(length)),
+                          re.DOTALL)
+
+
+# Input shared with parallel workers; set once per worker process by the initializer
+_worker_data = None
+
+
+def _init_parallel_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _parallel_candidates(templates, start, end):
+    """Worker: all candidate starts in [start, end) for each template"""
+    results = []
+    matcher = NumpyPatternMatcher(_worker_data) if np.available() else None
+    for template in templates:
+        if matcher is not None:
+            results.append(matcher.candidate_starts(parse_fixed_template(template), start, end).tolist())
+            continue
+        length, regex, _ = compile_fixed(template)
+        window_end = min(end + length - 1, len(_worker_data))
+        results.append([match.start() for match in regex.finditer(_worker_data, start, window_end)])
+    return results
+
+
+class ParallelBackend(MatchBackend):
+    """Splits the input across worker processes; each segment also sees the bytes a match may run into"""
+    name = "parallel"
+    
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+    
+    def add_matches(self, table, buffer, rule_ids):
+        compiled = [(rule_id, compile_fixed(table.rules[rule_id].pattern_template)) for rule_id in rule_ids]
+        compiled = [(rule_id, entry) for rule_id, entry in compiled if entry is not None]
+        if not compiled:
+            return []
+        
+        data = buffer.data
+        templates = [table.rules[rule_id].pattern_template for rule_id, _ in compiled]
+        segment = max(len(data) // self.workers + 1, 1)
+        bounds = [(start, min(start + segment, len(data))) for start in range(0, len(data), segment)]
+        
+        # Imported here since most runs never start a pool
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Fork shares the input with workers without pickling it
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        starts_by_rule = [[] for _ in compiled]
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=_init_parallel_worker, initargs=(data,)) as executor:
+            futures = [executor.submit(_parallel_candidates, templates, start, end) for start, end in bounds]
+            # Segments are in order, so concatenated starts stay sorted
+            for future in futures:
+                for rule_starts, segment_starts in zip(starts_by_rule, future.result()):
+                    rule_starts.extend(segment_starts)
+        
+        for rule_starts, (rule_id, (length, _, wildcard_positions)) in zip(starts_by_rule, compiled):
+            add_fixed_hits(table, rule_id, data, rule_starts, length, wildcard_positions)
+        return [rule_id for rule_id, _ in compiled]
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (TextRegexBackend, BytesRegexBackend, NumpyBackend, ParallelBackend, CodegenBackend,
+                    GroupedPrefixBackend)
+}
+
+
+def select_backend(input_size, rule_count):
+    """Pick the backend expected to be fastest for an input size and rule count"""
+    if input_size < NUMPY_MIN_BYTES:
+        return "regex"
+    if (input_size >= PARALLEL_MIN_BYTES and input_size * rule_count >= PARALLEL_MIN_WORK
+            and (os.cpu_count() or 1) > 1):
+        return "parallel"
+    if np.available():
+        return "numpy"
+    return "bytes"
+
+
+def get_backend(name):
+    """Instantiate a backend by name, falling back to the regex backend when unavailable"""
+    backend = BACKENDS[name]()
+    if not backend.available():
+        return TextRegexBackend()
+    return backend
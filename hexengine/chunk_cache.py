@@ -0,0 +1,140 @@
+import os
+import pickle
+import hashlib
+import random
+from array import array
+from collections import OrderedDict
+
+from .backends import compile_fixed, add_fixed_hits
+from .optional import numpy as np  # Without NumPy, boundaries are found with a plain Python loop
+
+
+class ChunkMatchCache:
+    """Caches match candidates per content-defined chunk so an edited binary only re-scans changed regions"""
+    MIN_CHUNK = 2 * 1024
+    MAX_CHUNK = 64 * 1024
+    BOUNDARY_MASK = 0xFFF80000  # 13 high bits -> about 8 KiB average chunks
+    GEAR = random.Random(0x6765617).sample(range(1 << 32), 256)  # Fixed so boundaries are stable across runs
+    
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (chunk hash, rule-set fingerprint) -> per-rule candidate starts
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def fingerprint(rules):
+        """Identifier of the matching behaviour of a rule list"""
+        templates = '\n'.join(' '.join(rule.pattern_template.split()).upper() for rule in rules)
+        return hashlib.sha1(templates.encode()).hexdigest()
+    
+    def chunk_boundaries(self, data):
+        """Content-defined cut points using a Gear rolling hash (NumPy vectorized when available)"""
+        if np.available():
+            candidates = self.gear_candidates_numpy(data)
+        else:
+            candidates = self.gear_candidates(data)
+        
+        boundaries = []
+        last = 0
+        for position in candidates:
+            while position - last > self.MAX_CHUNK:
+                last += self.MAX_CHUNK
+                boundaries.append(last)
+            if position - last >= self.MIN_CHUNK:
+                boundaries.append(position)
+                last = position
+        while len(data) - last > self.MAX_CHUNK:
+            last += self.MAX_CHUNK
+            boundaries.append(last)
+        return boundaries
+    
+    def gear_candidates(self, data):
+        """Positions after which the rolling hash hits the boundary mask"""
+        gear = self.GEAR
+        mask = self.BOUNDARY_MASK
+        rolling = 0
+        candidates = []
+        for position, value in enumerate(data):
+            rolling = ((rolling << 1) + gear[value]) & 0xFFFFFFFF
+            if not rolling & mask:
+                candidates.append(position + 1)
+        return candidates
+    
+    def gear_candidates_numpy(self, data):
+        """Same hash as gear_candidates: after 32 shifts a byte no longer affects the 32-bit value"""
+        values = np.frombuffer(data, dtype=np.uint8)
+        gear = np.asarray(self.GEAR, dtype=np.uint32)[values]
+        rolling = np.zeros(len(values), dtype=np.uint32)
+        for shift in range(min(32, len(values))):
+            rolling[shift:] += gear[:len(values) - shift] << np.uint32(shift)
+        return (np.flatnonzero((rolling & np.uint32(self.BOUNDARY_MASK)) == 0) + 1).tolist()
+    
+    def find_matches(self, data, rules, table, rule_ids):
+        """Add matches of fixed-length rules to table; returns the rule ids that were handled"""
+        compiled = [(rule_id, compile_fixed(rules[rule_id].pattern_template)) for rule_id in rule_ids]
+        compiled = [(rule_id, entry) for rule_id, entry in compiled if entry is not None]
+        if not compiled:
+            return []
+        
+        fingerprint = self.fingerprint([rules[rule_id] for rule_id, _ in compiled])
+        max_length = max(entry[0] for _, entry in compiled)
+        starts_by_rule = [[] for _ in compiled]
+        
+        chunk_start = 0
+        for chunk_end in self.chunk_boundaries(data) + [len(data)]:
+            if chunk_end <= chunk_start:
+                continue
+            for rule_starts, chunk_starts in zip(starts_by_rule, self.chunk_candidates(data, chunk_start, chunk_end, compiled, fingerprint)):
+                rule_starts.extend(chunk_start + start for start in chunk_starts)
+            
+            # Hits straddling the cut are never cached; re-match just the seam
+            if chunk_end < len(data) and max_length > 1:
+                seam_start = max(chunk_end - max_length + 1, 0)
+                seam_end = min(chunk_end + max_length - 1, len(data))
+                for rule_starts, (_, (length, regex, _)) in zip(starts_by_rule, compiled):
+                    rule_starts.extend(
+                        match.start() for match in regex.finditer(data, seam_start, seam_end)
+                        if match.start() < chunk_end < match.start() + length
+                    )
+            chunk_start = chunk_end
+        
+        for rule_starts, (rule_id, (length, _, wildcard_positions)) in zip(starts_by_rule, compiled):
+            add_fixed_hits(table, rule_id, data, sorted(rule_starts), length, wildcard_positions)
+        return [rule_id for rule_id, _ in compiled]
+    
+    def chunk_candidates(self, data, start, end, compiled, fingerprint):
+        """Per-rule hit offsets fully inside one chunk, relative to its start"""
+        chunk = data[start:end]
+        key = (hashlib.sha1(chunk).digest(), fingerprint)
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return cached
+        
+        self.misses += 1
+        result = []
+        for _, (length, regex, _) in compiled:
+            result.append(array('l', (match.start() for match in regex.finditer(chunk) if match.start() + length <= len(chunk))))
+        
+        self.entries[key] = result
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return result
+    
+    def save(self, path):
+        """Persist the cache so later sessions can reuse it"""
+        try:
+            with open(path, 'wb') as f:
+                pickle.dump(list(self.entries.items()), f)
+        except Exception as e:
+            print(f"Error saving chunk cache: {str(e)}")
+    
+    def load(self, path):
+        try:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self.entries = OrderedDict(pickle.load(f))
+        except Exception as e:
+            print(f"Error loading chunk cache: {str(e)}")
@@ -0,0 +1,292 @@
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+
+from .layout import HexLayout, HexBuffer
+from .rules import load_rules_file, load_location_rules_file
+from .backends import BACKENDS, get_backend
+from .table import MatchTable
+from .processor import HexProcessor
+from .accounting import StageProfiler, parse_size
+from .estimate import CostEstimator
+from .locations import LocationIndex
+
+
+def read_input(path, is_hex):
+    """Canonical hex text of a binary file, or of a text file holding hex"""
+    if is_hex:
+        with open(path, 'r') as file:
+            return HexLayout.canonicalize(file.read())
+    with open(path, 'rb') as file:
+        return HexLayout.from_bytes(file.read())
+
+
+def map_input(path, is_hex):
+    """Raw bytes of an input without holding its hex text; binary files are memory-mapped"""
+    if is_hex:
+        with open(path, 'r') as file:
+            return HexLayout.to_bytes(HexLayout.canonicalize(file.read()))
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def open_output(path):
+    if path == '-':
+        return open(sys.stdout.fileno(), 'w', closefd=False)
+    return open(path or os.devnull, 'w')
+
+
+def write_output(path, text):
+    if path == '-':
+        sys.stdout.write(text + '\n')
+    else:
+        with open(path, 'w') as file:
+            file.write(text)
+
+
+def load_location_rules(args):
+    """Location rules of --locations followed by the indexes of every --location-table"""
+    location_rules = load_location_rules_file(args.locations) if args.locations else []
+    for path in args.location_table or []:
+        location_rules.append(LocationIndex.from_file(path, args.location_key_bytes))
+    return location_rules
+
+
+def run_process(args):
+    """Apply pattern and location rules to one input"""
+    pattern_rules = load_rules_file(args.rules)
+    location_rules = load_location_rules(args)
+    
+    processor = HexProcessor(backend=args.backend, memory_budget=args.memory_budget)
+    if args.stats:
+        processor.profiler = StageProfiler(trace_memory=True)
+    
+    input_size = os.path.getsize(args.input)
+    if args.hex:
+        input_size //= HexLayout.BYTE_WIDTH
+    
+    if args.preflight:
+        estimate = CostEstimator(processor).estimate(map_input(args.input, args.hex), pattern_rules, location_rules)
+        problems = estimate.problems(args.memory_budget, args.time_limit, args.max_output)
+        if problems:
+            print(estimate.summary(), file=sys.stderr)
+            for problem in problems:
+                print(f"{args.preflight}: {problem}", file=sys.stderr)
+            if args.preflight == 'refuse':
+                sys.exit(2)
+    
+    if processor.exceeds_budget(input_size):
+        # Stream from the mapped file straight into the output files
+        data = map_input(args.input, args.hex)
+        with open_output(args.intermediate) as intermediate_out, open_output(args.output) as final_out:
+            processor.process_hex_stream(data, pattern_rules, location_rules, intermediate_out, final_out)
+        mode = "streamed"
+    else:
+        text = read_input(args.input, args.hex)
+        intermediate_result, final_result = processor.process_hex_data(text, pattern_rules, location_rules)
+        
+        if args.intermediate:
+            write_output(args.intermediate, intermediate_result)
+        write_output(args.output, final_result)
+        mode = "in memory"
+    
+    if args.stats:
+        print(f"{mode}, backend {processor.last_backend}: {processor.profiler.summary()}", file=sys.stderr)
+
+
+def run_estimate(args):
+    """Estimate time, memory and output size of a process run from sampled windows"""
+    pattern_rules = load_rules_file(args.rules)
+    location_rules = load_location_rules(args)
+    processor = HexProcessor(backend=args.backend, memory_budget=args.memory_budget)
+    estimator = CostEstimator(processor, window_bytes=args.window, windows=args.windows, seed=args.seed)
+    
+    estimate = estimator.estimate(map_input(args.input, args.hex), pattern_rules, location_rules)
+    print(estimate.summary())
+    problems = estimate.problems(args.memory_budget, args.time_limit, args.max_output)
+    for problem in problems:
+        print(f"warning: {problem}")
+    if problems:
+        sys.exit(2)
+
+
+def run_bench(args):
+    """Time the match stage of every available backend on one input and check they agree"""
+    text = read_input(args.input, args.hex)
+    pattern_rules = load_rules_file(args.rules)
+    print(f"Input: {HexLayout.text_to_byte(len(text) + 1)} bytes, {len(pattern_rules)} rules")
+    
+    reference = None
+    for name in BACKENDS:
+        backend = get_backend(name)
+        if backend.name != name:
+            print(f"{name:>10}: not available")
+            continue
+        
+        best = None
+        for _ in range(args.repeat):
+            buffer = HexBuffer(text=text)
+            table = MatchTable(pattern_rules)
+            started = time.perf_counter()
+            handled = backend.add_matches(table, buffer, range(len(pattern_rules)))
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        
+        rows = sorted(zip(table.rule_ids, table.starts))
+        note = ""
+        if len(handled) < len(pattern_rules):
+            note = f" ({len(pattern_rules) - len(handled)} rules unsupported)"
+        elif reference is None:
+            reference = rows
+        elif rows != reference:
+            note = " (results differ from the regex backend)"
+        print(f"{name:>10}: {best * 1000:9.1f} ms, {len(table)} matches{note}")
+
+
+def run_analyze(args):
+    """Report dead and shadowed rules; optionally save the rule set without the dead ones"""
+    from .analysis import RuleSetAnalysis
+    
+    analysis = RuleSetAnalysis(load_rules_file(args.rules))
+    print("\n".join(analysis.report()))
+    if args.write:
+        with open(args.write, 'w') as file:
+            json.dump([rule.to_dict() for rule in analysis.optimized_rules()], file, indent=2)
+        print(f"Wrote {len(analysis.optimized_rules())} rules to {args.write}")
+
+
+def run_compare(args):
+    """Match several rule sets in one scan and list where each set's output differs from the first"""
+    from .compare import MatchSetDiff
+    
+    if len(args.rules) < 2:
+        sys.exit("compare needs at least two --rules files")
+    rule_sets = [load_rules_file(path) for path in args.rules]
+    processor = HexProcessor(backend=args.backend)
+    _, batches = processor.prepare_lazy_sets(read_input(args.input, args.hex), rule_sets)
+    
+    for path, rendered in zip(args.rules, batches):
+        print(f"{path}: {len(rendered.table)} matches, {len(rendered.accepted)} replaced")
+    first = batches[0]
+    for path, rendered in zip(args.rules[1:], batches[1:]):
+        diff = MatchSetDiff(first.table, rendered.table, first.accepted, rendered.accepted)
+        print(f"{args.rules[0]} vs {path}: {diff.summary()}")
+        for difference in diff.differences[:args.limit]:
+            views = [view for view in (difference.first, difference.second) if view is not None]
+            rules = " / ".join(view.rule.pattern_template for view in views)
+            print(f"  0x{difference.byte_offset:08X} +{difference.byte_length}: {difference.kind} ({rules})")
+        if len(diff.differences) > args.limit:
+            print(f"  ... and {len(diff.differences) - args.limit} more")
+
+
+def run_serve(args):
+    """Serve process, count and match requests with warm rule sets until interrupted"""
+    from .server import create_server
+    
+    server = create_server(args.port, args.socket, args.workers, args.verbose)
+    where = args.socket or f"http://127.0.0.1:{args.port}/"
+    print(f"Serving JSON-RPC on {where}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="hexengine", description="Headless hex pattern engine")
+    parser.add_argument('--profile', action='store_true',
+                        help="Save a profile of the command: .pstats and flame-graph stacks in the profiles folder")
+    parser.add_argument('--profile-mode', default='cprofile', choices=['cprofile', 'sampling'],
+                        help="cprofile records every call plus sampled stacks; sampling only samples, with less overhead")
+    parser.add_argument('--profile-dir', help="Folder for --profile output (default: profiles in the app data folder)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    process_parser = commands.add_parser('process', help="Apply pattern and location rules to a file")
+    process_parser.add_argument('input', help="Binary file (or hex text with --hex)")
+    process_parser.add_argument('--rules', required=True, help="Pattern rules JSON saved from the GUI")
+    process_parser.add_argument('--locations', help="Location rules JSON: list of [find, replace] pairs")
+    process_parser.add_argument('--location-table', action='append',
+                                help="CSV (key,text) or symbol listing (address ... name) used as location rules; "
+                                     "repeatable, indexed once and cached")
+    process_parser.add_argument('--location-key-bytes', type=int,
+                                help="Key width of the location tables (default: widest key in each file)")
+    process_parser.add_argument('--hex', action='store_true', help="Input is hex text rather than binary")
+    process_parser.add_argument('--backend', default='auto', choices=['auto'] + list(BACKENDS))
+    process_parser.add_argument('--intermediate', help="Also write the result after pattern rules")
+    process_parser.add_argument('-o', '--output', default='-', help="Final result file (default: stdout)")
+    process_parser.add_argument('--memory-budget', type=parse_size,
+                                help="Stream through files when an input would need more memory, e.g. 512M")
+    process_parser.add_argument('--stats', action='store_true',
+                                help="Print time and peak memory of each stage to stderr")
+    process_parser.add_argument('--time-limit', type=float, help="Seconds a run may take (checked by --preflight)")
+    process_parser.add_argument('--max-output', type=parse_size, help="Largest acceptable final output (checked by --preflight)")
+    process_parser.add_argument('--preflight', choices=['warn', 'refuse'],
+                                help="Estimate the run from samples first and warn about or refuse one over the limits")
+    process_parser.set_defaults(run=run_process)
+    
+    estimate_parser = commands.add_parser('estimate', help="Estimate the cost of processing a file from sampled windows")
+    estimate_parser.add_argument('input')
+    estimate_parser.add_argument('--rules', required=True)
+    estimate_parser.add_argument('--locations')
+    estimate_parser.add_argument('--location-table', action='append')
+    estimate_parser.add_argument('--location-key-bytes', type=int)
+    estimate_parser.add_argument('--hex', action='store_true')
+    estimate_parser.add_argument('--backend', default='auto', choices=['auto'] + list(BACKENDS))
+    estimate_parser.add_argument('--memory-budget', type=parse_size)
+    estimate_parser.add_argument('--time-limit', type=float)
+    estimate_parser.add_argument('--max-output', type=parse_size)
+    estimate_parser.add_argument('--window', type=parse_size, default=64 * 1024, help="Bytes per sampled window")
+    estimate_parser.add_argument('--windows', type=int, default=16, help="Number of sampled windows")
+    estimate_parser.add_argument('--seed', type=int, help="Seed for reproducible window choice")
+    estimate_parser.set_defaults(run=run_estimate)
+    
+    bench_parser = commands.add_parser('bench', help="Compare matching backends on a file")
+    bench_parser.add_argument('input')
+    bench_parser.add_argument('--rules', required=True)
+    bench_parser.add_argument('--hex', action='store_true')
+    bench_parser.add_argument('--repeat', type=int, default=3)
+    bench_parser.set_defaults(run=run_bench)
+    
+    analyze_parser = commands.add_parser('analyze', help="Find duplicate, shadowed and invalid rules")
+    analyze_parser.add_argument('--rules', required=True)
+    analyze_parser.add_argument('--write', help="Save the rules without the dead ones (same outputs) to this file")
+    analyze_parser.set_defaults(run=run_analyze)
+    
+    compare_parser = commands.add_parser('compare', help="Compare the matches of several rule sets on one file")
+    compare_parser.add_argument('input')
+    compare_parser.add_argument('--rules', action='append', required=True,
+                                help="Pattern rules JSON; give two or more, the first is the reference")
+    compare_parser.add_argument('--hex', action='store_true')
+    compare_parser.add_argument('--backend', default='auto', choices=['auto'] + list(BACKENDS))
+    compare_parser.add_argument('--limit', type=int, default=50, help="Differences listed per rule set")
+    compare_parser.set_defaults(run=run_compare)
+    
+    serve_parser = commands.add_parser('serve', help="Run a local JSON-RPC server keeping rule sets and inputs warm")
+    serve_parser.add_argument('--port', type=int, default=8765, help="Localhost HTTP port")
+    serve_parser.add_argument('--socket', help="Listen on this Unix socket instead")
+    serve_parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count, 0 runs requests inline)")
+    serve_parser.add_argument('--verbose', action='store_true', help="Log every request")
+    serve_parser.set_defaults(run=run_serve)
+    
+    args = parser.parse_args(argv)
+    if not args.profile:
+        args.run(args)
+        return
+    
+    from .profiling import ProfileCapture
+    capture = ProfileCapture(args.command, args.profile_dir, sampling_only=args.profile_mode == 'sampling')
+    try:
+        with capture:
+            args.run(args)
+    finally:
+        print(f"Profile: {capture.summary()}", file=sys.stderr)
+        for path in (capture.pstats_path, capture.folded_path):
+            if path:
+                print(f"  {path}", file=sys.stderr)
@@ -0,0 +1,143 @@
+import hashlib
+from collections import OrderedDict
+
+# Bytes of the input looked at to rank literal bytes by how often they occur
+RARITY_SAMPLE_BYTES = 64 * 1024
+
+
+def literal_runs(literal_positions, literal_values):
+    """Contiguous runs of literal bytes as (offset in the template, bytes)"""
+    runs = []
+    for position, value in zip(literal_positions, literal_values):
+        if runs and runs[-1][0] + len(runs[-1][1]) == position:
+            runs[-1] = (runs[-1][0], runs[-1][1] + bytes([value]))
+        else:
+            runs.append((position, bytes([value])))
+    return runs
+
+
+def byte_counts(data, values):
+    """Occurrences of each byte value in the start of data, plus one so unseen bytes rank rarest but not free"""
+    sample = bytes(data[:RARITY_SAMPLE_BYTES])
+    return {value: sample.count(bytes([value])) + 1 for value in set(values)}
+
+
+def choose_anchor(parsed, counts):
+    """Literal run expected to occur least often, searched with find() before the other checks"""
+    _, literal_positions, literal_values, _ = parsed
+    runs = literal_runs(literal_positions, literal_values)
+    if not runs:
+        return None
+    
+    def expected(run):
+        frequency = 1.0
+        for value in run[1]:
+            frequency *= counts[value] / RARITY_SAMPLE_BYTES
+        return frequency
+    
+    return min(runs, key=expected)
+
+
+def wildcard_runs(wildcard_positions):
+    """Contiguous wildcard positions as (start, end) offsets, sliced in one step each"""
+    runs = []
+    for position in wildcard_positions:
+        if runs and runs[-1][1] == position:
+            runs[-1] = (runs[-1][0], position + 1)
+        else:
+            runs.append((position, position + 1))
+    return runs
+
+
+def rule_source(number, parsed, anchor):
+    """Source lines finding left-most non-overlapping hits of one fixed-length template"""
+    length, literal_positions, literal_values, wildcard_positions = parsed
+    slices = ''.join(f"; wildcards += view[start + {start}:start + {end}]" for start, end in wildcard_runs(wildcard_positions))
+    lines = [f"    # Rule {number}: {length} bytes"]
+    
+    if anchor is None:
+        # Only wildcards: every aligned window matches
+        lines += [
+            f"    starts = list(range(0, size - {length - 1}, {length}))",
+            "    wildcards = bytearray()",
+            "    for start in starts:",
+            f"        pass{slices}",
+        ]
+    else:
+        anchor_offset, anchor_bytes = anchor
+        anchored = set(range(anchor_offset, anchor_offset + len(anchor_bytes)))
+        checks = [f"data[start + {position}] == {value}"
+                  for position, value in zip(literal_positions, literal_values) if position not in anchored]
+        condition = " and ".join(["start <= last"] + checks)
+        lines += [
+            "    starts = []",
+            "    wildcards = bytearray()",
+            f"    last = size - {length}",
+            f"    found = find({anchor_bytes!r}, {anchor_offset})",
+            "    while found != -1:",
+            f"        start = found - {anchor_offset}",
+            "        if start > last:",
+            "            break",
+            f"        if {condition}:",
+            f"            starts.append(start){slices}",
+            # The next hit may not overlap this one, as with re.finditer
+            f"            found = find({anchor_bytes!r}, start + {length + anchor_offset})",
+            "        else:",
+            f"            found = find({anchor_bytes!r}, found + 1)",
+        ]
+    lines.append("    results.append((starts, bytes(wildcards)))")
+    return lines
+
+
+def matcher_source(parsed_templates, anchors):
+    lines = [
+        "def match_rules(data):",
+        "    size = len(data)",
+        "    view = memoryview(data)",
+        "    find = data.find",
+        "    results = []",
+    ]
+    for number, (parsed, anchor) in enumerate(zip(parsed_templates, anchors)):
+        lines += rule_source(number, parsed, anchor)
+    lines.append("    return results")
+    return "\n".join(lines) + "\n"
+
+
+class MatcherCompiler:
+    """Generates one specialized Python function per rule set and caches it by fingerprint
+    
+    The function searches each rule's rarest literal run with find(), checks the
+    other literals at fixed offsets and slices wildcards from a memoryview, which
+    avoids the regex engine and its capture groups entirely.
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Fingerprint -> compiled match_rules function
+        self.verified = set()  # Fingerprints checked against the regex backend
+        self.rejected = set()  # Fingerprints whose output differed from the regex backend
+    
+    @staticmethod
+    def fingerprint(parsed_templates, anchors):
+        """Identifier of the generated code: templates and the anchors picked for them"""
+        key = repr([(parsed, anchor) for parsed, anchor in zip(parsed_templates, anchors)])
+        return hashlib.sha1(key.encode()).hexdigest()
+    
+    def compile(self, parsed_templates, data):
+        """(fingerprint, match_rules) for the templates, anchored on the bytes rarest in data"""
+        counts = byte_counts(data, [value for parsed in parsed_templates for value in parsed[2]])
+        anchors = [choose_anchor(parsed, counts) for parsed in parsed_templates]
+        fingerprint = self.fingerprint(parsed_templates, anchors)
+        
+        function = self.entries.get(fingerprint)
+        if function is not None:
+            self.entries.move_to_end(fingerprint)
+            return fingerprint, function
+        
+        namespace = {}
+        code = compile(matcher_source(parsed_templates, anchors), f"<hexengine matcher {fingerprint[:12]}>", "exec")
+        exec(code, namespace)
+        function = namespace["match_rules"]
+        self.entries[fingerprint] = function
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return fingerprint, function
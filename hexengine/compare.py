@@ -0,0 +1,86 @@
+from collections import Counter
+
+from .layout import HexLayout
+
+
+class MatchDifference:
+    """One input span replaced differently by two rule sets"""
+    ONLY_FIRST = "only first"  # Replaced by the first set only
+    ONLY_SECOND = "only second"
+    CHANGED = "changed"  # Replaced by both, with different text
+    
+    def __init__(self, kind, start, end, first=None, second=None):
+        self.kind = kind
+        self.start = start  # Text offsets in the canonical input
+        self.end = end
+        self.first = first  # MatchView in the first table, or None
+        self.second = second
+    
+    @property
+    def byte_offset(self):
+        return HexLayout.text_to_byte(self.start)
+    
+    @property
+    def byte_length(self):
+        return HexLayout.text_to_byte(self.end - self.start + 1)
+
+
+class MatchSetDiff:
+    """Difference between the replaced matches of two tables over the same input
+    
+    Only accepted rows (those that survive overlap resolution) are compared, so
+    the diff shows where the two outputs differ. Spans replaced by both sets are
+    rendered only when rule or wildcards differ, and count as changed only if
+    the replacement text differs.
+    """
+    def __init__(self, first, second, first_accepted=None, second_accepted=None):
+        self.first = first
+        self.second = second
+        self.first_accepted = first.replacement_order() if first_accepted is None else first_accepted
+        self.second_accepted = second.replacement_order() if second_accepted is None else second_accepted
+        self.same = 0  # Spans replaced by both with the same text
+        self.differences = []
+        self.compare()
+    
+    def compare(self):
+        first, second = self.first, self.second
+        first_rows, second_rows = self.first_accepted, self.second_accepted
+        i = j = 0
+        # Both row lists are in ascending, non-overlapping position order
+        while i < len(first_rows) or j < len(second_rows):
+            a = first_rows[i] if i < len(first_rows) else None
+            b = second_rows[j] if j < len(second_rows) else None
+            if b is None or a is not None and (first.starts[a], first.ends[a]) < (second.starts[b], second.ends[b]):
+                self.differences.append(MatchDifference(MatchDifference.ONLY_FIRST, first.starts[a], first.ends[a],
+                                                        first[a]))
+                i += 1
+            elif a is None or (second.starts[b], second.ends[b]) < (first.starts[a], first.ends[a]):
+                self.differences.append(MatchDifference(MatchDifference.ONLY_SECOND, second.starts[b], second.ends[b],
+                                                        second=second[b]))
+                j += 1
+            else:
+                if self.same_replacement(a, b):
+                    self.same += 1
+                else:
+                    self.differences.append(MatchDifference(MatchDifference.CHANGED, first.starts[a], first.ends[a],
+                                                            first[a], second[b]))
+                i += 1
+                j += 1
+    
+    def same_replacement(self, a, b):
+        first_rule = self.first.rules[self.first.rule_ids[a]]
+        second_rule = self.second.rules[self.second.rule_ids[b]]
+        if first_rule.replacement == second_rule.replacement and \
+                self.first.wildcard_bytes(a) == self.second.wildcard_bytes(b):
+            return True
+        return self.first[a].apply_replacement_template() == self.second[b].apply_replacement_template()
+    
+    def counts(self):
+        """Kind -> number of differences"""
+        return Counter(difference.kind for difference in self.differences)
+    
+    def summary(self):
+        """'12 same, 3 changed, 5 only first, 0 only second'"""
+        counts = self.counts()
+        kinds = (MatchDifference.CHANGED, MatchDifference.ONLY_FIRST, MatchDifference.ONLY_SECOND)
+        return ", ".join([f"{self.same} same"] + [f"{counts[kind]} {kind}" for kind in kinds])
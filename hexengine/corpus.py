@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .paths import APP_DATA_DIR
+from .layout import HexLayout, HexBuffer
+from .processor import HexProcessor
+from .rules import SimplePatternRule, load_rules_file
+
+# Default location of the corpus results store
+CORPUS_DB_FILE = os.path.join(APP_DATA_DIR, 'corpus.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    sha256 TEXT,
+    ruleset TEXT,
+    scanned_at REAL
+);
+CREATE TABLE IF NOT EXISTS rules (
+    ruleset TEXT NOT NULL,
+    rule_index INTEGER NOT NULL,
+    pattern_template TEXT NOT NULL,
+    replacement TEXT,
+    PRIMARY KEY (ruleset, rule_index)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    offset INTEGER NOT NULL,
+    rule_index INTEGER NOT NULL,
+    wildcards TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_matches_rule ON matches(rule_index, file_id);
+CREATE INDEX IF NOT EXISTS idx_matches_file ON matches(file_id, offset);
+CREATE INDEX IF NOT EXISTS idx_files_sha ON files(sha256);
+CREATE INDEX IF NOT EXISTS idx_rules_template ON rules(pattern_template);
+"""
+
+
+def ruleset_fingerprint(rules):
+    """Stable identifier of the matching behaviour of a rule set"""
+    templates = [' '.join(rule.pattern_template.split()).upper() for rule in rules]
+    return hashlib.sha256(json.dumps(templates).encode()).hexdigest()[:16]
+
+
+def file_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def scan_file(path, rules_data, known_sha256=None):
+    """Worker: read one file and return its hash plus (offset, rule index, wildcards) rows
+    
+    Rows are None when the content hash equals known_sha256.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    
+    sha256 = file_sha256(data)
+    if sha256 == known_sha256:
+        return sha256, None
+    
+    rules = [SimplePatternRule.from_dict(rule_data) for rule_data in rules_data]
+    table = HexProcessor().match_buffer(HexBuffer(data=data), rules)
+    
+    rows = [
+        (HexLayout.text_to_byte(table.starts[i]), table.rule_ids[i], ' '.join(table.wildcards(i)))
+        for i in range(len(table))
+    ]
+    return sha256, rows
+
+
+class CorpusStore:
+    """SQLite store of (file, offset, rule, wildcards) rows"""
+    def __init__(self, db_path=CORPUS_DB_FILE):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+    
+    def close(self):
+        self.connection.close()
+    
+    def register_rules(self, ruleset, rules):
+        """Record the templates of a rule set so matches can be queried by pattern"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO rules (ruleset, rule_index, pattern_template, replacement) VALUES (?, ?, ?, ?)",
+                [(ruleset, idx, ' '.join(rule.pattern_template.split()).upper(), rule.replacement)
+                 for idx, rule in enumerate(rules)]
+            )
+    
+    def file_state(self, path):
+        """Stored (size, mtime, sha256, ruleset) of a file, or None"""
+        return self.connection.execute(
+            "SELECT size, mtime, sha256, ruleset FROM files WHERE path = ?", (path,)
+        ).fetchone()
+    
+    def touch_file(self, path, size, mtime):
+        """Refresh stat data of a file whose content did not change"""
+        with self.connection:
+            self.connection.execute("UPDATE files SET size = ?, mtime = ? WHERE path = ?", (size, mtime, path))
+    
+    def store_results(self, path, size, mtime, sha256, ruleset, rows):
+        """Replace the matches of one file"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO files (path, size, mtime, sha256, ruleset, scanned_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+                "sha256 = excluded.sha256, ruleset = excluded.ruleset, scanned_at = excluded.scanned_at",
+                (path, size, mtime, sha256, ruleset, time.time())
+            )
+            file_id = self.connection.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()[0]
+            self.connection.execute("DELETE FROM matches WHERE file_id = ?", (file_id,))
+            self.connection.executemany(
+                "INSERT INTO matches (file_id, offset, rule_index, wildcards) VALUES (?, ?, ?, ?)",
+                [(file_id, offset, rule_index, wildcards) for offset, rule_index, wildcards in rows]
+            )
+    
+    def forget_missing(self, root, seen_paths):
+        """Drop files under root that no longer exist"""
+        prefix = os.path.join(os.path.abspath(root), '')
+        # An exact prefix compare: LIKE ignores ASCII case and treats _ and % in folder names as wildcards
+        stale = [
+            (path,) for (path,) in self.connection.execute("SELECT path FROM files WHERE substr(path, 1, ?) = ?",
+                                                           (len(prefix), prefix))
+            if path not in seen_paths
+        ]
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE path = ?", stale)
+        return len(stale)
+    
+    def files_with_pattern(self, pattern_template):
+        """(path, match count, first offset) of every file containing a pattern"""
+        template = ' '.join(pattern_template.split()).upper()
+        return self.connection.execute(
+            "SELECT f.path, COUNT(*), MIN(m.offset) FROM matches m "
+            "JOIN files f ON f.id = m.file_id "
+            "JOIN rules r ON r.ruleset = f.ruleset AND r.rule_index = m.rule_index "
+            "WHERE r.pattern_template = ? GROUP BY f.id ORDER BY f.path",
+            (template,)
+        ).fetchall()
+    
+    def matches_in_file(self, path, pattern_template=None, limit=None):
+        """(offset, pattern template, wildcards) rows of one file"""
+        query = (
+            "SELECT m.offset, r.pattern_template, m.wildcards FROM matches m "
+            "JOIN files f ON f.id = m.file_id "
+            "JOIN rules r ON r.ruleset = f.ruleset AND r.rule_index = m.rule_index "
+            "WHERE f.path = ?"
+        )
+        params = [path]
+        if pattern_template:
+            query += " AND r.pattern_template = ?"
+            params.append(' '.join(pattern_template.split()).upper())
+        query += " ORDER BY m.offset"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self.connection.execute(query, params).fetchall()
+    
+    def indexed_patterns(self):
+        """Templates that have results in the store"""
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT r.pattern_template FROM rules r JOIN files f ON f.ruleset = r.ruleset ORDER BY 1"
+        )]
+
+
+class CorpusScanner:
+    """Walk a directory and scan every file with a rule set using a worker pool"""
+    def __init__(self, store, rules, workers=None):
+        self.store = store
+        self.rules = list(rules)
+        self.workers = workers or os.cpu_count()
+        self.ruleset = ruleset_fingerprint(self.rules)
+    
+    def iter_files(self, root):
+        for directory, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                yield os.path.abspath(os.path.join(directory, filename))
+    
+    def known_hash(self, path, stat):
+        """(needs scan, stored hash usable to skip an unchanged file)"""
+        state = self.store.file_state(path)
+        if state is None or state[3] != self.ruleset:
+            return True, None
+        size, mtime, sha256, _ = state
+        return size != stat.st_size or mtime != stat.st_mtime, sha256
+    
+    def scan(self, root, progress=None):
+        """Scan new and changed files under root; returns (scanned, unchanged, failed) counts"""
+        self.store.register_rules(self.ruleset, self.rules)
+        rules_data = [rule.to_dict() for rule in self.rules]
+        
+        seen_paths = set()
+        pending = {}
+        skipped = 0
+        for path in self.iter_files(root):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            seen_paths.add(path)
+            needs_scan, sha256 = self.known_hash(path, stat)
+            if needs_scan:
+                pending[path] = (stat, sha256)
+            else:
+                skipped += 1
+        
+        self.store.forget_missing(root, seen_paths)
+        
+        scanned = failed = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(scan_file, path, rules_data, known_sha256): path
+                for path, (_, known_sha256) in pending.items()
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                stat = pending[path][0]
+                try:
+                    sha256, rows = future.result()
+                except Exception as e:
+                    print(f"Error scanning {path}: {str(e)}")
+                    failed += 1
+                    continue
+                
+                if rows is None:
+                    # Touched but identical content: keep the stored matches
+                    self.store.touch_file(path, stat.st_size, stat.st_mtime)
+                    skipped += 1
+                else:
+                    self.store.store_results(path, stat.st_size, stat.st_mtime, sha256, self.ruleset, rows)
+                    scanned += 1
+                
+                if progress:
+                    progress(done, len(pending), path)
+        
+        return scanned, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search a corpus of binaries with saved pattern rules")
+    parser.add_argument('--db', default=CORPUS_DB_FILE, help="SQLite results store")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    scan_parser = commands.add_parser('scan', help="Scan a directory with a rule file")
+    scan_parser.add_argument('directory')
+    scan_parser.add_argument('rules', help="Rules JSON saved from the pattern rules panel")
+    scan_parser.add_argument('--workers', type=int, default=None)
+    
+    query_parser = commands.add_parser('query', help="List files containing a pattern")
+    query_parser.add_argument('pattern', help="Pattern template, e.g. '## 2A ##'")
+    query_parser.add_argument('--matches', action='store_true', help="Also list each match")
+    
+    args = parser.parse_args()
+    store = CorpusStore(args.db)
+    try:
+        if args.command == 'scan':
+            scanner = CorpusScanner(store, load_rules_file(args.rules), args.workers)
+            scanned, skipped, failed = scanner.scan(args.directory)
+            print(f"Scanned {scanned} files, {skipped} unchanged, {failed} failed")
+        else:
+            for path, count, first_offset in store.files_with_pattern(args.pattern):
+                print(f"{path}\t{count}\t0x{first_offset:X}")
+                if args.matches:
+                    for offset, _, wildcards in store.matches_in_file(path, args.pattern):
+                        print(f"    0x{offset:X}\t{wildcards}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
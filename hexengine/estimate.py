@@ -0,0 +1,208 @@
+import random
+import time
+import tracemalloc
+from collections import Counter
+
+from .accounting import estimate_pipeline_memory, format_size
+from .layout import HexLayout, HexBuffer
+
+# Bytes of MatchTable columns per match (start, end, rule id, wildcard offset); each wildcard adds one
+MATCH_ROW_BYTES = 28
+
+
+class CharCounter:
+    """Write target that only counts characters, standing in for an output file"""
+    def __init__(self):
+        self.chars = 0
+    
+    def write(self, text):
+        self.chars += len(text)
+
+
+class RuleEstimate:
+    """Extrapolated cost of one pattern rule over the whole input"""
+    def __init__(self, rule):
+        self.rule = rule
+        self.matches = 0  # Accepted matches (after overlap resolution)
+        self.output_delta = 0  # Characters the replacements add to the output, negative if they shrink it
+        self.seconds = 0.0  # Time to match this rule alone
+        self.memory = 0  # Match table rows and rendered replacements held for this rule
+
+
+class RunEstimate:
+    """Extrapolated cost of running the pipeline over an input, from sampled windows"""
+    def __init__(self, input_bytes, sampled_bytes, text_free):
+        self.input_bytes = input_bytes
+        self.sampled_bytes = sampled_bytes
+        self.text_free = text_free  # The run would match from raw bytes (input over the memory budget)
+        self.seconds = 0.0
+        self.peak_memory = 0
+        self.intermediate_chars = 0
+        self.final_chars = 0
+        self.rules = []  # RuleEstimate per pattern rule, in rule order
+    
+    @property
+    def exact(self):
+        """True when the whole input was sampled, so the figures are measured rather than extrapolated"""
+        return self.sampled_bytes >= self.input_bytes
+    
+    def problems(self, memory_budget=None, time_limit=None, max_output=None):
+        """Reasons the run should not go ahead unattended; empty if it fits every given limit"""
+        problems = []
+        if memory_budget is not None and self.peak_memory > memory_budget:
+            problems.append(f"peak memory ~{format_size(self.peak_memory)} exceeds the budget of {format_size(memory_budget)}")
+        if time_limit is not None and self.seconds > time_limit:
+            problems.append(f"run time ~{self.seconds:.1f} s exceeds the limit of {time_limit:g} s")
+        if max_output is not None and self.final_chars > max_output:
+            problems.append(f"output ~{format_size(self.final_chars)} exceeds the limit of {format_size(max_output)}")
+        return problems
+    
+    def summary(self):
+        """Multi-line report: totals, then one line per rule"""
+        basis = "measured" if self.exact else f"extrapolated from {format_size(self.sampled_bytes)}"
+        mode = "streamed from bytes" if self.text_free else "in memory"
+        lines = [
+            f"Input {format_size(self.input_bytes)}, {mode}, {basis}",
+            f"Time ~{self.seconds:.2f} s, peak memory ~{format_size(self.peak_memory)}",
+            f"Output ~{format_size(self.intermediate_chars)} intermediate, ~{format_size(self.final_chars)} final",
+        ]
+        for number, rule_estimate in enumerate(self.rules, 1):
+            lines.append(f"  #{number} {rule_estimate.rule.pattern_template}: ~{rule_estimate.matches:,} matches, "
+                         f"{rule_estimate.output_delta:+,} chars, {rule_estimate.seconds * 1000:.1f} ms, "
+                         f"{format_size(rule_estimate.memory)}")
+        return "\n".join(lines)
+
+
+class CostEstimator:
+    """Run the rule set over random windows of an input and scale the results to the whole input
+    
+    Windows are whole, non-overlapping slices of the raw bytes; matches crossing a
+    window edge are lost, which is negligible while windows are much longer than matches.
+    """
+    def __init__(self, processor, window_bytes=64 * 1024, windows=16, seed=None):
+        self.processor = processor  # Decides the backend, the memory budget and so the run mode
+        self.window_bytes = window_bytes
+        self.windows = windows
+        self.random = random.Random(seed)
+    
+    @property
+    def sample_bytes(self):
+        """Inputs up to this size are run whole, so their estimate is exact"""
+        return self.window_bytes * self.windows
+    
+    def sample_offsets(self, input_bytes):
+        if input_bytes <= self.sample_bytes:
+            return [0]
+        slots = input_bytes // self.window_bytes
+        return sorted(slot * self.window_bytes for slot in self.random.sample(range(slots), self.windows))
+    
+    def run_window(self, window, pattern_rules, location_rules, text_free):
+        """Run one window through the same pipeline as the full run; returns (intermediate, final) lengths"""
+        if text_free:
+            intermediate_out, final_out = CharCounter(), CharCounter()
+            self.processor.process_hex_stream(window, pattern_rules, location_rules, intermediate_out, final_out)
+            return intermediate_out.chars, final_out.chars
+        intermediate, final = self.processor.process_hex_data(HexLayout.from_bytes(window), pattern_rules, location_rules)
+        return len(intermediate), len(final)
+    
+    def estimate(self, data, pattern_rules, location_rules=None, trace_memory=True):
+        """RunEstimate of processing raw bytes (or an mmap) with these rules
+        
+        trace_memory measures the in-memory peak with tracemalloc instead of
+        using the fixed per-byte estimate.
+        """
+        processor = self.processor
+        input_bytes = len(data)
+        text_free = processor.exceeds_budget(input_bytes)
+        sorted_patterns = sorted(pattern_rules, key=lambda r: (r.priority, pattern_rules.index(r)))
+        
+        offsets = self.sample_offsets(input_bytes)
+        window_bytes = self.window_bytes if len(offsets) > 1 else input_bytes
+        windows = [data[offset:offset + window_bytes] for offset in offsets]
+        sampled_bytes = sum(len(window) for window in windows)
+        result = RunEstimate(input_bytes, sampled_bytes, text_free)
+        if not sampled_bytes:
+            return result
+        
+        # The sample runs must not show up as stages of the caller's profile
+        profiler, processor.profiler = processor.profiler, None
+        try:
+            self.measure(result, windows, pattern_rules, sorted_patterns, location_rules, trace_memory)
+        finally:
+            processor.profiler = profiler
+        
+        # Everything grows linearly with the input
+        scale = input_bytes / sampled_bytes
+        result.seconds *= scale
+        result.intermediate_chars = int(result.intermediate_chars * scale)
+        result.final_chars = int(result.final_chars * scale)
+        for rule_estimate in result.rules:
+            rule_estimate.matches = int(rule_estimate.matches * scale)
+            rule_estimate.output_delta = int(rule_estimate.output_delta * scale)
+            rule_estimate.seconds *= scale
+            rule_estimate.memory = int(rule_estimate.memory * scale)
+        
+        if text_free:
+            # Streaming holds the match table and rendered replacements plus a fixed write buffer
+            # (two pending piece lists and their joined strings), which must not be scaled
+            result.peak_memory = (sum(rule_estimate.memory for rule_estimate in result.rules)
+                                  + 4 * processor.STREAM_WRITE_CHARS)
+        elif trace_memory:
+            # The window peak covers the text, matches and results of one window
+            result.peak_memory = int(result.peak_memory / window_bytes * input_bytes)
+        else:
+            result.peak_memory = estimate_pipeline_memory(input_bytes)
+        return result
+    
+    def measure(self, result, windows, pattern_rules, sorted_patterns, location_rules, trace_memory):
+        """Fill result with totals over the sampled windows"""
+        processor = self.processor
+        text_free = result.text_free
+        
+        # Whole pipeline per window: time and output size
+        for window in windows:
+            started = time.perf_counter()
+            intermediate_chars, final_chars = self.run_window(window, pattern_rules, location_rules, text_free)
+            result.seconds += time.perf_counter() - started
+            result.intermediate_chars += intermediate_chars
+            result.final_chars += final_chars
+        
+        # Peak memory in a separate pass since tracing slows everything down
+        if trace_memory and not text_free:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            for window in windows:
+                tracemalloc.reset_peak()
+                start_usage = tracemalloc.get_traced_memory()[0]
+                self.run_window(window, pattern_rules, location_rules, text_free)
+                result.peak_memory = max(result.peak_memory, tracemalloc.get_traced_memory()[1] - start_usage)
+            if started_tracing:
+                tracemalloc.stop()
+        
+        # Matches and output of each rule, counted after overlap resolution
+        rule_estimates = {id(rule): RuleEstimate(rule) for rule in pattern_rules}
+        buffers = [HexBuffer(data=window) if text_free else HexBuffer(text=HexLayout.from_bytes(window))
+                   for window in windows]
+        for buffer in buffers:
+            table = processor.match_buffer(buffer, sorted_patterns, text_free=text_free)
+            accepted = table.replacement_order()
+            for index, replacement in zip(accepted, processor.render_replacements(table, accepted)):
+                rule_estimate = rule_estimates[id(table.rules[table.rule_ids[index]])]
+                rule_estimate.matches += 1
+                rule_estimate.output_delta += len(replacement) - (table.ends[index] - table.starts[index])
+                rule_estimate.memory += len(replacement)
+            
+            # Every row stays in the table, including matches that lost to overlapping ones
+            for rule_id, rows in Counter(table.rule_ids).items():
+                rule = table.rules[rule_id]
+                rule_estimates[id(rule)].memory += rows * (MATCH_ROW_BYTES + rule.get_wildcard_count())
+        
+        # Each rule alone, for its share of the matching time
+        for rule in sorted_patterns:
+            started = time.perf_counter()
+            for buffer in buffers:
+                processor.match_buffer(buffer, [rule], text_free=text_free)
+            rule_estimates[id(rule)].seconds = time.perf_counter() - started
+        
+        result.rules = [rule_estimates[id(rule)] for rule in pattern_rules]
@@ -0,0 +1,57 @@
+import bisect
+from array import array
+
+
+class HighlightRanges:
+    """Highlighted character ranges per tag, merged as they are added
+    
+    Ranges of one tag are kept sorted and disjoint, so a viewer can tag just the
+    part of its text on screen instead of handing every match to the widget.
+    """
+    def __init__(self):
+        self.starts = {}  # Tag -> array of range starts
+        self.ends = {}  # Tag -> array of range ends
+    
+    def __len__(self):
+        return sum(len(starts) for starts in self.starts.values())
+    
+    @property
+    def tags(self):
+        return list(self.starts)
+    
+    def add(self, tag, start, end, join_gap=0):
+        """Add a range at or after the previous range of the tag
+        
+        A range starting within join_gap characters of the previous one extends it,
+        so e.g. adjacent byte matches separated by one space become one range.
+        Ranges starting inside the previous one (overlapping matches) extend it too.
+        """
+        starts = self.starts.get(tag)
+        if starts is None:
+            self.starts[tag] = array('q', [start])
+            self.ends[tag] = array('q', [end])
+            return
+        
+        ends = self.ends[tag]
+        last_end = ends[-1]
+        if start - last_end <= join_gap:
+            ends[-1] = max(last_end, end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    
+    def discard(self, tag):
+        """Drop every range of a tag"""
+        self.starts.pop(tag, None)
+        self.ends.pop(tag, None)
+    
+    def window(self, tag, start, end):
+        """(start, end) ranges of a tag overlapping [start, end), clipped to it"""
+        starts, ends = self.starts.get(tag), self.ends.get(tag)
+        if not starts:
+            return []
+        
+        # Ends are sorted too since the ranges are disjoint
+        first = bisect.bisect_right(ends, start)
+        last = bisect.bisect_left(starts, end, first)
+        return [(max(starts[i], start), min(ends[i], end)) for i in range(first, last)]
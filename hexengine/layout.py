@@ -0,0 +1,110 @@
+import re
+
+
+class HexLayout:
+    """Canonical 'XX XX XX' text layout where byte N always starts at text offset 3N"""
+    BYTE_WIDTH = 3  # Two hex digits plus one separating space
+    CANONICAL_CHARS = re.compile(r"[0-9A-F ]*")
+    
+    @classmethod
+    def is_canonical(cls, text):
+        """True if text is already in the canonical layout, checked without rebuilding it"""
+        separators = text[2::cls.BYTE_WIDTH]
+        return ((not text or len(text) % cls.BYTE_WIDTH != 0)
+                and text.count(' ') == len(separators) and not separators.strip(' ')
+                and cls.CANONICAL_CHARS.fullmatch(text) is not None)
+    
+    @classmethod
+    def canonicalize(cls, text):
+        """Normalize free-form hex text into the canonical upper-case layout"""
+        if cls.is_canonical(text):
+            return text  # Text from the input widget is normally canonical already
+        digits = ''.join(text.split()).upper()
+        if not re.fullmatch(r"[0-9A-F]*", digits):
+            raise ValueError("Input contains non-hex characters")
+        # A trailing odd nibble is kept as its own token so typing stays possible
+        return ' '.join(digits[i:i + 2] for i in range(0, len(digits), 2))
+    
+    @staticmethod
+    def from_bytes(data):
+        """Format raw bytes in the canonical layout"""
+        return data.hex(' ').upper()
+    
+    @staticmethod
+    def to_bytes(text):
+        """Parse canonical text back to bytes, ignoring an incomplete trailing nibble"""
+        digits = text.replace(' ', '')
+        return bytes.fromhex(digits[:len(digits) - len(digits) % 2])
+    
+    @classmethod
+    def byte_to_text(cls, byte_offset):
+        """Text offset of the first digit of a byte"""
+        return byte_offset * cls.BYTE_WIDTH
+    
+    @classmethod
+    def text_to_byte(cls, text_offset):
+        """Byte containing the character at a text offset"""
+        return text_offset // cls.BYTE_WIDTH
+    
+    @classmethod
+    def byte_end_to_text(cls, byte_end):
+        """Text offset just past the last digit of the byte before byte_end"""
+        return max(byte_end * cls.BYTE_WIDTH - 1, 0)
+    
+    @classmethod
+    def text_slice(cls, data, start, end):
+        """Canonical text of data between two text offsets, formatting only the bytes it covers"""
+        end = min(end, cls.byte_end_to_text(len(data)))
+        if start >= end:
+            return ''
+        first_byte = cls.text_to_byte(start)
+        last_byte = cls.text_to_byte(end - 1) + 1
+        block = data[first_byte:last_byte].hex(' ').upper()
+        if last_byte < len(data):
+            block += ' '  # Separator before the next byte
+        block_start = cls.byte_to_text(first_byte)
+        return block[start - block_start:end - block_start]
+    
+    @classmethod
+    def iter_text(cls, data, start=0, end=None, block_size=1 << 20):
+        """Yield the canonical text of data between two text offsets, a block of bytes at a time"""
+        total = cls.byte_end_to_text(len(data))
+        end = total if end is None else min(end, total)
+        block_chars = block_size * cls.BYTE_WIDTH
+        for block_start in range(start, end, block_chars):
+            yield cls.text_slice(data, block_start, min(block_start + block_chars, end))
+    
+    @staticmethod
+    def digit_count(text):
+        """Number of hex digits in free-form text, used to carry the cursor across normalization"""
+        return sum(1 for char in text if not char.isspace())
+    
+    @classmethod
+    def digits_to_text(cls, digits):
+        """Canonical text offset of the given number of hex digits"""
+        return (digits // 2) * cls.BYTE_WIDTH + digits % 2
+
+
+class HexBuffer:
+    """One input as canonical text and raw bytes, each derived on first use"""
+    def __init__(self, text=None, data=None):
+        self._text = text
+        self._data = data
+    
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = HexLayout.from_bytes(self._data)
+        return self._text
+    
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = HexLayout.to_bytes(self._text)
+        return self._data
+    
+    def __len__(self):
+        """Size in bytes"""
+        if self._data is not None:
+            return len(self._data)
+        return HexLayout.text_to_byte(len(self._text) + 1)
@@ -0,0 +1,149 @@
+import bisect
+from array import array
+from collections import OrderedDict
+
+from .layout import HexLayout
+
+
+class RenderedBatches:
+    """Replacement text of the accepted matches, rendered a batch at a time and cached"""
+    def __init__(self, processor, table, batch_size=4096, max_batches=64, accepted=None):
+        self.processor = processor
+        self.table = table
+        self.accepted = table.replacement_order() if accepted is None else accepted
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.cache = OrderedDict()  # Batch number -> (rows, replacements), least recently used first
+    
+    @property
+    def batch_count(self):
+        return -(-len(self.accepted) // self.batch_size)
+    
+    def batch(self, number):
+        """(rows, replacement texts) of one batch, in ascending position"""
+        cached = self.cache.get(number)
+        if cached is not None:
+            self.cache.move_to_end(number)
+            return cached
+        
+        rows = self.accepted[number * self.batch_size:(number + 1) * self.batch_size]
+        cached = (rows, self.processor.render_replacements(self.table, rows))
+        self.cache[number] = cached
+        if len(self.cache) > self.max_batches:
+            self.cache.popitem(last=False)
+        return cached
+
+
+class LazyOutput:
+    """Output text of the pipeline produced on demand for any range of output offsets
+    
+    A checkpoint at the start of every batch of matches records where the batch
+    begins in the source and in the output, so a segment is built from the nearest
+    checkpoint instead of from the start. Checkpoints are added as far as the
+    furthest segment requested so far.
+    """
+    def __init__(self, source, batches, location_map=None):
+        self.source = source  # Canonical text, or raw bytes formatted on demand
+        if isinstance(source, str):
+            self.source_length = len(source)
+        else:
+            self.source_length = HexLayout.byte_end_to_text(len(source))
+        self.batches = batches
+        self.location_map = location_map or {}  # Location text inserted before replacements (final output)
+        self.checkpoint_output = array('q', [0])
+        self.checkpoint_source = array('q', [0])
+        self.length = None  # Total output length, known once every batch has been measured
+    
+    def source_text(self, start, end):
+        if isinstance(self.source, str):
+            return self.source[start:end]
+        return HexLayout.text_slice(self.source, start, end)
+    
+    def pieces(self, number):
+        """Output pieces of one batch: replacement strings, or (start, end) source ranges for the gaps
+        
+        The batch after the last one is the unchanged tail of the source.
+        """
+        table = self.batches.table
+        previous_end = self.checkpoint_source[number]
+        if number == self.batches.batch_count:
+            yield (previous_end, self.source_length)
+            return
+        
+        rows, replacements = self.batches.batch(number)
+        for index, replacement in zip(rows, replacements):
+            yield (previous_end, table.starts[index])
+            if self.location_map:
+                location_value = table.location_value(index)
+                if location_value in self.location_map:
+                    yield self.location_map[location_value]
+            yield replacement
+            previous_end = table.ends[index]
+    
+    @staticmethod
+    def piece_length(piece):
+        if isinstance(piece, str):
+            return len(piece)
+        return piece[1] - piece[0]
+    
+    def restore_checkpoints(self, output_offsets, source_offsets):
+        """Adopt checkpoints measured earlier over the same source and batches, e.g. from a saved session"""
+        self.checkpoint_output = array('q', output_offsets)
+        self.checkpoint_source = array('q', source_offsets)
+        if len(self.checkpoint_output) > self.batches.batch_count + 1:
+            self.length = self.checkpoint_output[-1]
+    
+    def advance(self):
+        """Measure the next batch and add the checkpoint after it; False once everything is measured"""
+        number = len(self.checkpoint_output) - 1
+        if number > self.batches.batch_count:
+            return False
+        
+        output_length = self.checkpoint_output[number] + sum(self.piece_length(piece) for piece in self.pieces(number))
+        if number == self.batches.batch_count:
+            self.length = output_length
+            self.checkpoint_output.append(output_length)
+            self.checkpoint_source.append(self.source_length)
+            return True
+        
+        rows = self.batches.batch(number)[0]
+        self.checkpoint_output.append(output_length)
+        self.checkpoint_source.append(self.batches.table.ends[rows[-1]])
+        return True
+    
+    def segment(self, start, end):
+        """Output text between two output offsets, computing only the batches it covers"""
+        while self.checkpoint_output[-1] <= start and self.advance():
+            pass
+        number = max(bisect.bisect_right(self.checkpoint_output, start) - 1, 0)
+        position = self.checkpoint_output[number]
+        
+        parts = []
+        while position < end and number <= self.batches.batch_count:
+            if number + 1 >= len(self.checkpoint_output):
+                self.advance()
+            for piece in self.pieces(number):
+                piece_end = position + self.piece_length(piece)
+                if piece_end > start:
+                    low, high = max(start - position, 0), min(end, piece_end) - position
+                    if isinstance(piece, str):
+                        parts.append(piece[low:high])
+                    else:
+                        parts.append(self.source_text(piece[0] + low, piece[0] + high))
+                position = piece_end
+                if position >= end:
+                    break
+            number += 1
+        return ''.join(parts)
+    
+    def estimated_length(self):
+        """Total output length if known, else extrapolated from the part measured so far"""
+        if self.length is not None:
+            return self.length
+        measured_source = self.checkpoint_source[-1]
+        ratio = self.checkpoint_output[-1] / measured_source if measured_source else 1
+        return self.checkpoint_output[-1] + int((self.source_length - measured_source) * ratio)
+    
+    def text(self):
+        """The whole output as one string"""
+        return self.segment(0, float('inf'))
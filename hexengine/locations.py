@@ -0,0 +1,173 @@
+import bisect
+import csv
+import hashlib
+import os
+import pickle
+import re
+from array import array
+
+from .paths import APP_DATA_DIR
+
+# Built indexes, reused while their source file is unchanged
+LOCATION_INDEX_DIR = os.path.join(APP_DATA_DIR, 'locations')
+
+HEX_KEY = re.compile(r"(?:0x)?([0-9A-Fa-f]+)h?")
+
+
+def parse_key(text):
+    """Hex digits of a key written as '401000', '0x401000', '40 10 00' or '401000h', or None"""
+    match = HEX_KEY.fullmatch(text.strip().replace(" ", "").replace("_", ""))
+    return match.group(1).upper() if match else None
+
+
+def read_table_entries(path):
+    """(hex digits, text) pairs of a CSV table or a symbol listing
+    
+    CSV files hold key,value rows; a row whose key is not hex (such as a header)
+    is skipped. Other files are symbol listings such as nm or linker map output:
+    the first field of a line is the address and the last one the symbol.
+    """
+    entries = []
+    with open(path, 'r', newline='', errors='replace') as file:
+        if path.lower().endswith('.csv'):
+            for row in csv.reader(file):
+                if len(row) >= 2:
+                    key = parse_key(row[0])
+                    if key is not None and row[1]:
+                        entries.append((key, row[1]))
+        else:
+            for line in file:
+                fields = line.split()
+                if len(fields) >= 2:
+                    key = parse_key(fields[0])
+                    if key is not None:
+                        entries.append((key, fields[-1]))
+    return entries
+
+
+class LocationIndex:
+    """Read-only location table: key bytes -> text, as sorted key arrays searched with bisect
+    
+    Keys of each width (in bytes) sit in their own sorted array('Q') with the
+    start of each text in one shared string, so 100k entries cost a few MB
+    instead of a dict of Python strings. Keys wider than 8 bytes do not fit an
+    array('Q') and go to a plain dict instead. Lookups take the same hex strings
+    as the location map built from location rules, so both can be chained.
+    """
+    CACHE_VERSION = 2  # Part of the cache file identity; bumped when the pickled layout changes
+    
+    def __init__(self, entries=(), key_bytes=None, source_path=None):
+        self.source_path = source_path
+        self.key_bytes = key_bytes  # Width keys are padded to; None keeps each key's own width
+        self.tables = {}  # Width -> (sorted keys, text starts with one extra end offset)
+        self.values = ""
+        self.wide = {}  # Padded hex digits -> text of keys wider than 8 bytes
+        self.build(entries)
+    
+    def key_width(self, digits):
+        """Width in bytes a key of hex digits is stored and looked up at"""
+        return max((len(digits) + 1) // 2, self.key_bytes or 0)
+    
+    def build(self, entries):
+        by_width = {}
+        for digits, text in entries:
+            width = self.key_width(digits)
+            value = int(digits, 16)
+            if width > 8:
+                self.wide[f"{value:0{width * 2}X}"] = text
+            else:
+                by_width.setdefault(width, {})[value] = text  # Later rows override earlier ones
+        
+        pieces = []
+        length = 0
+        for width, mapping in sorted(by_width.items()):
+            keys = array('Q', sorted(mapping))
+            starts = array('q')
+            for key in keys:
+                starts.append(length)
+                text = mapping[key]
+                pieces.append(text)
+                length += len(text)
+            starts.append(length)
+            self.tables[width] = (keys, starts)
+        self.values = "".join(pieces)
+    
+    @classmethod
+    def from_file(cls, path, key_bytes=None, cache_dir=None):
+        """Index of a CSV or symbol file, loaded from the cache while the file is unchanged
+        
+        Without key_bytes, keys are padded to the widest key of the file so
+        '401000' and '00401000' are the same address.
+        """
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{key_bytes}|{cls.CACHE_VERSION}"
+        cache_dir = cache_dir or LOCATION_INDEX_DIR
+        cache_path = os.path.join(cache_dir, hashlib.sha1(identity.encode()).hexdigest()[:16] + ".pkl")
+        try:
+            if os.path.exists(cache_path):
+                with open(cache_path, 'rb') as f:
+                    index = pickle.load(f)
+                index.source_path = path
+                return index
+        except Exception as e:
+            print(f"Error loading location index: {str(e)}")
+        
+        entries = read_table_entries(path)
+        width = key_bytes
+        if width is None and entries:
+            width = max((len(digits) + 1) // 2 for digits, _ in entries)
+        index = cls(entries, width, path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(index, f)
+        except Exception as e:
+            print(f"Error saving location index: {str(e)}")
+        return index
+    
+    def find(self, key):
+        """Text of a hex key, or None"""
+        if key is None:
+            return None
+        digits = key.replace(" ", "")
+        try:
+            value = int(digits, 16)
+        except ValueError:
+            return None
+        width = self.key_width(digits)
+        if width > 8:
+            return self.wide.get(f"{value:0{width * 2}X}")
+        table = self.tables.get(width)
+        if table is None:
+            return None
+        keys, starts = table
+        i = bisect.bisect_left(keys, value)
+        if i < len(keys) and keys[i] == value:
+            return self.values[starts[i]:starts[i + 1]]
+        return None
+    
+    def __contains__(self, key):
+        return self.find(key) is not None
+    
+    def __getitem__(self, key):
+        text = self.find(key)
+        if text is None:
+            raise KeyError(key)
+        return text
+    
+    def get(self, key, default=None):
+        text = self.find(key)
+        return default if text is None else text
+    
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.tables.values()) + len(self.wide)
+    
+    def __iter__(self):
+        for width, (keys, _) in sorted(self.tables.items()):
+            for key in keys:
+                yield f"{key:0{width * 2}X}"
+        yield from self.wide
+    
+    @property
+    def name(self):
+        return os.path.basename(self.source_path) if self.source_path else "table"
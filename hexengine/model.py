@@ -0,0 +1,118 @@
+from .layout import HexLayout
+from .lazy import RenderedBatches, LazyOutput
+
+
+class DocumentModel:
+    """Observable editor state: views subscribe to the parts they show and refresh only when those change
+    
+    Changes mark parts dirty; flush() then notifies each observer whose parts
+    are dirty once, so a burst of edits costs one refresh.
+    """
+    INPUT = "input"  # Input hex text
+    PATTERNS = "patterns"  # Pattern rules: templates, replacements, priorities
+    LOCATIONS = "locations"  # Location rules and the location wildcard of each pattern rule
+    DISPLAY = "display"  # Rule colors and other presentation-only settings
+    
+    def __init__(self, on_dirty=None):
+        self.input_text = ""
+        self.pattern_rules = []
+        self.location_rules = []
+        self.dirty = set()
+        self.observers = []  # (parts, callback)
+        self.on_dirty = on_dirty  # Called when the model first becomes dirty, e.g. to schedule flush()
+    
+    def subscribe(self, parts, callback):
+        """Call callback(dirty_parts) on flush whenever any of parts changed"""
+        self.observers.append((frozenset(parts), callback))
+    
+    def mark(self, *parts):
+        was_clean = not self.dirty
+        self.dirty.update(parts)
+        if was_clean and self.dirty and self.on_dirty is not None:
+            self.on_dirty()
+    
+    def set_input(self, text):
+        if text != self.input_text:
+            self.input_text = text
+            self.mark(self.INPUT)
+    
+    def set_pattern_rules(self, rules, part=PATTERNS):
+        """Store the rule list; part says what changed (PATTERNS, LOCATIONS or DISPLAY)"""
+        self.pattern_rules = rules
+        self.mark(part)
+    
+    def set_location_rules(self, rules):
+        self.location_rules = rules
+        self.mark(self.LOCATIONS)
+    
+    def flush(self):
+        """Notify observers of everything changed since the last flush; returns the dirty parts"""
+        dirty, self.dirty = self.dirty, set()
+        for parts, callback in self.observers:
+            if parts & dirty:
+                callback(dirty)
+        return dirty
+
+
+class DocumentPipeline:
+    """Lazy outputs of a DocumentModel, rerunning only the stages whose inputs changed"""
+    def __init__(self, processor):
+        self.processor = processor
+        self.source = None  # Matched input (text, or bytes when over the memory budget)
+        self.batches = None  # RenderedBatches of the current match table
+        self.intermediate = None
+        self.final = None
+        self.text_free = False  # True when the last match ran from raw bytes
+        self.restored = False  # Batches were restored for the current input and rules; skip the next match
+        self.checkpoints = {}  # Saved LazyOutput checkpoints by output name ("intermediate", "final")
+    
+    def invalidate(self):
+        self.batches = None
+        self.restored = False
+    
+    def restore(self, model, table, accepted=None, checkpoints=None):
+        """Adopt a saved match table of the model's input and rules so the next refresh does not match again"""
+        input_data = HexLayout.canonicalize(model.input_text)
+        self.text_free = self.processor.exceeds_budget(HexLayout.text_to_byte(len(input_data) + 1))
+        self.source = HexLayout.to_bytes(input_data) if self.text_free else input_data
+        self.batches = RenderedBatches(self.processor, table, accepted=accepted)
+        self.intermediate = self.final = None
+        self.restored = True
+        self.checkpoints = checkpoints or {}
+    
+    def with_checkpoints(self, name, output):
+        if name in self.checkpoints:
+            output.restore_checkpoints(*self.checkpoints.pop(name))
+        return output
+    
+    def refresh(self, model, dirty):
+        """Bring the outputs up to date; returns (intermediate changed, final changed)
+        
+        Raises ValueError for input that is not hex.
+        """
+        if not model.input_text:
+            self.source = self.batches = self.intermediate = self.final = None
+            return True, True
+        
+        if self.batches is None or dirty & {model.INPUT, model.PATTERNS} and not self.restored:
+            input_data = model.input_text
+            self.batches = self.intermediate = None  # Nothing stale survives a failed match
+            # Inputs past the memory budget are matched from raw bytes so no full text is built
+            self.text_free = self.processor.exceeds_budget(HexLayout.text_to_byte(len(input_data) + 1))
+            if self.text_free:
+                with self.processor.stage("decode"):
+                    input_data = HexLayout.to_bytes(HexLayout.canonicalize(input_data))
+            self.source, self.batches = self.processor.prepare_lazy(input_data, model.pattern_rules, self.text_free)
+        
+        self.restored = False
+        
+        intermediate_changed = self.intermediate is None
+        if intermediate_changed:
+            self.intermediate = self.with_checkpoints("intermediate", LazyOutput(self.source, self.batches))
+        
+        final_changed = intermediate_changed or model.LOCATIONS in dirty
+        if final_changed:
+            final = self.processor.lazy_final(self.source, self.batches, model.location_rules)
+            self.final = self.with_checkpoints("final", final)
+        self.checkpoints = {}
+        return intermediate_changed, final_changed
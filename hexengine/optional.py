@@ -0,0 +1,34 @@
+import importlib
+import importlib.util
+
+
+class OptionalModule:
+    """Stand-in for an optional dependency, imported on first attribute access
+    
+    Importing NumPy costs more than the rest of the engine together, so modules
+    that can use it hold one of these instead and only pay for it on the paths
+    that really call into it.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+        self.installed = None  # Unknown until asked
+    
+    def available(self):
+        """True if the module can be imported; checked without importing it"""
+        if self.installed is None:
+            self.installed = self.module is not None or importlib.util.find_spec(self.name) is not None
+        return self.installed
+    
+    def load(self):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+            self.installed = True
+        return self.module
+    
+    def __getattr__(self, attribute):
+        # Only called for attributes not set in __init__, i.e. those of the module
+        return getattr(self.load(), attribute)
+
+
+numpy = OptionalModule("numpy")
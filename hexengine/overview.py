@@ -0,0 +1,143 @@
+import math
+from collections import Counter
+
+from .layout import HexLayout
+from .optional import numpy as np
+
+
+def shannon_entropy(counts):
+    """Bits per byte (0 to 8) of a 256-entry byte histogram"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    return -sum(count / total * math.log2(count / total) for count in counts if count)
+
+
+def entropy_rows(histograms):
+    """shannon_entropy of every row of a (rows, 256) NumPy histogram array at once"""
+    totals = histograms.sum(axis=1, keepdims=True)
+    shares = histograms / np.maximum(totals, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.where(shares > 0, np.log2(shares), 0.0)
+    return np.maximum(-(shares * logs).sum(axis=1), 0.0)
+
+
+class OverviewRows:
+    """Entropy, byte histogram and match count of consecutive byte ranges, one row per minimap bin"""
+    def __init__(self, starts, ends, entropy, matches, histograms):
+        self.starts = starts  # Byte offsets
+        self.ends = ends
+        self.entropy = entropy  # Bits per byte
+        self.matches = matches  # Match starts in the range
+        self.histograms = histograms  # One 256-entry histogram per row
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def row_at(self, byte_offset):
+        """Row containing a byte offset, clamped to the first and last row"""
+        for row in range(len(self)):
+            if byte_offset < self.ends[row]:
+                return row
+        return len(self) - 1
+    
+    def density(self, row):
+        """Matches per KB of a row"""
+        length = self.ends[row] - self.starts[row]
+        return self.matches[row] * 1024 / length if length else 0.0
+
+
+class ChunkSummaries:
+    """Byte histogram and match count of every fixed-size chunk of an input, computed once
+    
+    Views at any zoom level add up the histograms of the chunks they cover, so
+    zooming or panning never reads the input again, and new rules only recount
+    matches. With NumPy the histograms are kept as running totals, making the
+    sum over any chunk range one subtraction. Chunks grow for large inputs so
+    the totals stay a few MB.
+    """
+    CHUNK_BYTES = 4096
+    MAX_CHUNKS = 8192  # 16 MB of running totals
+    
+    def __init__(self, data, chunk_bytes=None):
+        self.size = len(data)
+        if chunk_bytes is None:
+            chunk_bytes = self.CHUNK_BYTES
+            while self.size > chunk_bytes * self.MAX_CHUNKS:
+                chunk_bytes *= 2
+        self.chunk_bytes = chunk_bytes
+        self.chunk_count = -(-self.size // chunk_bytes)
+        self.use_numpy = np.available()
+        self.histograms = None  # Without NumPy: a 256-entry list per chunk
+        self.cumulative = None  # With NumPy: (chunks + 1, 256) byte counts of all chunks before each one
+        self.match_counts = None  # Match starts per chunk; running totals with NumPy
+        self.build(data)
+        self.set_matches(None)
+    
+    def build(self, data):
+        if not self.use_numpy:
+            self.histograms = []
+            for start in range(0, self.size, self.chunk_bytes):
+                counts = Counter(data[start:start + self.chunk_bytes])
+                self.histograms.append([counts.get(value, 0) for value in range(256)])
+            return
+        
+        histograms = np.zeros((self.chunk_count, 256), dtype=np.uint32)
+        values = np.frombuffer(data, dtype=np.uint8, count=self.size) if self.size else np.zeros(0, np.uint8)
+        # A bincount per chunk over uint8 beats one bincount of (chunk, value) keys, which needs an int index array
+        for chunk in range(self.chunk_count):
+            start = chunk * self.chunk_bytes
+            histograms[chunk] = np.bincount(values[start:start + self.chunk_bytes], minlength=256)
+        self.cumulative = np.zeros((self.chunk_count + 1, 256), dtype=np.int64)
+        np.cumsum(histograms, axis=0, out=self.cumulative[1:])
+    
+    def set_matches(self, table):
+        """Count the matches of a MatchTable (or none) per chunk; the histograms are kept"""
+        if self.use_numpy:
+            counts = np.zeros(self.chunk_count, dtype=np.int64)
+            if table is not None and len(table) and self.chunk_count:
+                chunks = np.frombuffer(table.starts, dtype=np.int64) // HexLayout.BYTE_WIDTH // self.chunk_bytes
+                counts += np.bincount(np.minimum(chunks, self.chunk_count - 1), minlength=self.chunk_count)
+            self.match_counts = np.concatenate(([0], np.cumsum(counts)))
+            return
+        
+        self.match_counts = [0] * self.chunk_count
+        for start in (table.starts if table is not None else ()):
+            chunk = min(HexLayout.text_to_byte(start) // self.chunk_bytes, self.chunk_count - 1)
+            self.match_counts[chunk] += 1
+    
+    def chunk_range(self, start, end):
+        """Chunks covering bytes start to end"""
+        first = min(max(start, 0) // self.chunk_bytes, self.chunk_count)
+        last = min(-(-min(end, self.size) // self.chunk_bytes), self.chunk_count)
+        return first, max(last, first)
+    
+    def aggregate(self, start=0, end=None, bins=256):
+        """OverviewRows of at most bins rows over bytes start to end, widened to whole chunks"""
+        first, last = self.chunk_range(start, self.size if end is None else end)
+        bins = max(min(bins, last - first), 0)
+        # Bin edges in chunks, as even as whole chunks allow
+        edges = [first + (last - first) * row // bins for row in range(bins + 1)] if bins else [first]
+        starts = [edge * self.chunk_bytes for edge in edges[:-1]]
+        ends = [min(edge * self.chunk_bytes, self.size) for edge in edges[1:]]
+        if not bins:
+            return OverviewRows(starts, ends, [], [], [])
+        
+        if self.use_numpy:
+            edges = np.asarray(edges)
+            histograms = self.cumulative[edges[1:]] - self.cumulative[edges[:-1]]
+            matches = self.match_counts[edges[1:]] - self.match_counts[edges[:-1]]
+            return OverviewRows(starts, ends, entropy_rows(histograms).tolist(), matches.tolist(), histograms)
+        
+        histograms, matches = [], []
+        for low, high in zip(edges, edges[1:]):
+            histograms.append([sum(column) for column in zip(*self.histograms[low:high])])
+            matches.append(sum(self.match_counts[low:high]))
+        return OverviewRows(starts, ends, [shannon_entropy(counts) for counts in histograms], matches, histograms)
+    
+    def histogram(self, start=0, end=None):
+        """256 byte counts over bytes start to end, widened to whole chunks"""
+        first, last = self.chunk_range(start, self.size if end is None else end)
+        if self.use_numpy:
+            return (self.cumulative[last] - self.cumulative[first]).tolist()
+        return [sum(column) for column in zip(*self.histograms[first:last])] or [0] * 256
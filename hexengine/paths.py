@@ -0,0 +1,13 @@
+import os
+
+# Paths for storing application settings and engine caches
+APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.hex_manipulator')
+SETTINGS_FILE = os.path.join(APP_DATA_DIR, 'settings.pkl')
+CHUNK_CACHE_FILE = os.path.join(APP_DATA_DIR, 'chunk_cache.pkl')
+SESSIONS_DIR = os.path.join(APP_DATA_DIR, 'sessions')  # Default folder of session snapshots
+
+
+def ensure_app_data_dir():
+    """Create the data directory on first write; importing the engine never touches the disk"""
+    os.makedirs(APP_DATA_DIR, exist_ok=True)
+    return APP_DATA_DIR
@@ -0,0 +1,159 @@
+import re
+import functools
+
+HEX_DIGIT = "[0-9A-Fa-f]"
+TOKEN = re.compile(r"\(([^()]*)\)|(\S+)")
+GAP = re.compile(r"##\{(\d+)(?:,(\d+))?\}")
+MASK = re.compile(r"([0-9A-Fa-f]{2})&([0-9A-Fa-f]{2})")
+NIBBLE = re.compile(r"([0-9A-Fa-f?])([0-9A-Fa-f?])")
+
+
+class ByteSet:
+    """One byte position matching every value v with v & mask == value"""
+    def __init__(self, value, mask):
+        self.mask = mask
+        self.value = value & mask
+    
+    @classmethod
+    def parse(cls, token):
+        """'2A', '?A', 'A?' or '2A&F0', or None if the token is none of these"""
+        mask_match = MASK.fullmatch(token)
+        if mask_match:
+            return cls(int(mask_match.group(1), 16), int(mask_match.group(2), 16))
+        nibble_match = NIBBLE.fullmatch(token)
+        if nibble_match:
+            high, low = nibble_match.groups()
+            value = (0 if high == "?" else int(high, 16) << 4) | (0 if low == "?" else int(low, 16))
+            mask = (0 if high == "?" else 0xF0) | (0 if low == "?" else 0x0F)
+            return cls(value, mask)
+        return None
+    
+    def values(self):
+        return [v for v in range(256) if v & self.mask == self.value]
+    
+    def text_regex(self):
+        if self.mask == 0xFF:
+            return f"{self.value:02X}"
+        if self.mask & 0xF0 in (0, 0xF0) and self.mask & 0x0F in (0, 0x0F):
+            high = f"{self.value >> 4:X}" if self.mask & 0xF0 else HEX_DIGIT
+            low = f"{self.value & 0x0F:X}" if self.mask & 0x0F else HEX_DIGIT
+            return high + low
+        return "(?:" + "|".join(f"{v:02X}" for v in self.values()) + ")"
+    
+    def bytes_regex(self):
+        if self.mask == 0:
+            return b"."
+        values = self.values()
+        if len(values) == 1:
+            return re.escape(bytes(values))
+        return b"[" + b"".join(re.escape(bytes([v])) for v in values) + b"]"
+
+
+class PatternTemplate:
+    """Parsed pattern template; every element stands for a bounded number of bytes
+    
+    Syntax, tokens separated by spaces:
+        2A          literal byte
+        ##          any byte, captured as the next wildcard (#1, #2, ...)
+        ?A, A?, ??  nibble wildcards (?? is any byte, not captured)
+        2A&F0       byte whose masked bits equal those of 2A
+        (2A|2B 00)  alternatives of the tokens above
+        ##{2,8}     gap of 2 to 8 bytes (##{4} for exactly 4), not captured
+    Only the first two are fixed-offset bytes for the fast backends; the others
+    compile to regexes of character classes and bounded repeats, which the regex
+    engine runs in time linear in the input.
+    """
+    def __init__(self, template):
+        self.template = template
+        self.elements = []  # ("capture",), ("bytes", ByteSet), ("choice", [[ByteSet, ...], ...]) or ("gap", low, high)
+        
+        for token in TOKEN.finditer(template):
+            if token.group(1) is not None:
+                alternatives = [self.parse_sequence(text.split(), token.group(0)) for text in token.group(1).split("|")]
+                self.elements.append(("choice", alternatives))
+            elif token.group(2) == "##":
+                self.elements.append(("capture",))
+            else:
+                gap = GAP.fullmatch(token.group(2))
+                if gap:
+                    low = int(gap.group(1))
+                    high = int(gap.group(2)) if gap.group(2) is not None else low
+                    if high < low or high == 0:
+                        raise ValueError(f"Invalid gap {token.group(2)}")
+                    self.elements.append(("gap", low, high))
+                else:
+                    self.elements.append(("bytes", self.parse_sequence([token.group(2)], token.group(2))[0]))
+        
+        if self.elements and (self.elements[0][0] == "gap" and self.elements[0][1] == 0
+                              or self.elements[-1][0] == "gap" and self.elements[-1][1] == 0):
+            raise ValueError("A gap at either end of a pattern needs a minimum of at least 1")
+    
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def parse(cls, template):
+        """Cached constructor so each distinct template is parsed only once"""
+        return cls(template)
+    
+    @staticmethod
+    def parse_sequence(tokens, context):
+        sequence = [ByteSet.parse(token) for token in tokens]
+        if not sequence or None in sequence:
+            raise ValueError(f"Invalid pattern token {context}")
+        return sequence
+    
+    @property
+    def wildcard_count(self):
+        return sum(1 for element in self.elements if element[0] == "capture")
+    
+    def text_regex(self):
+        """Regex over canonical hex text; wildcards are groups of two hex digits"""
+        pieces = []
+        for element in self.elements:
+            kind = element[0]
+            if kind == "gap":
+                # Every gap byte brings its own separator
+                low, high = element[1], element[2]
+                piece = f"(?:{HEX_DIGIT}{{2}} ){{{low},{high}}}"
+                pieces.append(("gap", piece))
+                continue
+            if kind == "capture":
+                piece = f"({HEX_DIGIT}{{2}})"
+            elif kind == "bytes":
+                piece = element[1].text_regex()
+            else:
+                piece = "(?:" + "|".join(" ".join(byte.text_regex() for byte in alternative)
+                                         for alternative in element[1]) + ")"
+            pieces.append(("bytes", piece))
+        
+        regex = ""
+        for index, (kind, piece) in enumerate(pieces):
+            if kind == "gap" or index == len(pieces) - 1:
+                regex += piece
+            else:
+                regex += piece + " "
+        # A trailing gap carries a separator the last byte does not have
+        if pieces and pieces[-1][0] == "gap":
+            regex = regex[:-len(pieces[-1][1])] + self.trailing_gap(*self.elements[-1][1:])
+        # Canonical input has exactly one space between bytes; the guards keep
+        # matches aligned to byte boundaries
+        return r"(?<![0-9A-Fa-f])" + regex + r"(?![0-9A-Fa-f])"
+    
+    @staticmethod
+    def trailing_gap(low, high):
+        return f"(?:{HEX_DIGIT}{{2}} ){{{low - 1},{high - 1}}}{HEX_DIGIT}{{2}}"
+    
+    def bytes_regex(self):
+        """Regex over the raw bytes (use with re.DOTALL); wildcards are one-byte groups"""
+        pieces = []
+        for element in self.elements:
+            kind = element[0]
+            if kind == "capture":
+                pieces.append(b"(.)")
+            elif kind == "gap":
+                pieces.append(b".{%d,%d}" % (element[1], element[2]))
+            elif kind == "bytes":
+                pieces.append(element[1].bytes_regex())
+            else:
+                pieces.append(b"(?:" + b"|".join(b"".join(byte.bytes_regex() for byte in alternative)
+                                                for alternative in element[1]) + b")")
+        return b"".join(pieces)
@@ -0,0 +1,379 @@
+import re
+import tempfile
+from collections import ChainMap
+from contextlib import nullcontext
+
+from .accounting import estimate_pipeline_memory
+from .layout import HexLayout, HexBuffer
+from .rules import pattern_to_regex
+from .table import MatchTable, LocationSpans
+from .backends import (TextRegexBackend, BytesRegexBackend, GroupedPrefixBackend, NUMPY_MIN_BYTES, get_backend,
+                       select_backend)
+from .templates import ReplacementTemplate
+from .replacements import ReplacementPlan
+from .locations import LocationIndex
+from .lazy import RenderedBatches, LazyOutput
+
+
+class HexProcessor:
+    """Clean hex processing engine shared by both GUIs, the CLI and batch tools"""
+    CHUNK_CACHE_MIN_BYTES = 256 * 1024  # Below this a full scan is cheaper than chunking
+    STREAM_WRITE_CHARS = 1 << 20  # Output buffered between writes in streaming mode
+    
+    def __init__(self, backend="auto", chunk_cache=None, fuse_replacements=True, memory_budget=None):
+        self.backend = backend  # "auto" or a name from backends.BACKENDS
+        self.chunk_cache = chunk_cache  # Optional ChunkMatchCache reused across runs
+        self.last_backend = None  # Name of the backend used by the last scan
+        self.fuse_replacements = fuse_replacements  # Single pass for simple rules that cannot interact
+        self.replacement_plan = None  # ReplacementPlan of the last simple rule list, reused while unchanged
+        self.replacement_plan_key = None
+        self.memory_budget = memory_budget  # Bytes; larger inputs should go through process_hex_stream
+        self.profiler = None  # Optional StageProfiler recording each stage
+    
+    def resolve_backend(self, buffer, rule_count):
+        """Backend instance for this input, chosen from size and rule count in auto mode"""
+        name = self.backend
+        if name == "auto":
+            name = select_backend(len(buffer), rule_count)
+        return get_backend(name)
+    
+    def stage(self, name):
+        """Profiler context for a pipeline stage, or a no-op without a profiler"""
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+    
+    def exceeds_budget(self, byte_count):
+        """True if the in-memory pipeline for this input would not fit the memory budget"""
+        return self.memory_budget is not None and estimate_pipeline_memory(byte_count) > self.memory_budget
+    
+    def process_hex_data(self, input_data, pattern_rules, location_rules=None):
+        """Process hex data with pattern and location rules"""
+        # Normalize once so matching and offsets can rely on the canonical layout
+        with self.stage("normalize"):
+            input_data = HexLayout.canonicalize(input_data)
+        
+        # Sort pattern rules by priority
+        sorted_patterns = sorted(pattern_rules, key=lambda r: (r.priority, pattern_rules.index(r)))
+        
+        # Stage 1: Find all pattern matches
+        with self.stage("match"):
+            match_table = self.find_all_pattern_matches(input_data, sorted_patterns)
+        
+        # Stage 2: Apply pattern replacements and track positions
+        with self.stage("replace"):
+            intermediate_result, location_spans = self.apply_pattern_replacements(input_data, match_table)
+        
+        # Stage 3: Apply location rules using tracked positions
+        with self.stage("locations"):
+            final_result = self.apply_location_rules(intermediate_result, location_spans, location_rules)
+        
+        return intermediate_result, final_result
+    
+    def process_hex_lazy(self, input_data, pattern_rules, location_rules=None, text_free=False):
+        """Match now, but produce the intermediate and final outputs only as segments are requested
+        
+        input_data is hex text, or raw bytes with text_free so the canonical text is never built.
+        Returns (intermediate, final) LazyOutput objects sharing one set of rendered replacements.
+        """
+        source, batches = self.prepare_lazy(input_data, pattern_rules, text_free)
+        return LazyOutput(source, batches), self.lazy_final(source, batches, location_rules)
+    
+    def prepare_lazy(self, input_data, pattern_rules, text_free=False):
+        """Match stage of process_hex_lazy: (source, RenderedBatches) that outputs can be built from"""
+        if text_free:
+            buffer = HexBuffer(data=input_data)
+        else:
+            with self.stage("normalize"):
+                buffer = HexBuffer(text=HexLayout.canonicalize(input_data))
+        
+        sorted_patterns = sorted(pattern_rules, key=lambda r: (r.priority, pattern_rules.index(r)))
+        
+        with self.stage("match"):
+            match_table = self.match_buffer(buffer, sorted_patterns, text_free=text_free)
+        
+        source = buffer.data if text_free else buffer.text
+        return source, RenderedBatches(self, match_table)
+    
+    def lazy_final(self, source, batches, location_rules):
+        """Final output over already matched input; location rule edits only need this step"""
+        return LazyOutput(source, batches, self.build_location_map(location_rules))
+    
+    def match_rule_sets(self, buffer, rule_sets, text_free=False):
+        """One MatchTable per rule set from a single scan with the union of their templates
+        
+        Each set is sorted by priority as in the single-set pipeline. A template
+        used by several sets is matched once and its rows are copied into the
+        table of every set using it, so each table is what match_buffer would
+        have produced for its set alone.
+        """
+        sorted_sets = [sorted(rules, key=lambda r: (r.priority, rules.index(r))) for rules in rule_sets]
+        union_rules = []
+        union_ids = {}  # Normalized template -> rule id in the union table
+        source_ids = []
+        for rules in sorted_sets:
+            ids = []
+            for rule in rules:
+                key = " ".join(rule.pattern_template.split()).upper()
+                if key not in union_ids:
+                    union_ids[key] = len(union_rules)
+                    union_rules.append(rule)
+                ids.append(union_ids[key])
+            source_ids.append(ids)
+        
+        union_table = self.match_buffer(buffer, union_rules, text_free=text_free)
+        rows_by_rule = union_table.rows_by_rule()
+        return [union_table.take_rules(rules, ids, rows_by_rule) for rules, ids in zip(sorted_sets, source_ids)]
+    
+    def process_rule_sets(self, input_data, rule_sets, location_rules=None):
+        """process_hex_data for several pattern rule sets over one input, matched in one scan
+        
+        Returns one (intermediate, final, match table) per rule set, in order.
+        """
+        with self.stage("normalize"):
+            input_data = HexLayout.canonicalize(input_data)
+        
+        with self.stage("match"):
+            tables = self.match_rule_sets(HexBuffer(text=input_data), rule_sets)
+        
+        results = []
+        for table in tables:
+            with self.stage("replace"):
+                intermediate_result, location_spans = self.apply_pattern_replacements(input_data, table)
+            with self.stage("locations"):
+                final_result = self.apply_location_rules(intermediate_result, location_spans, location_rules)
+            results.append((intermediate_result, final_result, table))
+        return results
+    
+    def prepare_lazy_sets(self, input_data, rule_sets, text_free=False):
+        """prepare_lazy for several rule sets sharing one scan: (source, one RenderedBatches per set)"""
+        if text_free:
+            buffer = HexBuffer(data=input_data)
+        else:
+            with self.stage("normalize"):
+                buffer = HexBuffer(text=HexLayout.canonicalize(input_data))
+        
+        with self.stage("match"):
+            tables = self.match_rule_sets(buffer, rule_sets, text_free=text_free)
+        
+        source = buffer.data if text_free else buffer.text
+        return source, [RenderedBatches(self, table) for table in tables]
+    
+    def process_hex_stream(self, data, pattern_rules, location_rules, intermediate_out, final_out):
+        """Same pipeline over raw bytes, writing both results to text files instead of building strings
+        
+        Neither the canonical input text nor either result is held in memory, so
+        data can be an mmap of a file larger than the memory budget.
+        """
+        sorted_patterns = sorted(pattern_rules, key=lambda r: (r.priority, pattern_rules.index(r)))
+        
+        with self.stage("match"):
+            match_table = self.match_buffer(HexBuffer(data=data), sorted_patterns, text_free=True)
+        
+        with self.stage("replace"):
+            accepted = match_table.replacement_order()
+            replacements = self.render_replacements(match_table, accepted)
+            location_map = self.build_location_map(location_rules)
+            
+            # Pieces are batched so each file sees a few large writes
+            intermediate_pieces, final_pieces = [], []
+            buffered = 0
+            previous_end = 0
+            for index, replacement in zip(accepted, replacements):
+                start_pos = match_table.starts[index]
+                if start_pos - previous_end < self.STREAM_WRITE_CHARS:
+                    pieces = (HexLayout.text_slice(data, previous_end, start_pos),)
+                else:
+                    pieces = HexLayout.iter_text(data, previous_end, start_pos)
+                for piece in pieces:
+                    intermediate_pieces.append(piece)
+                    final_pieces.append(piece)
+                    buffered += len(piece)
+                
+                # Location text goes in front of the replacement, as in apply_location_rules
+                location_value = match_table.location_value(index)
+                if location_value is not None and location_value in location_map:
+                    final_pieces.append(location_map[location_value])
+                
+                intermediate_pieces.append(replacement)
+                final_pieces.append(replacement)
+                buffered += len(replacement)
+                previous_end = match_table.ends[index]
+                
+                if buffered >= self.STREAM_WRITE_CHARS:
+                    intermediate_out.write(''.join(intermediate_pieces))
+                    final_out.write(''.join(final_pieces))
+                    intermediate_pieces, final_pieces = [], []
+                    buffered = 0
+            
+            intermediate_out.write(''.join(intermediate_pieces))
+            final_out.write(''.join(final_pieces))
+            for piece in HexLayout.iter_text(data, previous_end):
+                intermediate_out.write(piece)
+                final_out.write(piece)
+    
+    def process_hex_spilled(self, data, pattern_rules, location_rules=None):
+        """Run process_hex_stream into temporary files that spill to disk past the memory budget
+        
+        Returns (intermediate, final) file objects positioned at the start.
+        """
+        spool_size = self.memory_budget // 4 if self.memory_budget else 0
+        intermediate_out = tempfile.SpooledTemporaryFile(max_size=spool_size, mode='w+')
+        final_out = tempfile.SpooledTemporaryFile(max_size=spool_size, mode='w+')
+        self.process_hex_stream(data, pattern_rules, location_rules, intermediate_out, final_out)
+        intermediate_out.seek(0)
+        final_out.seek(0)
+        return intermediate_out, final_out
+    
+    def process_replacements(self, input_data, replacement_rules):
+        """Apply simple [pattern, replacement] rules with the semantics of running them in sequence"""
+        # Normalize once so patterns only need single spaces between bytes
+        result = HexLayout.canonicalize(input_data)
+        
+        if not self.fuse_replacements:
+            for pattern, replacement in replacement_rules:
+                processed_replacement = self._process_escape_sequences(replacement)
+                result = re.sub(pattern_to_regex(pattern), processed_replacement, result)
+            return result
+        
+        return self.get_replacement_plan(replacement_rules).apply(result)
+    
+    def get_replacement_plan(self, replacement_rules):
+        """Analyze the rule list once and reuse the plan until the rules change"""
+        rules_key = [tuple(rule) for rule in replacement_rules]
+        if self.replacement_plan is None or self.replacement_plan_key != rules_key:
+            self.replacement_plan = ReplacementPlan(rules_key, self._process_escape_sequences)
+            self.replacement_plan_key = rules_key
+        return self.replacement_plan
+    
+    def _process_escape_sequences(self, text):
+        """Process escape sequences in replacement text"""
+        result = text
+        result = result.replace('\\n', '\n')  # Newline
+        result = result.replace('\\t', '\t')  # Tab character
+        result = result.replace('\\r', '\r')  # Carriage return
+        
+        return result
+    
+    def find_all_pattern_matches(self, text, pattern_rules):
+        """Find all pattern matches of canonical text into a columnar MatchTable"""
+        return self.match_buffer(HexBuffer(text=text), pattern_rules)
+    
+    def match_buffer(self, buffer, pattern_rules, text_free=False):
+        """Find all pattern matches of a HexBuffer (text or raw bytes) into a MatchTable
+        
+        With text_free the canonical text is never built: only byte backends run, and
+        templates none of them can express are skipped since they cannot match whole bytes.
+        """
+        table = MatchTable(pattern_rules)
+        remaining = list(range(len(pattern_rules)))
+        
+        if self.chunk_cache is not None and len(buffer) >= self.CHUNK_CACHE_MIN_BYTES:
+            handled = set(self.chunk_cache.find_matches(buffer.data, pattern_rules, table, remaining))
+            remaining = [rule_id for rule_id in remaining if rule_id not in handled]
+        
+        # Rules sharing a literal prefix are cheaper to find together, one scan per prefix
+        grouped = []
+        if self.backend == "auto" and len(buffer) >= NUMPY_MIN_BYTES and len(remaining) > 1:
+            grouped = set(GroupedPrefixBackend().add_matches(table, buffer, remaining))
+            remaining = [rule_id for rule_id in remaining if rule_id not in grouped]
+        
+        backend = self.resolve_backend(buffer, len(remaining))
+        if text_free and backend.name == "regex":
+            backend = get_backend("bytes")
+        self.last_backend = f"grouped+{backend.name}" if grouped else backend.name
+        if remaining:
+            handled = set(backend.add_matches(table, buffer, remaining))
+            remaining = [rule_id for rule_id in remaining if rule_id not in handled]
+            if backend.note:
+                self.last_backend += f" ({backend.note})"
+        
+        # Templates a fast backend cannot express still go through the text regex,
+        # or the bytes regex when the text is not to be built
+        if remaining:
+            if text_free:
+                BytesRegexBackend().add_matches(table, buffer, remaining)
+            else:
+                TextRegexBackend().add_matches(table, buffer, remaining)
+        
+        return table
+    
+    def apply_pattern_replacements(self, text, table):
+        """Apply pattern replacements in one left-to-right pass and track positions for location processing"""
+        accepted = table.replacement_order()
+        replacements = self.render_replacements(table, accepted)
+        
+        pieces = []
+        output_length = 0
+        previous_end = 0
+        # Track where each location-enabled replacement ended up
+        location_spans = LocationSpans()
+        
+        for index, replacement in zip(accepted, replacements):
+            start_pos = table.starts[index]
+            unchanged = text[previous_end:start_pos]
+            pieces.append(unchanged)
+            pieces.append(replacement)
+            output_length += len(unchanged)
+            
+            location_value = table.location_value(index)
+            if location_value is not None:
+                location_spans.append(output_length, output_length + len(replacement), location_value)
+            
+            output_length += len(replacement)
+            previous_end = table.ends[index]
+        
+        pieces.append(text[previous_end:])
+        return ''.join(pieces), location_spans
+    
+    def render_replacements(self, table, indices):
+        """Render replacement text for the given rows, one batch per rule"""
+        replacements = [None] * len(indices)
+        positions_by_rule = {}
+        for position, index in enumerate(indices):
+            positions_by_rule.setdefault(table.rule_ids[index], []).append(position)
+        
+        for rule_id, positions in positions_by_rule.items():
+            template = ReplacementTemplate.parse(table.rules[rule_id].replacement)
+            rendered = template.render_all([table.wildcards(indices[position]) for position in positions])
+            for position, text in zip(positions, rendered):
+                replacements[position] = text
+        
+        return replacements
+    
+    def build_location_map(self, location_rules):
+        """Location value -> text to insert, for rules with both fields set
+        
+        Location rules are (find, replace) pairs or LocationIndex tables; the
+        pairs take precedence over the tables, which are looked up in place.
+        """
+        location_map = {}
+        tables = []
+        for location_rule in location_rules or []:
+            if isinstance(location_rule, LocationIndex):
+                tables.append(location_rule)
+                continue
+            find_text, replace_text = location_rule
+            if find_text and replace_text:
+                # Composite keys may be written with spaces between their bytes
+                location_map[find_text.upper().replace(" ", "")] = replace_text
+        if tables:
+            return ChainMap(location_map, *tables)
+        return location_map
+    
+    def apply_location_rules(self, text, location_spans, location_rules):
+        """Insert location text in front of each tracked replacement in one pass"""
+        if not location_rules or not len(location_spans):
+            return text
+        
+        location_map = self.build_location_map(location_rules)
+        
+        pieces = []
+        previous_start = 0
+        for start_pos, location_value in zip(location_spans.starts, location_spans.values):
+            location_replacement = location_map.get(location_value)
+            if location_replacement is not None:
+                pieces.append(text[previous_start:start_pos])
+                pieces.append(location_replacement)
+                previous_start = start_pos
+        
+        pieces.append(text[previous_start:])
+        return ''.join(pieces)
@@ -0,0 +1,102 @@
+import re
+
+from .rules import pattern_to_regex
+
+HEX_TOKEN = re.compile(r"[0-9A-Fa-f]+")
+
+
+def contains(outer, inner):
+    """True if inner occurs as a contiguous run of outer (strings or token lists)"""
+    if isinstance(outer, str):
+        return inner in outer
+    return any(outer[i:i + len(inner)] == inner for i in range(len(outer) - len(inner) + 1))
+
+
+def overlaps(first, second):
+    """True if the two sequences could share elements when both occur in one text"""
+    if contains(first, second) or contains(second, first):
+        return True
+    # A proper suffix of one equal to a proper prefix of the other
+    for size in range(1, min(len(first), len(second))):
+        if first[-size:] == second[:size] or second[-size:] == first[:size]:
+            return True
+    return False
+
+
+def pattern_units(pattern_text):
+    """Units two matches of this pattern can share: whole tokens for hex-only patterns, else characters"""
+    tokens = pattern_text.split(' ')
+    # The byte-boundary guards keep matches of hex-only patterns on whole hex runs
+    if all(HEX_TOKEN.fullmatch(token) for token in tokens):
+        return tokens
+    return pattern_text
+
+
+class ReplacementPlan:
+    """Simple [pattern, replacement] rules prepared for one fused pass when they cannot interact"""
+    def __init__(self, replacement_rules, escape=lambda text: text):
+        self.rules = [(pattern, escape(replacement)) for pattern, replacement in replacement_rules]
+        self.regexes = [pattern_to_regex(pattern) for pattern, _ in self.rules]
+        self.combined = None
+        self.dispatch = {}
+        self.reason = self.analyze()
+    
+    def analyze(self):
+        """Build the combined regex and dispatch table; returns why the rules must run in sequence, or None"""
+        pattern_texts = [' '.join(pattern.split()) for pattern, _ in self.rules]
+        expanded = []
+        
+        for pattern_text, regex, (_, replacement) in zip(pattern_texts, self.regexes, self.rules):
+            if not pattern_text:
+                return "empty pattern"
+            try:
+                # Literal patterns always match their own text, so the expansion is the same for every match
+                expanded.append(re.fullmatch(regex, pattern_text).expand(replacement))
+            except re.error:
+                return "invalid replacement"
+        
+        # Sequential order matters only if an earlier rule can take text a later one would match,
+        # or its replacement can complete a match for a later rule
+        live = []
+        for index, pattern_text in enumerate(pattern_texts):
+            for earlier in live:
+                if overlaps(expanded[earlier], pattern_text):
+                    return f"replacement of rule {earlier + 1} can create matches for rule {index + 1}"
+            if any(pattern_texts[earlier] == pattern_text for earlier in live):
+                continue  # An exact duplicate never matches after the first copy has run
+            for earlier in live:
+                if self.patterns_overlap(pattern_texts[earlier], pattern_text):
+                    return f"patterns of rules {earlier + 1} and {index + 1} overlap"
+            live.append(index)
+        
+        if not live:
+            return None
+        # Patterns are literal and never overlap, so the matched text alone picks the replacement;
+        # the byte-boundary guards are shared so the scan tests them once per position
+        alternation = '|'.join(re.escape(pattern_texts[index]) for index in live)
+        self.combined = re.compile(rf"(?<![0-9A-Fa-f])(?:{alternation})(?![0-9A-Fa-f])")
+        self.dispatch = {pattern_texts[index]: expanded[index] for index in live}
+        return None
+    
+    @staticmethod
+    def patterns_overlap(first, second):
+        first_units, second_units = pattern_units(first), pattern_units(second)
+        if type(first_units) is not type(second_units):
+            return overlaps(first, second)
+        return overlaps(first_units, second_units)
+    
+    @property
+    def fused(self):
+        return self.reason is None
+    
+    def apply(self, text):
+        """Substitute all rules, in one pass when possible"""
+        if self.fused:
+            if self.combined is None:
+                return text
+            dispatch = self.dispatch
+            return self.combined.sub(lambda match: dispatch[match.group()], text)
+        
+        for regex, (_, replacement) in zip(self.regexes, self.rules):
+            text = re.sub(regex, replacement, text)
+        return text
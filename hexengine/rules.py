@@ -0,0 +1,182 @@
+import re
+import json
+import heapq
+import itertools
+
+from .layout import HexLayout
+from .templates import ReplacementTemplate
+from .patterns import PatternTemplate
+
+
+class PatternMatch:
+    """Represents a single pattern match with its wildcards and position"""
+    def __init__(self, start_pos, end_pos, wildcards, rule):
+        self.start_pos = start_pos
+        self.end_pos = end_pos
+        self.wildcards = wildcards  # List of captured wildcard values
+        self.rule = rule
+        self.location_wildcard_indices = rule.location_indices() if rule.location_enabled else None
+    
+    @property
+    def byte_offset(self):
+        """Offset of the match in the input bytes (valid for canonical input)"""
+        return HexLayout.text_to_byte(self.start_pos)
+    
+    @property
+    def byte_length(self):
+        """Length of the match in bytes (valid for canonical input)"""
+        return HexLayout.text_to_byte(self.end_pos - self.start_pos) + 1
+        
+    def get_location_value(self):
+        """Get the wildcard value designated as the location (several wildcards concatenated for composite keys)"""
+        indices = self.location_wildcard_indices
+        if indices is not None and all(index < len(self.wildcards) for index in indices):
+            return ''.join(self.wildcards[index] for index in indices).upper()
+        return None
+    
+    def apply_replacement_template(self):
+        """Apply the rule's replacement template using wildcards"""
+        return ReplacementTemplate.parse(self.rule.replacement).render_all([self.wildcards])[0]
+
+
+class SimplePatternRule:
+    """Represents a pattern rule with visual template and location selection"""
+    def __init__(self, pattern_template, replacement, priority=0, 
+                 location_enabled=False, selected_part_index=0, color="#cc7000", location_parts=None):
+        self.pattern_template = pattern_template  # "## 2A ##"
+        self.replacement = replacement
+        self.priority = priority
+        self.location_enabled = location_enabled
+        self.selected_part_index = selected_part_index  # Which ## is selected for location
+        self.location_parts = location_parts  # Wildcards forming a composite location key, e.g. [3, 2, 1, 0]
+        self.color = color
+    
+    def location_indices(self):
+        """Wildcard indices whose bytes, in this order, make up the location key"""
+        return self.location_parts or [self.selected_part_index]
+    
+    def location_label(self):
+        """'#2' or '#4#3#2#1' for display"""
+        return ''.join(f"#{index + 1}" for index in self.location_indices())
+        
+    def to_regex(self):
+        """Convert template like '## 2A ##' to a regex over canonical hex text"""
+        try:
+            return PatternTemplate.parse(self.pattern_template).text_regex()
+        except ValueError as e:
+            # Reported like any other invalid pattern
+            raise re.error(str(e))
+    
+    def to_bytes_regex(self):
+        """Regex over the raw bytes with one-byte wildcard groups, for re.DOTALL"""
+        try:
+            return PatternTemplate.parse(self.pattern_template).bytes_regex()
+        except ValueError as e:
+            raise re.error(str(e))
+    
+    def get_wildcard_count(self):
+        """Count number of ## wildcards in template"""
+        return self.pattern_template.split().count("##")
+    
+    def find_matches(self, text):
+        """Find all matches of this pattern in the text"""
+        return list(self.iter_matches(text))
+    
+    def iter_matches(self, text, start=0, end=None):
+        """Lazily yield matches between two text offsets"""
+        try:
+            regex = re.compile(self.to_regex(), re.IGNORECASE)
+        except re.error as e:
+            print(f"Regex error for pattern {self.pattern_template}: {e}")
+            return
+        
+        for match in regex.finditer(text, start, len(text) if end is None else end):
+            yield PatternMatch(
+                start_pos=match.start(),
+                end_pos=match.end(),
+                wildcards=list(match.groups()),
+                rule=self
+            )
+    
+    def literal_text(self):
+        """Canonical text of a template without wildcards, or None"""
+        parts = self.pattern_template.split()
+        if not parts or not all(re.fullmatch(r"[0-9A-Fa-f]{2}", part) for part in parts):
+            return None
+        return ' '.join(parts).upper()
+    
+    def count_matches(self, text, start=0, end=None):
+        """Count matches without creating match objects"""
+        literal = self.literal_text()
+        if literal is not None:
+            # In canonical text a whole-byte literal can only occur byte-aligned
+            return text.count(literal, start, len(text) if end is None else end)
+        
+        try:
+            regex = re.compile(self.to_regex(), re.IGNORECASE)
+        except re.error:
+            return 0
+        return sum(1 for _ in regex.finditer(text, start, len(text) if end is None else end))
+    
+    def to_dict(self):
+        """Convert to dictionary for saving"""
+        return {
+            "pattern_template": self.pattern_template,
+            "replacement": self.replacement,
+            "priority": self.priority,
+            "location_enabled": self.location_enabled,
+            "selected_part_index": self.selected_part_index,
+            "location_parts": self.location_parts,
+            "color": self.color
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Create instance from dictionary"""
+        return cls(
+            data.get("pattern_template", ""),
+            data.get("replacement", ""),
+            data.get("priority", 0),
+            data.get("location_enabled", False),
+            data.get("selected_part_index", 0),
+            data.get("color", "#cc7000"),
+            data.get("location_parts")
+        )
+
+
+def pattern_to_regex(pattern):
+    """Convert a space separated hex pattern to a regex over canonical hex text"""
+    pattern_parts = pattern.split()
+    # Exactly one space between bytes in canonical text; the guards keep matches byte-aligned
+    return r"(?<![0-9A-Fa-f])" + " ".join(re.escape(part) for part in pattern_parts) + r"(?![0-9A-Fa-f])"
+
+
+def iter_matches(rule_set, buffer, start=0, end=None):
+    """Lazily yield matches of several rules over canonical text, ordered by position"""
+    per_rule = [rule.iter_matches(buffer, start, end) for rule in rule_set]
+    # Ties keep rule order, so higher priority rules come first at the same offset
+    return heapq.merge(*per_rule, key=lambda match: match.start_pos)
+
+
+def count_matches(rule_set, buffer, start=0, end=None):
+    """Total number of matches of several rules without materializing them"""
+    return sum(rule.count_matches(buffer, start, end) for rule in rule_set)
+
+
+def first_n(rule_set, buffer, n, start=0, end=None):
+    """The first n matches at or after start, scanning no further than needed"""
+    return list(itertools.islice(iter_matches(rule_set, buffer, start, end), n))
+
+
+def load_rules_file(path):
+    """Load pattern rules saved by the pattern rules panel"""
+    with open(path, 'r') as file:
+        data = json.load(file)
+    return [SimplePatternRule.from_dict(rule_data) for rule_data in data if isinstance(rule_data, dict)]
+
+
+def load_location_rules_file(path):
+    """Load location rules stored as a JSON list of [find, replace] pairs"""
+    with open(path, 'r') as file:
+        data = json.load(file)
+    return [(str(find_text), str(replace_text)) for find_text, replace_text in data]
@@ -0,0 +1,347 @@
+import json
+import mmap
+import os
+import re
+import socketserver
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .layout import HexLayout, HexBuffer
+from .locations import LocationIndex
+from .patterns import PatternTemplate
+from .processor import HexProcessor
+from .rules import SimplePatternRule, load_rules_file, load_location_rules_file
+from .templates import ReplacementTemplate
+
+DEFAULT_PORT = 8765
+
+
+class RpcError(Exception):
+    """JSON-RPC error returned to the client instead of a result"""
+    INVALID_REQUEST = -32600
+    INVALID_PARAMS = -32602
+    METHOD_NOT_FOUND = -32601
+    PARSE_ERROR = -32700
+    SERVER_ERROR = -32000
+    
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class RuleLibrary:
+    """Rule sets kept loaded and compiled, reloaded when their file changes on disk"""
+    def __init__(self):
+        self.files = {}  # Path -> ((mtime, size), rules)
+        self.inline = OrderedDict()  # JSON of inline rules -> rules, least recently used first
+    
+    def get(self, spec):
+        """Rules for a rules file path or an inline list of rule dicts"""
+        if isinstance(spec, str):
+            return self.get_file(spec)
+        if isinstance(spec, list):
+            key = json.dumps(spec, sort_keys=True)
+            rules = self.inline.get(key)
+            if rules is None:
+                rules = self.warm([SimplePatternRule.from_dict(data) for data in spec if isinstance(data, dict)])
+                self.inline[key] = rules
+                if len(self.inline) > 64:
+                    self.inline.popitem(last=False)
+            self.inline.move_to_end(key)
+            return rules
+        raise RpcError(RpcError.INVALID_PARAMS, "rules must be a file path or a list of rules")
+    
+    def get_file(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise RpcError(RpcError.INVALID_PARAMS, f"Cannot read rules: {e}")
+        state = (stat.st_mtime_ns, stat.st_size)
+        entry = self.files.get(path)
+        # Checked on every request, so edits are picked up by the next call
+        if entry is None or entry[0] != state:
+            entry = (state, self.warm(load_rules_file(path)))
+            self.files[path] = entry
+        return entry[1]
+    
+    @staticmethod
+    def warm(rules):
+        """Parse and compile everything a run needs once, so requests find it in the caches"""
+        for rule in rules:
+            try:
+                PatternTemplate.parse(rule.pattern_template)
+                re.compile(rule.to_regex(), re.IGNORECASE)
+            except (ValueError, re.error) as e:
+                raise RpcError(RpcError.INVALID_PARAMS, f"Invalid pattern {rule.pattern_template}: {e}")
+            ReplacementTemplate.parse(rule.replacement)
+        return rules
+
+
+class InputCache:
+    """Memory maps of input files, kept open while their size and mtime stay the same"""
+    def __init__(self, max_open=16):
+        self.max_open = max_open
+        self.maps = OrderedDict()  # Path -> ((mtime, size), mmap or bytes)
+    
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise RpcError(RpcError.INVALID_PARAMS, f"Cannot read input: {e}")
+        state = (stat.st_mtime_ns, stat.st_size)
+        entry = self.maps.get(path)
+        if entry is None or entry[0] != state:
+            if entry is not None and isinstance(entry[1], mmap.mmap):
+                entry[1].close()
+            with open(path, 'rb') as file:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+            entry = (state, data)
+            self.maps[path] = entry
+            if len(self.maps) > self.max_open:
+                _, (_, oldest) = self.maps.popitem(last=False)
+                if isinstance(oldest, mmap.mmap):
+                    oldest.close()
+        self.maps.move_to_end(path)
+        return entry[1]
+
+
+class ProcessingService:
+    """Request handlers of the server; one instance per worker process keeps its own warm caches"""
+    def __init__(self):
+        self.rules = RuleLibrary()
+        self.inputs = InputCache()
+        self.tables = {}  # Location table path -> ((mtime, size), LocationIndex)
+        self.processor = HexProcessor()
+    
+    def call(self, method, params):
+        handler = getattr(self, f"rpc_{method}", None)
+        if handler is None:
+            raise RpcError(RpcError.METHOD_NOT_FOUND, f"Unknown method: {method}")
+        if not isinstance(params, dict):
+            raise RpcError(RpcError.INVALID_PARAMS, "params must be an object")
+        try:
+            return handler(**params)
+        except TypeError as e:
+            raise RpcError(RpcError.INVALID_PARAMS, str(e))
+    
+    def buffer(self, input=None, hex=None):
+        """Input from a file path (memory-mapped) or inline hex text"""
+        if input is not None:
+            return HexBuffer(data=self.inputs.get(input))
+        if hex is not None:
+            try:
+                return HexBuffer(text=HexLayout.canonicalize(hex))
+            except ValueError as e:
+                raise RpcError(RpcError.INVALID_PARAMS, str(e))
+        raise RpcError(RpcError.INVALID_PARAMS, "Either input or hex is required")
+    
+    def location_rules(self, locations, location_tables=None):
+        if isinstance(locations, str):
+            location_rules = load_location_rules_file(locations)
+        else:
+            location_rules = [tuple(pair) for pair in locations or []]
+        for path in location_tables or []:
+            location_rules.append(self.location_table(path))
+        return location_rules
+    
+    def location_table(self, path):
+        """LocationIndex of a table file, kept in memory while the file is unchanged"""
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise RpcError(RpcError.INVALID_PARAMS, f"Cannot read location table: {e}")
+        state = (stat.st_mtime_ns, stat.st_size)
+        entry = self.tables.get(path)
+        if entry is None or entry[0] != state:
+            entry = (state, LocationIndex.from_file(path))
+            self.tables[path] = entry
+        return entry[1]
+    
+    def rpc_ping(self):
+        return {"pid": os.getpid(), "rule_files": len(self.rules.files), "open_inputs": len(self.inputs.maps)}
+    
+    def rpc_count(self, rules, input=None, hex=None):
+        """Number of matches per rule, before overlap resolution"""
+        pattern_rules = self.rules.get(rules)
+        table = self.processor.match_buffer(self.buffer(input, hex), pattern_rules)
+        counts = [0] * len(pattern_rules)
+        for rule_id in table.rule_ids:
+            counts[rule_id] += 1
+        return {"counts": counts, "total": len(table), "backend": self.processor.last_backend}
+    
+    def rpc_matches(self, rules, input=None, hex=None, offset=0, limit=100, rule=None):
+        """Matches at or after a byte offset as {offset, length, rule, wildcards}, in position order"""
+        pattern_rules = self.rules.get(rules)
+        table = self.processor.match_buffer(self.buffer(input, hex), pattern_rules)
+        start_text = HexLayout.byte_to_text(offset)
+        rows = [index for index in range(len(table))
+                if table.starts[index] >= start_text and (rule is None or table.rule_ids[index] == rule)]
+        rows.sort(key=lambda index: (table.starts[index], table.rule_ids[index]))
+        return [{
+            "offset": HexLayout.text_to_byte(table.starts[index]),
+            "length": HexLayout.text_to_byte(table.ends[index] - table.starts[index]) + 1,
+            "rule": table.rule_ids[index],
+            "wildcards": table.wildcards(index),
+        } for index in rows[:limit]]
+    
+    def rpc_process(self, rules, input=None, hex=None, locations=None, location_tables=None, output=None,
+                    intermediate=None):
+        """Run the pipeline; results are returned, or streamed to files when output paths are given"""
+        pattern_rules = self.rules.get(rules)
+        location_rules = self.location_rules(locations, location_tables)
+        buffer = self.buffer(input, hex)
+        
+        if output is None:
+            intermediate_result, final_result = self.processor.process_hex_data(buffer.text, pattern_rules, location_rules)
+            return {"intermediate": intermediate_result, "final": final_result}
+        
+        with open(intermediate or os.devnull, 'w') as intermediate_out, open(output, 'w') as final_out:
+            self.processor.process_hex_stream(buffer.data, pattern_rules, location_rules, intermediate_out, final_out)
+            return {"output": output, "final_chars": final_out.tell()}
+
+
+# Service of a worker process, created by the pool initializer
+_service = None
+
+
+def _init_worker():
+    global _service
+    _service = ProcessingService()
+
+
+def _call_worker(method, params):
+    """Worker: run one request; errors come back as (code, message) since they must be picklable"""
+    try:
+        return True, _service.call(method, params)
+    except RpcError as e:
+        return False, (e.code, str(e))
+    except Exception as e:
+        return False, (RpcError.SERVER_ERROR, f"{type(e).__name__}: {e}")
+
+
+class RpcRequestHandler(BaseHTTPRequestHandler):
+    """JSON-RPC 2.0 over HTTP POST; a batch is a JSON list of requests"""
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(self.error_response(None, RpcError.PARSE_ERROR, "Parse error"))
+            return
+        
+        if isinstance(request, list):
+            if not request:
+                self.send_json(self.error_response(None, RpcError.INVALID_REQUEST, "Invalid request"))
+                return
+            # Notifications get no entry; a batch of only notifications gets no body
+            responses = [response for response in map(self.server.dispatch, request) if response is not None]
+            response = responses or None
+        else:
+            response = self.server.dispatch(request)
+        
+        if response is None:
+            self.send_no_content()
+        else:
+            self.send_json(response)
+    
+    @staticmethod
+    def error_response(request_id, code, message):
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+    
+    def send_json(self, response):
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_no_content(self):
+        self.send_response(204)
+        self.end_headers()
+    
+    def address_string(self):
+        # Unix socket clients have no host address
+        return self.client_address[0] if self.client_address else "local"
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RpcServerMixin:
+    """Dispatches requests to a process pool whose workers keep rules and inputs warm"""
+    def setup_service(self, workers, verbose):
+        self.verbose = verbose
+        if workers:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            self.service = None
+        else:
+            self.pool = None
+            self.service = ProcessingService()  # Inline in the request thread, mainly for debugging
+    
+    def dispatch(self, request):
+        """Response object of one request, or None for a notification (a request without an id)"""
+        request_id = request.get('id') if isinstance(request, dict) else None
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return RpcRequestHandler.error_response(request_id, RpcError.INVALID_REQUEST, "Invalid request")
+        notification = 'id' not in request
+        
+        method, params = request['method'], request.get('params', {})
+        if self.pool is not None:
+            ok, value = self.pool.submit(_call_worker, method, params).result()
+        else:
+            try:
+                ok, value = True, self.service.call(method, params)
+            except RpcError as e:
+                ok, value = False, (e.code, str(e))
+        if notification:
+            return None
+        if not ok:
+            return RpcRequestHandler.error_response(request_id, *value)
+        return {"jsonrpc": "2.0", "id": request_id, "result": value}
+    
+    def server_close(self):
+        super().server_close()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+class RpcHTTPServer(RpcServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class RpcUnixServer(RpcServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(port=DEFAULT_PORT, socket_path=None, workers=None, verbose=False):
+    """Localhost HTTP server, or one on a Unix socket when socket_path is given"""
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = RpcUnixServer(socket_path, RpcRequestHandler)
+    else:
+        server = RpcHTTPServer(('127.0.0.1', port), RpcRequestHandler)
+    server.setup_service(os.cpu_count() or 1 if workers is None else workers, verbose)
+    return server
+
+
+class ServiceClient:
+    """Minimal client for the localhost HTTP server"""
+    def __init__(self, port=DEFAULT_PORT, timeout=300):
+        self.url = f"http://127.0.0.1:{port}/"
+        self.timeout = timeout
+        self.next_id = 0
+    
+    def call(self, method, **params):
+        self.next_id += 1
+        body = json.dumps({"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            reply = json.loads(response.read())
+        if 'error' in reply:
+            raise RpcError(reply['error']['code'], reply['error']['message'])
+        return reply['result']
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+from .locations import LocationIndex
+from .rules import SimplePatternRule
+from .table import MatchTable
+
+MAGIC = b"HXSESS01"
+HEADER = struct.Struct("<8sQ")  # Magic, length of the JSON header that follows
+ALIGNMENT = 8
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SessionSnapshot:
+    """Workspace saved in one binary file: input reference, rules, match table and output offset maps
+    
+    The file is a JSON header followed by the raw bytes of each column, so
+    loading maps the file and copies the columns without parsing or matching.
+    """
+    def __init__(self, pattern_rules, location_rules, table, accepted=None, checkpoints=None,
+                 source_path=None, source_sha256=None, source_size=None, source_mtime=None, input_data=None):
+        self.pattern_rules = pattern_rules  # In display order
+        self.location_rules = location_rules
+        self.table = table  # MatchTable whose rules are pattern_rules sorted by priority
+        self.accepted = accepted  # Rows in replacement order, or None to compute them again
+        self.checkpoints = checkpoints or {}  # Output name -> (output offsets, source offsets) of a LazyOutput
+        self.source_path = source_path  # Input file; None when the input bytes are stored in the snapshot
+        self.source_sha256 = source_sha256
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+        self.input_data = input_data  # Input bytes when there is no source file
+    
+    @classmethod
+    def capture(cls, pattern_rules, location_rules, table, accepted=None, outputs=None, input_data=None,
+                source_path=None):
+        """Snapshot of a workspace; the input is referenced when source_path holds exactly input_data"""
+        snapshot = cls(pattern_rules, location_rules, table, accepted,
+                       {name: (output.checkpoint_output, output.checkpoint_source)
+                        for name, output in (outputs or {}).items()})
+        digest = hashlib.sha256(input_data).hexdigest()
+        if source_path is not None and os.path.exists(source_path):
+            stat = os.stat(source_path)
+            if stat.st_size == len(input_data) and file_sha256(source_path) == digest:
+                snapshot.source_path = os.path.abspath(source_path)
+                snapshot.source_size = stat.st_size
+                snapshot.source_mtime = stat.st_mtime_ns
+        snapshot.source_sha256 = digest
+        if snapshot.source_path is None:
+            snapshot.input_data = input_data
+        return snapshot
+    
+    def columns(self):
+        """Name -> array or bytes of everything stored as raw bytes"""
+        table = self.table
+        columns = {
+            "starts": table.starts,
+            "ends": table.ends,
+            "rule_ids": table.rule_ids,
+            "wildcard_offsets": table.wildcard_offsets,
+            "wildcard_data": bytes(table.wildcard_data),
+        }
+        if self.accepted is not None:
+            columns["accepted"] = array('q', self.accepted)
+        for name, (output_offsets, source_offsets) in self.checkpoints.items():
+            columns[f"{name}.output"] = output_offsets
+            columns[f"{name}.source"] = source_offsets
+        if self.input_data is not None:
+            columns["input"] = bytes(self.input_data)
+        return columns
+    
+    def save(self, path):
+        """Write the snapshot atomically: a temporary file in the same folder replaces the target"""
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        
+        sections = {}
+        offset = 0
+        payload = []
+        for name, column in self.columns().items():
+            raw = column.tobytes() if isinstance(column, array) else column
+            padding = -offset % ALIGNMENT
+            payload.append(b"\0" * padding)
+            offset += padding
+            typecode = column.typecode if isinstance(column, array) else None
+            itemsize = column.itemsize if isinstance(column, array) else 1
+            sections[name] = [offset, len(raw), typecode, itemsize]
+            payload.append(raw)
+            offset += len(raw)
+        
+        rule_positions = {id(rule): index for index, rule in enumerate(self.pattern_rules)}
+        header = json.dumps({
+            "pattern_rules": [rule.to_dict() for rule in self.pattern_rules],
+            "table_rules": [rule_positions[id(rule)] for rule in self.table.rules],
+            "location_rules": [list(pair) for pair in self.location_rules if not isinstance(pair, LocationIndex)],
+            "location_tables": [self.table_reference(table)
+                                for table in self.location_rules if isinstance(table, LocationIndex)],
+            "source": {"path": self.source_path, "sha256": self.source_sha256,
+                       "size": self.source_size, "mtime": self.source_mtime},
+            "sections": sections,
+        }).encode()
+        header += b" " * (-(HEADER.size + len(header)) % ALIGNMENT)
+        
+        descriptor, temporary = tempfile.mkstemp(prefix=".session-", dir=folder)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, len(header)))
+                file.write(header)
+                for piece in payload:
+                    file.write(piece)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    
+    @staticmethod
+    def table_reference(table):
+        """Header entry of a location table
+        
+        Tables read from a file are stored by reference, their built index staying
+        in the location index cache; tables built in memory store their entries.
+        """
+        if table.source_path is not None:
+            return {"path": os.path.abspath(table.source_path), "key_bytes": table.key_bytes}
+        return {"entries": [[key, table[key]] for key in table], "key_bytes": table.key_bytes}
+    
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot written by save(); raises ValueError for files that are not snapshots"""
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) < HEADER.size:
+                raise ValueError("Not a session snapshot")
+            magic, header_length = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError("Not a session snapshot")
+            base = HEADER.size + header_length
+            header = json.loads(data[HEADER.size:base])
+            
+            columns = {}
+            for name, (offset, length, typecode, itemsize) in header["sections"].items():
+                raw = data[base + offset:base + offset + length]
+                if typecode is None:
+                    columns[name] = raw
+                    continue
+                column = array(typecode)
+                if column.itemsize != itemsize:
+                    raise ValueError("Snapshot was written on a platform with different integer sizes")
+                column.frombytes(raw)
+                columns[name] = column
+        
+        pattern_rules = [SimplePatternRule.from_dict(rule_data) for rule_data in header["pattern_rules"]]
+        table = MatchTable([pattern_rules[index] for index in header["table_rules"]])
+        table.starts = columns["starts"]
+        table.ends = columns["ends"]
+        table.rule_ids = columns["rule_ids"]
+        table.wildcard_offsets = columns["wildcard_offsets"]
+        table.wildcard_data = bytearray(columns["wildcard_data"])
+        
+        checkpoints = {}
+        for name in columns:
+            if name.endswith(".output"):
+                output_name = name[:-len(".output")]
+                checkpoints[output_name] = (columns[name], columns[f"{output_name}.source"])
+        
+        location_rules = [tuple(pair) for pair in header["location_rules"]]
+        for table_data in header.get("location_tables", []):
+            if "entries" in table_data:
+                location_rules.append(LocationIndex([tuple(entry) for entry in table_data["entries"]],
+                                                    table_data["key_bytes"]))
+                continue
+            try:
+                location_rules.append(LocationIndex.from_file(table_data["path"], table_data["key_bytes"]))
+            except OSError as e:
+                raise ValueError(f"Location table {table_data['path']} cannot be read: {e}")
+        
+        source = header["source"]
+        accepted = columns.get("accepted")
+        return cls(pattern_rules, location_rules, table,
+                   accepted, checkpoints,
+                   source["path"], source["sha256"], source["size"], source["mtime"], columns.get("input"))
+    
+    def source_problem(self):
+        """Why the input no longer matches the snapshot, or None
+        
+        Size and mtime unchanged are taken as unchanged content; otherwise the
+        file is hashed, so a touched but identical file is still accepted.
+        """
+        if self.source_path is None:
+            return None
+        try:
+            stat = os.stat(self.source_path)
+        except OSError:
+            return f"Input file {self.source_path} is missing"
+        if stat.st_size == self.source_size and stat.st_mtime_ns == self.source_mtime:
+            return None
+        if stat.st_size != self.source_size or file_sha256(self.source_path) != self.source_sha256:
+            return f"Input file {self.source_path} has changed since the session was saved"
+        return None
+    
+    def read_input(self):
+        """The input bytes, from the snapshot or the source file"""
+        if self.input_data is not None:
+            return self.input_data
+        with open(self.source_path, 'rb') as file:
+            return file.read()
@@ -0,0 +1,170 @@
+from array import array
+
+from .layout import HexLayout
+from .templates import ReplacementTemplate
+
+
+class MatchView:
+    """Lightweight per-match view onto a row of a MatchTable"""
+    __slots__ = ('table', 'index')
+    
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+    
+    @property
+    def start_pos(self):
+        return self.table.starts[self.index]
+    
+    @property
+    def end_pos(self):
+        return self.table.ends[self.index]
+    
+    @property
+    def rule(self):
+        return self.table.rules[self.table.rule_ids[self.index]]
+    
+    @property
+    def wildcards(self):
+        return self.table.wildcards(self.index)
+    
+    def get_location_value(self):
+        """Get the wildcard value designated as the location"""
+        return self.table.location_value(self.index)
+    
+    def apply_replacement_template(self):
+        """Apply the rule's replacement template using wildcards"""
+        return ReplacementTemplate.parse(self.rule.replacement).render_all([self.wildcards])[0]
+
+
+class MatchTable:
+    """Columnar match store: parallel arrays instead of one PatternMatch object per match"""
+    def __init__(self, rules):
+        self.rules = list(rules)  # Rule id = index into this list
+        self.starts = array('q')  # Text offsets in the canonical input
+        self.ends = array('q')
+        self.rule_ids = array('l')
+        self.wildcard_offsets = array('q')  # Start of each row's bytes in wildcard_data
+        self.wildcard_data = bytearray()  # Wildcard values packed as raw bytes
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def __getitem__(self, index):
+        return MatchView(self, index)
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield MatchView(self, index)
+    
+    def add_regex_matches(self, rule_id, regex, text):
+        """Append every match of a compiled regex, packing its captured wildcards"""
+        for match in regex.finditer(text):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+            self.rule_ids.append(rule_id)
+            self.wildcard_offsets.append(len(self.wildcard_data))
+            self.wildcard_data += bytes.fromhex(''.join(match.groups()))
+    
+    def add_bytes_regex_matches(self, rule_id, regex, data):
+        """Append every match of a compiled bytes regex over raw data, its one-byte groups being the wildcards"""
+        for match in regex.finditer(data):
+            self.starts.append(HexLayout.byte_to_text(match.start()))
+            self.ends.append(HexLayout.byte_end_to_text(match.end()))
+            self.rule_ids.append(rule_id)
+            self.wildcard_offsets.append(len(self.wildcard_data))
+            self.wildcard_data += b''.join(match.groups())
+    
+    def add_columns(self, rule_id, starts, ends, wildcard_blob, wildcard_count):
+        """Append a batch of matches of one rule given as columns"""
+        count = len(starts)
+        base = len(self.wildcard_data)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+        self.rule_ids.extend(array('l', [rule_id]) * count)
+        if wildcard_count:
+            self.wildcard_offsets.extend(range(base, base + count * wildcard_count, wildcard_count))
+        else:
+            self.wildcard_offsets.extend(array('q', [base]) * count)
+        self.wildcard_data += wildcard_blob
+    
+    def wildcard_bytes(self, index):
+        """Packed wildcard values of one row"""
+        start = self.wildcard_offsets[index]
+        end = self.wildcard_offsets[index + 1] if index + 1 < len(self) else len(self.wildcard_data)
+        return bytes(self.wildcard_data[start:end])
+    
+    def wildcards(self, index):
+        """Wildcard values of one row as two-digit hex strings"""
+        digits = self.wildcard_bytes(index).hex().upper()
+        return [digits[i:i + 2] for i in range(0, len(digits), 2)]
+    
+    def location_value(self, index):
+        """Location wildcard of one row (several concatenated for a composite key), or None without a location"""
+        rule = self.rules[self.rule_ids[index]]
+        if not rule.location_enabled:
+            return None
+        
+        base = self.wildcard_offsets[index]
+        end = self.wildcard_offsets[index + 1] if index + 1 < len(self) else len(self.wildcard_data)
+        if rule.location_parts is None:
+            offset = base + rule.selected_part_index
+            if offset >= end:
+                return None
+            return f"{self.wildcard_data[offset]:02X}"
+        
+        if any(base + part >= end for part in rule.location_parts):
+            return None
+        return bytes(self.wildcard_data[base + part] for part in rule.location_parts).hex().upper()
+    
+    def rows_by_rule(self):
+        """Rule id -> row indices of its matches"""
+        rows = {}
+        for index, rule_id in enumerate(self.rule_ids):
+            rows.setdefault(rule_id, []).append(index)
+        return rows
+    
+    def take_rules(self, rules, source_ids, rows_by_rule=None):
+        """New table over rules where rule i gets a copy of the matches of source_ids[i] in this table"""
+        rows_by_rule = self.rows_by_rule() if rows_by_rule is None else rows_by_rule
+        table = MatchTable(rules)
+        for rule_id, source_id in enumerate(source_ids):
+            for index in rows_by_rule.get(source_id, ()):
+                table.starts.append(self.starts[index])
+                table.ends.append(self.ends[index])
+                table.rule_ids.append(rule_id)
+                table.wildcard_offsets.append(len(table.wildcard_data))
+                table.wildcard_data += self.wildcard_bytes(index)
+        return table
+    
+    def replacement_order(self):
+        """Rows that get replaced, in ascending position
+        
+        Matches are taken right to left (ties in rule priority order) and a match
+        overlapping one already taken is skipped.
+        """
+        order = sorted(range(len(self)), key=lambda i: (-self.starts[i], self.rule_ids[i], i))
+        accepted = []
+        boundary = None
+        for index in order:
+            if boundary is None or self.ends[index] <= boundary:
+                accepted.append(index)
+                boundary = self.starts[index]
+        accepted.reverse()
+        return accepted
+
+
+class LocationSpans:
+    """Output positions of location-enabled replacements, stored as columns"""
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.values = []  # Location wildcard value of each span
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def append(self, start, end, value):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.values.append(value)
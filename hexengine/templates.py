@@ -0,0 +1,134 @@
+import re
+import struct
+import functools
+
+from .optional import numpy as np  # Without NumPy, typed fields fall back to struct.iter_unpack
+
+
+class ReplacementTemplate:
+    """Replacement template parsed once and rendered for all matches of a rule at once"""
+    # Typed field decoders: name -> struct format (byte order prefix + code)
+    FIELD_TYPES = {
+        "u8": "<B", "i8": "<b",
+        "u16le": "<H", "u16be": ">H", "i16le": "<h", "i16be": ">h",
+        "u32le": "<I", "u32be": ">I", "i32le": "<i", "i32be": ">i",
+        "u64le": "<Q", "u64be": ">Q", "i64le": "<q", "i64be": ">q",
+        "f32le": "<f", "f32be": ">f", "f64le": "<d", "f64be": ">d",
+    }
+    TOKEN_PATTERN = re.compile(r"\{(\w+)\(([^)]*)\)([+\-*/]\d+)?\}|#([1-9])")
+    
+    def __init__(self, text):
+        self.text = text
+        self.segments = []  # Literal strings, ("wildcard", index) or ("field", name, indices, operation)
+        
+        position = 0
+        for token in self.TOKEN_PATTERN.finditer(text):
+            if token.start() > position:
+                self.segments.append(text[position:token.start()])
+            
+            if token.group(4):
+                self.segments.append(("wildcard", int(token.group(4)) - 1))
+            else:
+                field = self.parse_field(token.group(1), token.group(2), token.group(3))
+                self.segments.append(field if field else token.group(0))
+            position = token.end()
+        
+        if position < len(text):
+            self.segments.append(text[position:])
+    
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def parse(cls, text):
+        """Cached constructor so each distinct template is parsed only once"""
+        return cls(text)
+    
+    def parse_field(self, name, arguments, operation):
+        """Parse '{u16le(#1,#2)}' / '{i32be(#1..#4)+8}' style expressions"""
+        if name != "hex_to_dec" and name not in self.FIELD_TYPES:
+            return None
+        
+        indices = []
+        for argument in arguments.split(','):
+            bounds = re.fullmatch(r"\s*#(\d+)\s*(?:\.\.\s*#?(\d+)\s*)?", argument)
+            if not bounds:
+                return None
+            first = int(bounds.group(1))
+            last = int(bounds.group(2)) if bounds.group(2) else first
+            if first < 1 or last < first:
+                return None
+            indices.extend(range(first - 1, last))
+        
+        if name != "hex_to_dec" and len(indices) != struct.calcsize(self.FIELD_TYPES[name]):
+            return None
+        
+        return ("field", name, tuple(indices), operation)
+    
+    def render_all(self, wildcard_rows):
+        """Render the template for a list of wildcard lists, one per match"""
+        count = len(wildcard_rows)
+        if count == 0:
+            return []
+        
+        columns = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                columns.append([segment] * count)
+            elif segment[0] == "wildcard":
+                columns.append(self.wildcard_column(wildcard_rows, segment[1]))
+            else:
+                columns.append(self.field_column(wildcard_rows, *segment[1:]))
+        
+        if not columns:
+            return [""] * count
+        return [''.join(parts) for parts in zip(*columns)]
+    
+    def wildcard_column(self, wildcard_rows, index):
+        """Wildcard values of every match; unknown references stay as written"""
+        reference = f"#{index + 1}"
+        return [row[index] if index < len(row) else reference for row in wildcard_rows]
+    
+    def field_column(self, wildcard_rows, name, indices, operation):
+        """Decode a typed field for every match in one unpack call"""
+        if any(index >= len(wildcard_rows[0]) for index in indices):
+            return [self.field_source(name, indices, operation)] * len(wildcard_rows)
+        
+        blob = bytes.fromhex(''.join(row[index] for row in wildcard_rows for index in indices))
+        
+        if name == "hex_to_dec":
+            width = len(indices)
+            values = [int.from_bytes(blob[i:i + width], 'big') for i in range(0, len(blob), width)]
+        elif np.available():
+            fmt = self.FIELD_TYPES[name]
+            values = np.frombuffer(blob, dtype=np.dtype(fmt[0] + fmt[1])).tolist()
+        else:
+            values = [value for (value,) in struct.iter_unpack(self.FIELD_TYPES[name], blob)]
+        
+        if operation:
+            values = self.apply_operation(values, operation)
+        
+        if name.startswith('f'):
+            precision = ".7g" if name.startswith("f32") else ".16g"
+            return [format(value, precision) for value in values]
+        return [str(value) for value in values]
+    
+    @staticmethod
+    def apply_operation(values, operation):
+        """Apply '+N', '-N', '*N' or '/N' to every decoded value"""
+        operand = int(operation[1:])
+        operator = operation[0]
+        if operator == '+':
+            return [value + operand for value in values]
+        if operator == '-':
+            return [value - operand for value in values]
+        if operator == '*':
+            return [value * operand for value in values]
+        if operand == 0:
+            return values
+        # Integer fields keep the original floor division; floats divide normally
+        return [value / operand if isinstance(value, float) else value // operand for value in values]
+    
+    @staticmethod
+    def field_source(name, indices, operation):
+        """Expression text left in place when it references missing wildcards"""
+        arguments = ','.join(f"#{index + 1}" for index in indices)
+        return f"{{{name}({arguments}){operation or ''}}}"
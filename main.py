@@ -6,12 +6,8 @@ import json
 import os
 import pickle
 
-# Paths for storing application settings
-APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.hex_manipulator')
-SETTINGS_FILE = os.path.join(APP_DATA_DIR, 'settings.pkl')
-
-# Ensure the data directory exists
-os.makedirs(APP_DATA_DIR, exist_ok=True)
+from hexengine import HexLayout, HexProcessor, pattern_to_regex
+from hexengine.paths import SETTINGS_FILE, ensure_app_data_dir
 
 class InputFrame(tb.LabelFrame):
     """Frame for hex data input"""
@@ -21,6 +17,7 @@ class InputFrame(tb.LabelFrame):
         self.highlight_tag = "highlight"
         self.selection_tag = "selection_highlight"
         self.rule_tags = []  # Keep track of rule highlight tags
+        self.is_canonical = True  # Widget content is in HexLayout form
         
         # Import button and occurrence counter
         button_frame = tb.Frame(self)
@@ -66,7 +63,7 @@ class InputFrame(tb.LabelFrame):
                 
                 with open(file_path, 'rb') as file:
                     binary_data = file.read()
-                hex_str = ' '.join(f'{b:02X}' for b in binary_data)
+                hex_str = HexLayout.from_bytes(binary_data)
                 self.text_input.delete("1.0", tk.END)
                 self.text_input.insert("1.0", hex_str)
                 self.callback()
@@ -76,9 +73,32 @@ class InputFrame(tb.LabelFrame):
     
     def on_input_change(self, event=None):
         if self.text_input.edit_modified():
+            self.normalize_input()
             self.callback()
             self.text_input.edit_modified(False)
     
+    def normalize_input(self):
+        """Rewrite typed or pasted text into the canonical layout, keeping the cursor"""
+        content = self.text_input.get("1.0", "end-1c")
+        try:
+            canonical = HexLayout.canonicalize(content)
+        except ValueError:
+            self.is_canonical = False
+            return
+        
+        self.is_canonical = True
+        if canonical == content:
+            return
+        
+        digits_before_cursor = HexLayout.digit_count(self.text_input.get("1.0", tk.INSERT))
+        self.text_input.delete("1.0", tk.END)
+        self.text_input.insert("1.0", canonical)
+        self.text_input.mark_set(tk.INSERT, self.text_index(HexLayout.digits_to_text(digits_before_cursor)))
+    
+    def text_index(self, text_offset):
+        """Tk index of a character offset (canonical text is a single line)"""
+        return f"1.{text_offset}"
+    
     def on_selection_change(self, event=None):
         """Handle text selection changes"""
         try:
@@ -103,33 +123,25 @@ class InputFrame(tb.LabelFrame):
     
     def highlight_selection(self, text_to_highlight):
         """Highlight all occurrences of the selected text and return count"""
-        if not text_to_highlight or text_to_highlight.isspace():
+        if not text_to_highlight or text_to_highlight.isspace() or not self.is_canonical:
             return 0
         
-        # Escape special regex characters
-        escaped_text = re.escape(text_to_highlight)
+        content = self.get_input()
         
         # Count for occurrences
         occurrence_count = 0
         
-        # Highlight all occurrences
-        start_idx = "1.0"
-        while True:
-            start_idx = self.text_input.search(escaped_text, start_idx, 
-                                             stopindex=tk.END, 
-                                             regexp=True,
-                                             nocase=False)
-            if not start_idx:
-                break
-                
-            end_idx = f"{start_idx}+{len(text_to_highlight)}c"
+        # Offsets in canonical text map straight to Tk indices
+        start_pos = content.find(text_to_highlight)
+        while start_pos != -1:
+            end_pos = start_pos + len(text_to_highlight)
             
             # Apply the selection tag regardless of other tags
             # The tag_raise() call in __init__ ensures it shows on top
-            self.text_input.tag_add(self.selection_tag, start_idx, end_idx)
+            self.text_input.tag_add(self.selection_tag, self.text_index(start_pos), self.text_index(end_pos))
             occurrence_count += 1
             
-            start_idx = end_idx
+            start_pos = content.find(text_to_highlight, end_pos)
         
         return occurrence_count
     
@@ -145,16 +157,12 @@ class InputFrame(tb.LabelFrame):
         # Reset rule tags list
         self.rule_tags = []
         
-        input_text = self.get_input()
-        if not input_text or not patterns:
+        content = self.get_input()
+        if not content or not patterns or not self.is_canonical:
             return
         
-        content = self.text_input.get("1.0", tk.END)
-        
         for i, pattern in enumerate(patterns):
-            clean_pattern = ' '.join(pattern.split())
-            pattern_parts = clean_pattern.split()
-            regex_pattern = r'\s*'.join([re.escape(part) for part in pattern_parts])
+            regex_pattern = pattern_to_regex(pattern)
             
             # Get color for this pattern
             color = "#cc7000"  # Default color
@@ -174,25 +182,9 @@ class InputFrame(tb.LabelFrame):
             # Ensure selection tag has higher priority
             self.text_input.tag_lower(tag_name, self.selection_tag)
             
+            # Match offsets in canonical text are Tk column offsets
             for match in re.finditer(regex_pattern, content):
-                start_pos = match.start()
-                end_pos = match.end()
-                
-                # Convert byte offset to line.char format
-                start_line = content[:start_pos].count('\n') + 1
-                start_char = start_pos - content[:start_pos].rfind('\n') - 1
-                if start_line == 1:
-                    start_char = start_pos
-                
-                end_line = content[:end_pos].count('\n') + 1
-                end_char = end_pos - content[:end_pos].rfind('\n') - 1
-                if end_line == 1:
-                    end_char = end_pos
-                
-                # Apply tag
-                start_index = f"{start_line}.{start_char}"
-                end_index = f"{end_line}.{end_char}"
-                self.text_input.tag_add(tag_name, start_index, end_index)
+                self.text_input.tag_add(tag_name, self.text_index(match.start()), self.text_index(match.end()))
 
 
 class ColorSquare(tk.Frame):
@@ -602,33 +594,6 @@ class OutputFrame(tb.LabelFrame):
             start_idx = end_idx
 
 
-class HexProcessor:
-    """Process hex data with replacement rules"""
-    def process_hex_data(self, input_data, replacement_rules):
-        """Apply replacement rules to hex data"""
-        result = input_data
-        
-        for pattern, replacement in replacement_rules:
-            processed_replacement = self._process_escape_sequences(replacement)
-            
-            clean_pattern = ' '.join(pattern.split())
-            pattern_parts = clean_pattern.split()
-            regex_pattern = r'\s*'.join([re.escape(part) for part in pattern_parts])
-            
-            result = re.sub(regex_pattern, processed_replacement, result)
-            
-        return result
-    
-    def _process_escape_sequences(self, text):
-        """Process escape sequences in replacement text"""
-        result = text
-        result = result.replace('\\n', '\n')  # Newline
-        result = result.replace('\\t', '\t')  # Tab character
-        result = result.replace('\\r', '\r')  # Carriage return
-            
-        return result
-
-
 class HexManipulator(tb.Window):
     """Main application window"""
     # Class variable to store app settings
@@ -654,6 +619,7 @@ class HexManipulator(tb.Window):
     def save_settings(cls):
         """Save application settings to file"""
         try:
+            ensure_app_data_dir()
             with open(SETTINGS_FILE, 'wb') as f:
                 pickle.dump(cls.app_settings, f)
         except Exception as e:
@@ -726,7 +692,11 @@ class HexManipulator(tb.Window):
             self.input_frame.highlight_patterns(patterns, rule_colors)
         
         if input_text:
-            processed_text = self.processor.process_hex_data(input_text, replacement_rules)
+            try:
+                processed_text = self.processor.process_replacements(input_text, replacement_rules)
+            except ValueError as e:
+                self.output_frame.set_output(f"Invalid input: {str(e)}", None)
+                return
             self.output_frame.set_output(processed_text, replacement_rules, rule_colors)
         else:
             self.output_frame.set_output("", None)
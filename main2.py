@@ -1,254 +1,96 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog, colorchooser
 import ttkbootstrap as tb
-import re
 import json
+import re
 import os
 import pickle
+from contextlib import nullcontext
 
-# Paths for storing application settings
-APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.hex_manipulator')
-SETTINGS_FILE = os.path.join(APP_DATA_DIR, 'settings.pkl')
+from hexengine import (HexLayout, SimplePatternRule, HexProcessor, ChunkMatchCache, DocumentModel, DocumentPipeline,
+                       HighlightRanges, iter_matches, first_n, load_rules_file)
+from hexengine.accounting import StageProfiler
+from hexengine.patterns import PatternTemplate
+from hexengine.paths import SETTINGS_FILE, CHUNK_CACHE_FILE, SESSIONS_DIR, ensure_app_data_dir
 
-# Ensure the data directory exists
-os.makedirs(APP_DATA_DIR, exist_ok=True)
 
-class PatternMatch:
-    """Represents a single pattern match with its wildcards and position"""
-    def __init__(self, start_pos, end_pos, wildcards, rule):
-        self.start_pos = start_pos
-        self.end_pos = end_pos
-        self.wildcards = wildcards  # List of captured wildcard values
-        self.rule = rule
-        self.location_wildcard_index = rule.selected_part_index if rule.location_enabled else None
-        
-    def get_location_value(self):
-        """Get the wildcard value designated as the location"""
-        if self.location_wildcard_index is not None and self.location_wildcard_index < len(self.wildcards):
-            return self.wildcards[self.location_wildcard_index].upper()
-        return None
+class ViewportHighlighter:
+    """Keeps highlight tags only on the visible part of a Text widget plus a margin, following scrolling
     
-    def apply_replacement_template(self):
-        """Apply the rule's replacement template using wildcards"""
-        result = self.rule.replacement
-        
-        # Replace wildcard references (#1, #2, etc.)
-        for i, wildcard_value in enumerate(self.wildcards):
-            wildcard_ref = f"#{i+1}"
-            result = result.replace(wildcard_ref, wildcard_value)
-            
-            # Handle hex to decimal conversion with arithmetic
-            hex_dec_pattern = rf"\{{hex_to_dec\(#{i+1}\)([+\-*/]\d+)?\}}"
-            matches = re.findall(hex_dec_pattern, result)
-            
-            for operation in matches:
-                try:
-                    decimal_value = int(wildcard_value, 16)
-                    if operation:
-                        if operation.startswith('+'):
-                            decimal_value += int(operation[1:])
-                        elif operation.startswith('-'):
-                            decimal_value -= int(operation[1:])
-                        elif operation.startswith('*'):
-                            decimal_value *= int(operation[1:])
-                        elif operation.startswith('/'):
-                            decimal_value //= int(operation[1:])
-                    
-                    full_pattern = f"{{hex_to_dec(#{i+1}){operation}}}"
-                    result = result.replace(full_pattern, str(decimal_value))
-                except ValueError:
-                    pass
-        
-        return result
-
-
-class SimplePatternRule:
-    """Represents a pattern rule with visual template and location selection"""
-    def __init__(self, pattern_template, replacement, priority=0, 
-                 location_enabled=False, selected_part_index=0, color="#cc7000"):
-        self.pattern_template = pattern_template  # "## 2A ##"
-        self.replacement = replacement
-        self.priority = priority
-        self.location_enabled = location_enabled
-        self.selected_part_index = selected_part_index  # Which ## is selected for location
-        self.color = color
-        
-    def to_regex(self):
-        """Convert template like '## 2A ##' to regex pattern"""
-        parts = self.pattern_template.split()
-        regex_parts = []
-        
-        for part in parts:
-            if part == "##":
-                regex_parts.append(r"([0-9A-Fa-f]{2})")  # Capture group for wildcards
-            else:
-                regex_parts.append(re.escape(part))
-                
-        return r"\s+".join(regex_parts)
+    Tk slows down with every tag range it holds, so the full set of ranges lives in
+    a HighlightRanges and only the window around the view is tagged.
+    """
+    MARGIN_CHARS = 16 * 1024  # Tagged beyond each edge of the view so short scrolls need no retagging
     
-    def get_wildcard_count(self):
-        """Count number of ## wildcards in template"""
-        return self.pattern_template.count("##")
+    def __init__(self, text_widget):
+        self.text = text_widget
+        self.ranges = HighlightRanges()
+        self.tagged = None  # (start, end) offsets of the tagged window
+        self.refresh_pending = False
     
-    def find_matches(self, text):
-        """Find all matches of this pattern in the text"""
-        matches = []
-        try:
-            regex_pattern = self.to_regex()
-            for match in re.finditer(regex_pattern, text, flags=re.IGNORECASE):
-                pattern_match = PatternMatch(
-                    start_pos=match.start(),
-                    end_pos=match.end(),
-                    wildcards=list(match.groups()),
-                    rule=self
-                )
-                matches.append(pattern_match)
-        except re.error as e:
-            print(f"Regex error for pattern {self.pattern_template}: {e}")
-        
-        return matches
-    
-    def to_dict(self):
-        """Convert to dictionary for saving"""
-        return {
-            "pattern_template": self.pattern_template,
-            "replacement": self.replacement,
-            "priority": self.priority,
-            "location_enabled": self.location_enabled,
-            "selected_part_index": self.selected_part_index,
-            "color": self.color
-        }
+    def set_ranges(self, ranges):
+        self.clear()
+        self.ranges = ranges
+        self.refresh()
     
-    @classmethod
-    def from_dict(cls, data):
-        """Create instance from dictionary"""
-        return cls(
-            data.get("pattern_template", ""),
-            data.get("replacement", ""),
-            data.get("priority", 0),
-            data.get("location_enabled", False),
-            data.get("selected_part_index", 0),
-            data.get("color", "#cc7000")
-        )
-
-
-class HexProcessor:
-    """Clean hex processing engine"""
+    def clear(self):
+        """Remove the tags from the widget"""
+        if self.tagged is not None:
+            start_idx, end_idx = self.index(self.tagged[0]), self.index(self.tagged[1])
+            for tag in self.ranges.tags:
+                self.text.tag_remove(tag, start_idx, end_idx)
+        self.tagged = None
     
-    def process_hex_data(self, input_data, pattern_rules, location_rules):
-        """Process hex data with pattern and location rules"""
-        # Sort pattern rules by priority
-        sorted_patterns = sorted(pattern_rules, key=lambda r: (r.priority, pattern_rules.index(r)))
-        
-        # Stage 1: Find all pattern matches
-        all_matches = self.find_all_pattern_matches(input_data, sorted_patterns)
-        
-        # Stage 2: Apply pattern replacements and track positions
-        intermediate_result, location_positions = self.apply_pattern_replacements(input_data, all_matches)
-        
-        # Stage 3: Apply location rules using tracked positions
-        final_result = self.apply_location_rules(intermediate_result, location_positions, location_rules)
-        
-        return intermediate_result, final_result
+    def index(self, offset):
+        return f"1.0+{offset}c"
     
-    def find_all_pattern_matches(self, text, pattern_rules):
-        """Find all pattern matches and sort by position"""
-        all_matches = []
-        
-        for rule in pattern_rules:
-            matches = rule.find_matches(text)
-            all_matches.extend(matches)
-        
-        # Sort by position (rightmost first for safe replacement)
-        all_matches.sort(key=lambda m: m.start_pos, reverse=True)
-        
-        return all_matches
+    def offset(self, index):
+        """Character offset of a Tk index"""
+        line, column = map(int, self.text.index(index).split('.'))
+        if line == 1:
+            return column  # Canonical hex is a single line, so no counting needed
+        count = self.text.count("1.0", index, "chars")
+        return count[0] if count else 0
+    
+    def refresh(self):
+        """Retag after idle time, once per burst of scroll events"""
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.text.after_idle(self.refresh_now)
     
-    def apply_pattern_replacements(self, text, matches):
-        """Apply pattern replacements from right to left and track positions for location processing"""
-        result = text
-        # Track where each location-enabled replacement ended up
-        location_replacement_positions = []
+    def refresh_now(self):
+        self.refresh_pending = False
+        first = self.offset("@0,0")
+        last = self.offset(f"@{self.text.winfo_width()},{self.text.winfo_height()}")
+        if self.tagged is not None and self.tagged[0] <= first and last <= self.tagged[1]:
+            return
         
-        for match in matches:
-            replacement = match.apply_replacement_template()
-            
-            # Calculate current position (adjusting for previous replacements)
-            current_pos = match.start_pos
-            current_end = match.end_pos
-            
-            # Apply the replacement
-            result = result[:current_pos] + replacement + result[current_end:]
-            
-            # If this match has location data, track where the replacement is
-            if match.get_location_value() is not None:
-                location_replacement_positions.append({
-                    'start_pos': current_pos,
-                    'end_pos': current_pos + len(replacement),
-                    'location_value': match.get_location_value(),
-                    'replacement_text': replacement,
-                    'match': match
-                })
-            
-            # Update positions of other matches (those to the left)
-            position_shift = len(replacement) - (current_end - current_pos)
-            for other_match in matches:
-                if other_match.end_pos <= current_pos:
-                    other_match.start_pos += position_shift
-                    other_match.end_pos += position_shift
-        
-        return result, location_replacement_positions
-    
-    def apply_location_rules(self, text, location_replacement_positions, location_rules):
-        """Apply location rules using tracked replacement positions"""
-        if not location_rules or not location_replacement_positions:
-            return text
-        
-        # Create location mapping
-        location_map = {}
-        for find_text, replace_text in location_rules:
-            if find_text and replace_text:
-                location_map[find_text.upper()] = replace_text
-        
-        result = text
-        
-        # Sort by position (rightmost first) to avoid position shifts
-        location_replacement_positions.sort(key=lambda x: x['start_pos'], reverse=True)
-        
-        # Apply location rules to each tracked replacement
-        for pos_info in location_replacement_positions:
-            location_value = pos_info['location_value']
-            if location_value in location_map:
-                location_replacement = location_map[location_value]
-                
-                start_pos = pos_info['start_pos']
-                end_pos = pos_info['end_pos']
-                original_replacement = pos_info['replacement_text']
-                
-                # Create new replacement: location + original
-                new_replacement = location_replacement + original_replacement
-                
-                # Replace at the exact tracked position
-                result = result[:start_pos] + new_replacement + result[end_pos:]
-                
-                # Update positions of other replacements to the left
-                position_shift = len(new_replacement) - len(original_replacement)
-                for other_pos in location_replacement_positions:
-                    if other_pos['end_pos'] <= start_pos:
-                        other_pos['start_pos'] += position_shift
-                        other_pos['end_pos'] += position_shift
-        
-        return result
+        self.clear()
+        start, end = max(first - self.MARGIN_CHARS, 0), last + self.MARGIN_CHARS
+        for tag in self.ranges.tags:
+            indices = []
+            for range_start, range_end in self.ranges.window(tag, start, end):
+                indices.append(self.index(range_start))
+                indices.append(self.index(range_end))
+            if indices:
+                # One call per tag instead of one per range
+                self.text.tag_add(tag, *indices)
+        self.tagged = (start, end)
 
 
 class InputFrame(tb.LabelFrame):
     """Frame for hex data input"""
-    def __init__(self, parent, callback):
+    def __init__(self, parent, callback, preflight=None):
         super().__init__(parent, text="Input Hex Data")
         self.callback = callback
+        self.preflight = preflight  # Called with the bytes of a file before loading; False cancels
         self.highlight_tag = "highlight"
         self.selection_tag = "selection_highlight"
         self.rule_tags = []
+        self.is_canonical = True  # Widget content is in HexLayout form
+        self.search_rule = None  # Bytes of the last selection, searched by Find Next
+        self.source_path = None  # File the input was loaded from, referenced by saved sessions
+        self.scroll_callback = None  # Called with the visible (first, last) fractions of the input
         
         # Import button and occurrence counter
         button_frame = tb.Frame(self)
@@ -256,12 +98,27 @@ class InputFrame(tb.LabelFrame):
         import_btn = tb.Button(button_frame, text="Import Binary File", command=self.import_file)
         import_btn.pack(side=tk.LEFT, padx=5)
         
+        # Jump to byte offset
+        tb.Label(button_frame, text="Offset:").pack(side=tk.LEFT, padx=(15, 2))
+        self.offset_entry = tb.Entry(button_frame, width=10, font=("Courier", 10))
+        self.offset_entry.pack(side=tk.LEFT, padx=2)
+        self.offset_entry.bind("<Return>", self.jump_to_offset)
+        tb.Button(button_frame, text="Go", command=self.jump_to_offset).pack(side=tk.LEFT, padx=2)
+        
+        tb.Button(button_frame, text="Find Next", command=self.find_next).pack(side=tk.RIGHT, padx=5)
+        
         self.occurrence_label = tb.Label(button_frame, text="Occurrences: 0")
         self.occurrence_label.pack(side=tk.RIGHT, padx=5)
         
+        self.cursor_label = tb.Label(button_frame, text="Byte: 0x0")
+        self.cursor_label.pack(side=tk.RIGHT, padx=5)
+        
         # Input text area
         self.text_input = scrolledtext.ScrolledText(self, height=8, wrap=tk.WORD)
         self.text_input.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # Rule highlights are tagged only around the visible region and follow scrolling
+        self.highlighter = ViewportHighlighter(self.text_input)
+        self.text_input.config(yscrollcommand=self.on_input_scroll)
         
         # Configure tags
         self.text_input.tag_configure(self.highlight_tag, background="#cc7000", foreground="white", font=("TkDefaultFont", 10, "bold"))
@@ -287,82 +144,171 @@ class InputFrame(tb.LabelFrame):
                 HexManipulator.app_settings['binary_dir'] = os.path.dirname(file_path)
                 HexManipulator.save_settings()
                 
-                with open(file_path, 'rb') as file:
-                    binary_data = file.read()
-                hex_str = ' '.join(f'{b:02X}' for b in binary_data)
-                self.text_input.delete("1.0", tk.END)
-                self.text_input.insert("1.0", hex_str)
-                self.callback()
-                messagebox.showinfo("Import Successful", f"File '{os.path.basename(file_path)}' imported successfully")
+                if self.load_file(file_path):
+                    messagebox.showinfo("Import Successful", f"File '{os.path.basename(file_path)}' imported successfully")
             except Exception as e:
                 messagebox.showerror("Import Error", f"Error importing file: {str(e)}")
     
+    def load_file(self, file_path):
+        """Replace the input with the hex view of a binary file"""
+        with open(file_path, 'rb') as file:
+            binary_data = file.read()
+        if self.preflight is not None and not self.preflight(binary_data):
+            return False
+        self.set_input(HexLayout.from_bytes(binary_data), file_path)
+        self.callback()
+        return True
+    
+    def set_input(self, hex_str, source_path=None):
+        """Replace the widget content without notifying the callback"""
+        self.text_input.delete("1.0", tk.END)
+        self.text_input.insert("1.0", hex_str)
+        self.source_path = source_path
+    
     def on_input_change(self, event=None):
         if self.text_input.edit_modified():
+            self.normalize_input()
             self.callback()
             self.text_input.edit_modified(False)
     
+    def normalize_input(self):
+        """Rewrite typed or pasted text into the canonical layout, keeping the cursor"""
+        content = self.text_input.get("1.0", "end-1c")
+        try:
+            canonical = HexLayout.canonicalize(content)
+        except ValueError:
+            self.is_canonical = False
+            return
+        
+        self.is_canonical = True
+        if canonical == content:
+            return
+        
+        digits_before_cursor = HexLayout.digit_count(self.text_input.get("1.0", tk.INSERT))
+        self.text_input.delete("1.0", tk.END)
+        self.text_input.insert("1.0", canonical)
+        self.text_input.mark_set(tk.INSERT, self.text_index(HexLayout.digits_to_text(digits_before_cursor)))
+    
+    def text_index(self, text_offset):
+        """Tk index of a character offset (canonical text is a single line)"""
+        return f"1.{text_offset}"
+    
+    def jump_to_offset(self, event=None):
+        """Scroll to and place the cursor on a byte offset (hex with 0x prefix, or decimal)"""
+        value = self.offset_entry.get().strip()
+        try:
+            byte_offset = int(value, 0)
+        except ValueError:
+            messagebox.showwarning("Warning", f"Invalid offset: {value}")
+            return
+        
+        if not self.is_canonical:
+            messagebox.showwarning("Warning", "Input contains non-hex characters")
+            return
+        
+        self.goto_byte(byte_offset)
+    
+    def goto_byte(self, byte_offset):
+        """Place the cursor on a byte and scroll it into view"""
+        index = self.text_index(HexLayout.byte_to_text(max(byte_offset, 0)))
+        self.text_input.mark_set(tk.INSERT, index)
+        self.text_input.see(index)
+        self.text_input.focus_set()
+        self.update_cursor_label()
+    
+    def update_cursor_label(self):
+        """Show the byte offset under the cursor"""
+        if self.is_canonical:
+            column = int(self.text_input.index(tk.INSERT).split('.')[1])
+            self.cursor_label.config(text=f"Byte: 0x{HexLayout.text_to_byte(column):X}")
+    
     def on_selection_change(self, event=None):
         """Handle text selection changes"""
+        self.update_cursor_label()
         try:
-            self.text_input.tag_remove(self.selection_tag, "1.0", tk.END)
-            
-            if self.text_input.tag_ranges(tk.SEL):
-                selected_text = self.text_input.get(tk.SEL_FIRST, tk.SEL_LAST)
-                
-                if selected_text and len(selected_text.strip()) > 0:
-                    occurrence_count = self.highlight_selection(selected_text)
-                    self.occurrence_label.config(text=f"Occurrences: {occurrence_count}")
-                else:
-                    self.occurrence_label.config(text="Occurrences: 0")
-            else:
-                self.occurrence_label.config(text="Occurrences: 0")
+            rule = self.selection_rule() if self.text_input.tag_ranges(tk.SEL) else None
         except tk.TclError:
-            self.occurrence_label.config(text="Occurrences: 0")
-    
-    def highlight_selection(self, text_to_highlight):
-        """Highlight all occurrences of selected text"""
-        if not text_to_highlight or text_to_highlight.isspace():
-            return 0
-        
-        escaped_text = re.escape(text_to_highlight)
-        occurrence_count = 0
-        
-        start_idx = "1.0"
-        while True:
-            start_idx = self.text_input.search(escaped_text, start_idx, 
-                                             stopindex=tk.END, 
-                                             regexp=True, nocase=False)
-            if not start_idx:
-                break
-                
-            end_idx = f"{start_idx}+{len(text_to_highlight)}c"
-            self.text_input.tag_add(self.selection_tag, start_idx, end_idx)
-            occurrence_count += 1
-            start_idx = end_idx
-        
-        return occurrence_count
+            rule = None
+        if rule is not None:
+            self.search_rule = rule
+        occurrence_count = self.highlight_selection(rule)
+        self.occurrence_label.config(text=f"Occurrences: {occurrence_count}")
     
-    def get_input(self):
-        return self.text_input.get("1.0", tk.END).strip()
+    def selection_rule(self):
+        """Literal rule for the whole bytes covered by the selection, or None"""
+        if not self.is_canonical:
+            return None
+        
+        content = self.get_input()
+        start_pos = int(self.text_input.index(tk.SEL_FIRST).split('.')[1])
+        end_pos = int(self.text_input.index(tk.SEL_LAST).split('.')[1])
+        
+        # Snap the selection outwards to whole bytes
+        start_pos = HexLayout.byte_to_text(HexLayout.text_to_byte(start_pos))
+        end_pos = HexLayout.byte_end_to_text(HexLayout.text_to_byte(max(end_pos - 1, start_pos)) + 1)
+        selected_bytes = content[start_pos:end_pos].strip()
+        
+        if not selected_bytes:
+            return None
+        return SimplePatternRule(selected_bytes, "")
     
-    def highlight_patterns(self, pattern_rules):
-        """Highlight matching patterns with their colors"""
-        # Clear existing rule tags
-        for tag in self.rule_tags:
-            self.text_input.tag_remove(tag, "1.0", tk.END)
-        
-        self.rule_tags = []
-        input_text = self.get_input()
+    def highlight_selection(self, rule):
+        """Highlight all occurrences of the selected bytes (none for None) through the viewport highlighter
+        
+        Returns the number of occurrences.
+        """
+        self.highlighter.clear()
+        ranges = self.highlighter.ranges
+        ranges.discard(self.selection_tag)
+        count = 0
+        if rule is not None:
+            for match in iter_matches([rule], self.get_input()):
+                ranges.add(self.selection_tag, match.start_pos, match.end_pos)
+                count += 1
+        self.highlighter.refresh()
+        return count
+    
+    def find_next(self):
+        """Select the next occurrence of the last selection after the cursor, wrapping around"""
+        if self.search_rule is None or not self.is_canonical:
+            return
         
-        if not input_text or not pattern_rules:
+        content = self.get_input()
+        cursor_pos = int(self.text_input.index(tk.INSERT).split('.')[1])
+        found = first_n([self.search_rule], content, 1, cursor_pos + 1)
+        if not found:
+            found = first_n([self.search_rule], content, 1)
+        if not found:
             return
         
-        content = self.text_input.get("1.0", tk.END)
+        start_index = self.text_index(found[0].start_pos)
+        end_index = self.text_index(found[0].end_pos)
+        self.text_input.tag_remove(tk.SEL, "1.0", tk.END)
+        self.text_input.tag_add(tk.SEL, start_index, end_index)
+        self.text_input.mark_set(tk.INSERT, start_index)
+        self.text_input.see(start_index)
+        self.update_cursor_label()
+    
+    def get_input(self):
+        # "end-1c" drops Tk's trailing newline, so strip() returns the same string instead of a copy
+        return self.text_input.get("1.0", "end-1c").strip()
+    
+    def on_input_scroll(self, first, last):
+        self.text_input.vbar.set(first, last)
+        self.highlighter.refresh()
+        if self.scroll_callback is not None:
+            self.scroll_callback(float(first), float(last))
+    
+    def highlight_patterns(self, pattern_rules, table, input_changed=True):
+        """Highlight the matches of a MatchTable over this input with the colors of their rules
         
-        for i, rule in enumerate(pattern_rules):
-            try:
-                regex_pattern = rule.to_regex()
+        The table is the one the pipeline just matched, so the input is not scanned again.
+        Selection occurrences are kept unless the input changed under them.
+        """
+        self.rule_tags = []
+        ranges = HighlightRanges()
+        if table is not None and len(table) and self.is_canonical:
+            for i, rule in enumerate(pattern_rules):
                 tag_name = f"pattern_color_{i}"
                 self.rule_tags.append(tag_name)
                 
@@ -373,30 +319,191 @@ class InputFrame(tb.LabelFrame):
                     self.text_input.tag_configure(tag_name, background=rule.color)
                 
                 self.text_input.tag_lower(tag_name, self.selection_tag)
-                
-                # Use case-insensitive matching for hex patterns
-                for match in re.finditer(regex_pattern, content, re.IGNORECASE):
-                    start_pos = match.start()
-                    end_pos = match.end()
-                    
-                    # Convert to line.char format
-                    start_line = content[:start_pos].count('\n') + 1
-                    start_char = start_pos - content[:start_pos].rfind('\n') - 1
-                    if start_line == 1:
-                        start_char = start_pos
-                    
-                    end_line = content[:end_pos].count('\n') + 1
-                    end_char = end_pos - content[:end_pos].rfind('\n') - 1
-                    if end_line == 1:
-                        end_char = end_pos
-                    
-                    start_index = f"{start_line}.{start_char}"
-                    end_index = f"{end_line}.{end_char}"
-                    self.text_input.tag_add(tag_name, start_index, end_index)
             
-            except re.error as e:
-                print(f"Regex error for pattern {rule.pattern_template}: {e}")
-                continue
+            # Rule ids of the table are indices into pattern_rules, which the pipeline matched
+            # Ranges are added in position order; matches one space apart (adjacent bytes) merge into one range
+            starts, ends, rule_ids = table.starts, table.ends, table.rule_ids
+            for index in sorted(range(len(table)), key=starts.__getitem__):
+                ranges.add(f"pattern_color_{rule_ids[index]}", starts[index], ends[index], join_gap=1)
+        
+        # Edits move text under the old tags, so start from an untagged widget
+        for tag in self.text_input.tag_names():
+            if tag.startswith("pattern_color_") or tag == self.selection_tag:
+                self.text_input.tag_remove(tag, "1.0", tk.END)
+        old_ranges = self.highlighter.ranges
+        had_selection = self.selection_tag in old_ranges.starts
+        if had_selection and not input_changed:
+            ranges.starts[self.selection_tag] = old_ranges.starts[self.selection_tag]
+            ranges.ends[self.selection_tag] = old_ranges.ends[self.selection_tag]
+        self.highlighter.tagged = None
+        self.highlighter.set_ranges(ranges)
+        if had_selection and input_changed:
+            self.on_selection_change()  # Offsets moved with the edit
+    
+    def recolor_patterns(self, pattern_rules):
+        """Apply changed rule colors to existing highlights without matching again"""
+        for tag_name, rule in zip(self.rule_tags, pattern_rules):
+            self.text_input.tag_configure(tag_name, background=rule.color)
+
+
+class OverviewFrame(tb.LabelFrame):
+    """Minimap of the input: entropy and match density per range, zoomed with the wheel, clicked to jump there"""
+    ROW_PIXELS = 2  # Minimap height per aggregated range
+    HISTOGRAM_BARS = 64  # Byte values are grouped four to a bar
+    
+    def __init__(self, parent, goto_callback):
+        super().__init__(parent, text="Overview")
+        self.goto_callback = goto_callback  # Called with a byte offset of the input
+        self.summaries = None  # ChunkSummaries of the current input, kept while only the rules change
+        self.view_start = 0  # Byte range shown; zooming narrows it
+        self.view_end = None
+        self.rows = None  # OverviewRows drawn on the minimap
+        self.viewport = (0.0, 0.0)  # Visible fractions of the input text
+        self.draw_pending = False
+        
+        self.info_label = tb.Label(self, text="", font=("TkDefaultFont", 8), justify=tk.LEFT)
+        self.info_label.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        self.minimap = tk.Canvas(self, width=100, highlightthickness=0, background="#222222", cursor="hand2")
+        self.minimap.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.histogram = tk.Canvas(self, width=100, height=50, highlightthickness=0, background="#222222")
+        self.histogram.pack(fill=tk.X, padx=5)
+        tb.Button(self, text="Reset Zoom", command=self.reset_zoom).pack(fill=tk.X, padx=5, pady=5)
+        
+        self.minimap.bind("<Configure>", lambda e: self.schedule_draw())
+        self.minimap.bind("<Button-1>", self.on_click)
+        self.minimap.bind("<Motion>", self.on_motion)
+        self.minimap.bind("<MouseWheel>", lambda e: self.zoom(e.y, 0.5 if e.delta > 0 else 2))
+        self.minimap.bind("<Button-4>", lambda e: self.zoom(e.y, 0.5))  # X11 wheel
+        self.minimap.bind("<Button-5>", lambda e: self.zoom(e.y, 2))
+    
+    def set_summaries(self, summaries, keep_view=False):
+        """Show new summaries; keep_view keeps the zoomed range when the input is the same"""
+        self.summaries = summaries
+        if not keep_view:
+            self.view_start, self.view_end = 0, None
+        self.schedule_draw()
+    
+    def set_viewport(self, first, last):
+        if (first, last) != self.viewport:
+            self.viewport = (first, last)
+            self.draw_viewport()
+    
+    def reset_zoom(self):
+        self.view_start, self.view_end = 0, None
+        self.schedule_draw()
+    
+    def schedule_draw(self):
+        if not self.draw_pending:
+            self.draw_pending = True
+            self.after_idle(self.draw)
+    
+    @staticmethod
+    def entropy_color(entropy):
+        """Dark blue for constant data through green to red for random or compressed data"""
+        level = min(max(entropy / 8, 0.0), 1.0)
+        if level < 0.5:
+            red, green, blue = 0, int(40 + 400 * level), int(140 - 100 * level)
+        else:
+            red, green, blue = int(510 * (level - 0.5)), int(240 - 300 * (level - 0.5)), 40
+        return f"#{red:02x}{green:02x}{blue:02x}"
+    
+    def draw(self):
+        """Aggregate the cached chunk summaries for the current range and size, then paint them"""
+        self.draw_pending = False
+        self.minimap.delete("all")
+        self.rows = None
+        if self.summaries is None or not self.summaries.size:
+            self.info_label.config(text="")
+            self.histogram.delete("all")
+            return
+        
+        width = self.minimap.winfo_width()
+        height = self.minimap.winfo_height()
+        self.rows = self.summaries.aggregate(self.view_start, self.view_end, max(height // self.ROW_PIXELS, 1))
+        rows = self.rows
+        if not len(rows):
+            return
+        
+        # Entropy fills the left of each row, match density is a bar on the right
+        density_left = width * 2 // 3
+        most_matches = max(max(rows.matches), 1)
+        for row in range(len(rows)):
+            top = row * height / len(rows)
+            bottom = (row + 1) * height / len(rows)
+            self.minimap.create_rectangle(0, top, density_left, bottom, width=0,
+                                          fill=self.entropy_color(rows.entropy[row]))
+            if rows.matches[row]:
+                bar = (width - density_left) * rows.matches[row] / most_matches
+                self.minimap.create_rectangle(density_left, top, density_left + max(bar, 1), bottom,
+                                              width=0, fill="#cc7000")
+        self.draw_viewport()
+        self.show_row(0)
+    
+    def draw_viewport(self):
+        """Outline the part of the input visible in the input pane"""
+        self.minimap.delete("viewport")
+        if self.rows is None or not len(self.rows):
+            return
+        size = self.summaries.size
+        view_start, view_end = self.rows.starts[0], self.rows.ends[-1]
+        first, last = self.viewport[0] * size, self.viewport[1] * size
+        if last < view_start or first > view_end:
+            return
+        height = self.minimap.winfo_height()
+        scale = height / max(view_end - view_start, 1)
+        top = max((first - view_start) * scale, 0)
+        bottom = min(max((last - view_start) * scale, top + 2), height - 1)
+        self.minimap.create_rectangle(1, top, self.minimap.winfo_width() - 1, bottom, outline="white", tags="viewport")
+    
+    def row_at_y(self, y):
+        if self.rows is None or not len(self.rows):
+            return None
+        height = max(self.minimap.winfo_height(), 1)
+        return min(max(int(y * len(self.rows) / height), 0), len(self.rows) - 1)
+    
+    def on_click(self, event):
+        row = self.row_at_y(event.y)
+        if row is not None:
+            self.goto_callback(self.rows.starts[row])
+    
+    def on_motion(self, event):
+        row = self.row_at_y(event.y)
+        if row is not None:
+            self.show_row(row)
+    
+    def show_row(self, row):
+        """Offsets, entropy and match density of one row, and its byte histogram"""
+        rows = self.rows
+        self.info_label.config(text=f"0x{rows.starts[row]:X}-0x{rows.ends[row]:X}\n"
+                                    f"Entropy {rows.entropy[row]:.2f} bits\n"
+                                    f"{rows.matches[row]:,} matches ({rows.density(row):.1f}/KB)")
+        
+        self.histogram.delete("all")
+        counts = rows.histograms[row]
+        group = 256 // self.HISTOGRAM_BARS
+        bars = [sum(counts[value:value + group]) for value in range(0, 256, group)]
+        tallest = max(max(bars), 1)
+        width = self.histogram.winfo_width()
+        height = self.histogram.winfo_height()
+        for number, count in enumerate(bars):
+            if count:
+                left = number * width / len(bars)
+                self.histogram.create_rectangle(left, height - height * count / tallest,
+                                                left + width / len(bars), height, width=0, fill="#4a6984")
+    
+    def zoom(self, y, factor):
+        """Narrow (factor < 1) or widen the shown range around the row under the pointer"""
+        row = self.row_at_y(y)
+        if row is None:
+            return
+        size = self.summaries.size
+        start, end = self.rows.starts[0], self.rows.ends[-1]
+        center = (self.rows.starts[row] + self.rows.ends[row]) // 2
+        span = min(max(int((end - start) * factor), self.summaries.chunk_bytes * 4), size)
+        self.view_start = min(max(center - span // 2, 0), size - span)
+        self.view_end = self.view_start + span
+        self.schedule_draw()
 
 
 class ColorSquare(tk.Frame):
@@ -429,9 +536,68 @@ class ColorSquare(tk.Frame):
         return self.color
 
 
+class KeyedTreeList(tb.Frame):
+    """Treeview list updated by key, so unchanged rows are left alone and only visible rows are drawn"""
+    def __init__(self, parent, columns, height=6):
+        super().__init__(parent)
+        self.rows = {}  # Row key -> (values, tags) currently shown
+        self.order = []  # Row keys in display order
+        
+        self.tree = tb.Treeview(self, columns=[name for name, _ in columns], show="headings",
+                                selectmode="browse", height=height)
+        for name, width in columns:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=width, stretch=(width > 100), anchor="w")
+        
+        scrollbar = tb.Scrollbar(self, command=self.tree.yview)
+        self.tree.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.empty_label = tb.Label(self, text="", foreground="#6c757d", font=("TkDefaultFont", 9, "italic"))
+    
+    def sync(self, rows, empty_text="No rules defined"):
+        """Bring the tree in line with rows [(key, values, tags)], touching only rows that differ"""
+        wanted = {key: (tuple(values), tuple(tags)) for key, values, tags in rows}
+        
+        for key in self.order:
+            if key not in wanted:
+                self.tree.delete(key)
+                del self.rows[key]
+        
+        for key, _, _ in rows:
+            row = wanted[key]
+            if key not in self.rows:
+                self.tree.insert("", tk.END, iid=key, values=row[0], tags=row[1])
+            elif self.rows[key] != row:
+                self.tree.item(key, values=row[0], tags=row[1])
+            self.rows[key] = row
+        
+        order = [key for key, _, _ in rows]
+        if self.tree.get_children() != tuple(order):
+            self.tree.set_children("", *order)
+        self.order = order
+        
+        # Placeholder shown over an empty list
+        if rows:
+            self.empty_label.place_forget()
+        else:
+            self.empty_label.config(text=empty_text)
+            self.empty_label.place(relx=0.5, rely=0.4, anchor="center")
+    
+    def selected_key(self):
+        selection = self.tree.selection()
+        return selection[0] if selection else None
+    
+    def select(self, key):
+        if key in self.rows:
+            self.tree.selection_set(key)
+            self.tree.see(key)
+
+
 class PatternRulesFrame(tb.LabelFrame):
     """Frame for pattern rule management"""
-    def __init__(self, parent, update_callback):
+    def __init__(self, parent, update_callback, corpus_callback=None):
         super().__init__(parent, text="Pattern Rules")
         self.update_callback = update_callback
         self.pattern_rules = []
@@ -471,7 +637,8 @@ class PatternRulesFrame(tb.LabelFrame):
         tb.Button(add_frame, text="Add Rule", command=self.add_rule).grid(row=2, column=0, columnspan=4, padx=5, pady=5)
         
         # Info label
-        info_label = tb.Label(add_frame, text="Use ## for wildcards, #1 #2 #3 etc. in replacement to reference them", 
+        info_label = tb.Label(add_frame, text="Use ## for wildcards, #1 #2 #3 etc. in replacement to reference them, "
+                                   "{u16le(#1,#2)} / {i32be(#1..#4)} / {f32le(#1..#4)} to decode fields", 
                              font=("TkDefaultFont", 8), foreground="#6c757d")
         info_label.grid(row=3, column=0, columnspan=4, padx=5, pady=2)
         
@@ -481,38 +648,95 @@ class PatternRulesFrame(tb.LabelFrame):
         
         tb.Button(button_frame, text="Save Rules", command=self.save_rules).pack(side=tk.LEFT, padx=5, pady=5)
         tb.Button(button_frame, text="Load Rules", command=self.load_rules).pack(side=tk.LEFT, padx=5, pady=5)
+        tb.Button(button_frame, text="Analyze", command=self.analyze_rules).pack(side=tk.LEFT, padx=5, pady=5)
+        if corpus_callback:
+            tb.Button(button_frame, text="Corpus Search", command=corpus_callback).pack(side=tk.LEFT, padx=5, pady=5)
         
         # Scrollable rules list
         self.setup_scrollable_list()
     
     def setup_scrollable_list(self):
-        """Setup scrollable rules display"""
-        container = tb.Frame(self)
-        container.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        self.scrollbar = tb.Scrollbar(container)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.canvas = tk.Canvas(container)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        self.scrollbar.config(command=self.canvas.yview)
-        self.canvas.config(yscrollcommand=self.scrollbar.set)
-        
-        self.rules_list_frame = tb.Frame(self.canvas)
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.rules_list_frame, anchor="nw")
-        
-        self.rules_list_frame.bind("<Configure>", self.on_frame_configure)
-        self.canvas.bind("<Configure>", self.on_canvas_configure)
+        """Setup the rules list with actions for the selected rule"""
+        self.rules_list = KeyedTreeList(self, [("Priority", 60), ("Pattern", 160),
+                                               ("Replacement", 220), ("Location", 80)])
+        self.rules_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=(5, 0))
+        self.color_tags = set()  # Row color tags already configured on the tree
+        self.rules_list.tree.bind("<<TreeviewSelect>>", self.on_rule_select)
+        self.rules_list.tree.bind("<Double-1>", lambda e: self.edit_selected())
+        self.rules_list.tree.bind("<Delete>", lambda e: self.delete_selected())
+        
+        action_frame = tb.Frame(self)
+        action_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        tb.Button(action_frame, text="Edit", command=self.edit_selected).pack(side=tk.LEFT, padx=2)
+        tb.Button(action_frame, text="Color", command=self.edit_selected_color).pack(side=tk.LEFT, padx=2)
+        tb.Button(action_frame, text="Delete", command=self.delete_selected).pack(side=tk.LEFT, padx=2)
+        
+        # Location part selector for the selected rule; several wildcards (typed as #4#3#2#1) form a composite key
+        tb.Label(action_frame, text="Location wildcard:", font=("TkDefaultFont", 8)).pack(side=tk.LEFT, padx=(15, 2))
+        self.location_part_var = tk.StringVar()
+        self.location_part_combo = tb.Combobox(action_frame, textvariable=self.location_part_var,
+                                               width=10, state="disabled")
+        self.location_part_combo.pack(side=tk.LEFT, padx=2)
+        self.location_part_combo.bind("<<ComboboxSelected>>", self.on_location_part_selected)
+        self.location_part_combo.bind("<Return>", self.on_location_part_selected)
+        
+        self.update_rules_display()
+    
+    def rule_key(self, rule):
+        return f"rule{id(rule)}"
+    
+    def selected_index(self):
+        """Index of the selected rule, or None"""
+        key = self.rules_list.selected_key()
+        for idx, rule in enumerate(self.pattern_rules):
+            if self.rule_key(rule) == key:
+                return idx
+        return None
+    
+    def on_rule_select(self, event=None):
+        """Show the location part choices of the selected rule"""
+        idx = self.selected_index()
+        rule = self.pattern_rules[idx] if idx is not None else None
+        if rule is None or not rule.location_enabled or rule.get_wildcard_count() == 0:
+            self.location_part_var.set("")
+            self.location_part_combo.config(values=[], state="disabled")
+            return
         
-        # Initial empty state
-        tb.Label(self.rules_list_frame, text="No rules defined").pack()
+        count = rule.get_wildcard_count()
+        choices = [f"#{i + 1}" for i in range(count)]
+        if count > 1:
+            # All wildcards as a little-endian and a big-endian number
+            choices += ["".join(f"#{i}" for i in range(count, 0, -1)), "".join(f"#{i + 1}" for i in range(count))]
+        self.location_part_combo.config(values=choices, state="normal")
+        self.location_part_var.set(rule.location_label())
+    
+    def on_location_part_selected(self, event=None):
+        idx = self.selected_index()
+        if idx is None:
+            return
+        parts = [int(number) - 1 for number in re.findall(r"#(\d+)", self.location_part_var.get())]
+        count = self.pattern_rules[idx].get_wildcard_count()
+        if not parts or any(not 0 <= part < count for part in parts):
+            messagebox.showwarning("Warning", f"Location wildcards must be between #1 and #{count}, e.g. #2 or #4#3#2#1")
+            self.location_part_var.set(self.pattern_rules[idx].location_label())
+            return
+        self.select_location_part(idx, parts)
+    
+    def edit_selected(self):
+        idx = self.selected_index()
+        if idx is not None:
+            self.edit_rule(idx)
     
-    def on_frame_configure(self, event):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def edit_selected_color(self):
+        idx = self.selected_index()
+        if idx is not None:
+            self.edit_color(idx)
     
-    def on_canvas_configure(self, event):
-        self.canvas.itemconfig(self.canvas_window, width=event.width)
+    def delete_selected(self):
+        idx = self.selected_index()
+        if idx is not None:
+            self.delete_rule(idx)
     
     def select_color(self):
         """Open color chooser dialog"""
@@ -522,12 +746,23 @@ class PatternRulesFrame(tb.LabelFrame):
         if color_result and color_result[1]:
             self.color_selector.set_color(color_result[1])
     
+    def check_pattern(self, pattern):
+        """Warn about and reject templates that do not parse"""
+        try:
+            PatternTemplate(pattern)
+        except ValueError as e:
+            messagebox.showwarning("Invalid Pattern", f"{e}\n\nTokens: 2A, ##, ?A, A?, 2A&F0, (2A|2B), ##{{2,8}}")
+            return False
+        return True
+    
     def add_rule(self):
         """Add new pattern rule"""
         pattern = self.pattern_entry.get().strip()
         replacement = self.replace_entry.get().strip()
         
         if pattern and replacement:
+            if not self.check_pattern(pattern):
+                return
             rule = SimplePatternRule(
                 pattern_template=pattern,
                 replacement=replacement,
@@ -539,6 +774,7 @@ class PatternRulesFrame(tb.LabelFrame):
             
             self.pattern_rules.append(rule)
             self.update_rules_display()
+            self.rules_list.select(self.rule_key(rule))
             
             # Clear inputs but keep default pattern
             self.pattern_entry.delete(0, tk.END)
@@ -554,92 +790,37 @@ class PatternRulesFrame(tb.LabelFrame):
             messagebox.showwarning("Warning", "Both pattern and replacement must be provided")
     
     def update_rules_display(self):
-        """Update visual display of all rules"""
-        # Clear existing widgets
-        for widget in self.rules_list_frame.winfo_children():
-            widget.destroy()
-        
-        if not self.pattern_rules:
-            tb.Label(self.rules_list_frame, text="No rules defined").pack()
-            self.on_frame_configure(None)
-            return
-        
-        for idx, rule in enumerate(self.pattern_rules):
-            rule_frame = tb.Frame(self.rules_list_frame)
-            rule_frame.pack(fill=tk.X, padx=5, pady=2)
-            
-            # Rule header
-            header_frame = tb.Frame(rule_frame)
-            header_frame.pack(fill=tk.X)
-            
-            tb.Label(header_frame, text=f"{idx+1}.", width=3).pack(side=tk.LEFT, padx=5)
-            
-            priority_label = tb.Label(header_frame, text=f"P:{rule.priority}", 
-                                    background="#6c757d" if rule.priority == 0 else 
-                                    ("#dc3545" if rule.priority < 0 else "#28a745"),
-                                    foreground="white", width=4)
-            priority_label.pack(side=tk.LEFT, padx=2)
+        """Update the rules list, changing only rows whose rule changed
+        
+        Rows hold no list position, so adding, removing or moving one rule leaves the other rows untouched.
+        """
+        tree = self.rules_list.tree
+        rows = []
+        for rule in self.pattern_rules:
+            # One tag per color gives each row its rule color
+            color_tag = f"color_{rule.color}"
+            if color_tag not in self.color_tags:
+                tree.tag_configure(color_tag, background=rule.color, foreground="white")
+                self.color_tags.add(color_tag)
             
+            location = ""
             if rule.location_enabled:
-                loc_label = tb.Label(header_frame, text="LOC", background="#007bff", 
-                                   foreground="white", width=4)
-                loc_label.pack(side=tk.LEFT, padx=2)
-            
-            # Pattern and replacement display
-            content_frame = tb.Frame(rule_frame)
-            content_frame.pack(fill=tk.X, pady=2)
-            
-            tb.Label(content_frame, text=f"Pattern: {rule.pattern_template}", 
-                    width=20, anchor="w").pack(side=tk.LEFT, padx=5)
-            tb.Label(content_frame, text=f"→ {rule.replacement}", 
-                    width=25, anchor="w").pack(side=tk.LEFT, padx=5)
-            
-            # Color square and action buttons
-            action_frame = tb.Frame(rule_frame)
-            action_frame.pack(fill=tk.X, pady=2)
-            
-            def make_color_command(rule_idx):
-                return lambda: self.edit_color(rule_idx)
-            
-            color_square = ColorSquare(action_frame, color=rule.color, command=make_color_command(idx))
-            color_square.pack(side=tk.LEFT, padx=5)
-            
-            # Location part selector (if enabled and has wildcards)
-            if rule.location_enabled and rule.get_wildcard_count() > 0:
-                loc_frame = tb.Frame(action_frame)
-                loc_frame.pack(side=tk.LEFT, padx=10)
-                
-                tb.Label(loc_frame, text="Location wildcard:", font=("TkDefaultFont", 8)).pack()
-                
-                parts_frame = tb.Frame(loc_frame)
-                parts_frame.pack()
-                
-                for wildcard_idx in range(rule.get_wildcard_count()):
-                    def make_part_command(rule_idx, wc_idx):
-                        return lambda: self.select_location_part(rule_idx, wc_idx)
-                    
-                    is_selected = wildcard_idx == rule.selected_part_index
-                    part_btn = tb.Button(parts_frame, text=f"#{wildcard_idx+1}", 
-                                       command=make_part_command(idx, wildcard_idx),
-                                       bootstyle="primary" if is_selected else "secondary",
-                                       width=4)
-                    part_btn.pack(side=tk.LEFT, padx=1)
-            
-            # Edit and delete buttons
-            tb.Button(action_frame, text="Edit", command=lambda i=idx: self.edit_rule(i)).pack(side=tk.RIGHT, padx=2)
-            tb.Button(action_frame, text="X", command=lambda i=idx: self.delete_rule(i)).pack(side=tk.RIGHT, padx=2)
-            
-            # Add separator
-            tb.Separator(rule_frame, orient="horizontal").pack(fill=tk.X, pady=2)
+                location = f"LOC {rule.location_label()}" if rule.get_wildcard_count() > 0 else "LOC"
+            values = (f"P:{rule.priority}", rule.pattern_template, f"→ {rule.replacement}", location)
+            rows.append((self.rule_key(rule), values, (color_tag,)))
         
-        self.on_frame_configure(None)
+        self.rules_list.sync(rows)
+        self.on_rule_select()
     
-    def select_location_part(self, rule_idx, wildcard_idx):
-        """Select which wildcard part is used for location rules"""
+    def select_location_part(self, rule_idx, parts):
+        """Select which wildcard parts, in key order, are used for location rules"""
         if rule_idx < len(self.pattern_rules):
-            self.pattern_rules[rule_idx].selected_part_index = wildcard_idx
+            rule = self.pattern_rules[rule_idx]
+            rule.selected_part_index = parts[0]
+            rule.location_parts = parts if len(parts) > 1 else None
             self.update_rules_display()
-            self.update_callback()
+            # Only the location stage depends on the selected wildcard
+            self.update_callback(DocumentModel.LOCATIONS)
     
     def edit_color(self, idx):
         """Edit color for a rule"""
@@ -650,7 +831,7 @@ class PatternRulesFrame(tb.LabelFrame):
             if color_result and color_result[1]:
                 self.pattern_rules[idx].color = color_result[1]
                 self.update_rules_display()
-                self.update_callback()
+                self.update_callback(DocumentModel.DISPLAY)
     
     def edit_rule(self, idx):
         """Edit an existing rule"""
@@ -689,14 +870,17 @@ class PatternRulesFrame(tb.LabelFrame):
             new_replacement = replace_entry.get().strip()
             
             if new_pattern and new_replacement:
+                if not self.check_pattern(new_pattern):
+                    return
                 rule.pattern_template = new_pattern
                 rule.replacement = new_replacement
                 rule.priority = priority_var.get()
                 rule.location_enabled = location_var.get()
                 
                 # Reset selected part if pattern changed
-                if rule.get_wildcard_count() <= rule.selected_part_index:
+                if rule.get_wildcard_count() <= max(rule.location_indices()):
                     rule.selected_part_index = 0
+                    rule.location_parts = None
                 
                 self.update_rules_display()
                 edit_dialog.destroy()
@@ -773,8 +957,28 @@ class PatternRulesFrame(tb.LabelFrame):
             except Exception as e:
                 messagebox.showerror("Load Error", f"Error loading rules: {str(e)}")
     
+    def analyze_rules(self):
+        """Report duplicate, shadowed and invalid rules and offer to remove the dead ones"""
+        from hexengine.analysis import RuleSetAnalysis
+        analysis = RuleSetAnalysis(self.pattern_rules)
+        report = "\n".join(analysis.report(limit=30))
+        dead_rules = analysis.dead_rules
+        if not dead_rules:
+            messagebox.showinfo("Rule Analysis", report)
+            return
+        if messagebox.askyesno("Rule Analysis", report + f"\n\nRemove the {len(dead_rules)} dead rules? "
+                               "The outputs stay the same."):
+            self.pattern_rules = analysis.optimized_rules()
+            self.update_rules_display()
+            self.update_callback()
+    
     def get_rules(self):
         return self.pattern_rules
+    
+    def set_rules(self, rules):
+        """Replace the rule list without notifying the callback, e.g. when a session is opened"""
+        self.pattern_rules = rules
+        self.update_rules_display()
 
 
 class LocationRulesFrame(tb.LabelFrame):
@@ -784,6 +988,10 @@ class LocationRulesFrame(tb.LabelFrame):
         self.update_callback = update_callback
         self.location_rules = []  # List of (find, replace) tuples
         
+        self.location_rule_keys = []  # Stable list key of each location rule
+        self.next_location_key = 0
+        self.location_tables = []  # LocationIndex tables imported from files, looked up after the rules
+        
         # Two-section layout
         main_container = tb.Frame(self)
         main_container.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -792,8 +1000,8 @@ class LocationRulesFrame(tb.LabelFrame):
         left_frame = tb.LabelFrame(main_container, text="Location-Enabled Patterns")
         left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 5))
         
-        self.affected_patterns_frame = tb.Frame(left_frame)
-        self.affected_patterns_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.affected_patterns_list = KeyedTreeList(left_frame, [("Pattern", 180), ("Location wildcard", 110)], height=4)
+        self.affected_patterns_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Right section: Location replacements
         right_frame = tb.LabelFrame(main_container, text="Location Replacements")
@@ -814,84 +1022,69 @@ class LocationRulesFrame(tb.LabelFrame):
         self.replace_entry.pack(side=tk.LEFT, padx=2)
         
         tb.Button(add_frame, text="Add", command=self.add_location_rule).pack(side=tk.LEFT, padx=5)
-        
-        # Scrollable location rules list
-        rules_container = tb.Frame(right_frame)
-        rules_container.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        self.rules_scrollbar = tb.Scrollbar(rules_container)
-        self.rules_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.rules_canvas = tk.Canvas(rules_container)
-        self.rules_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        self.rules_scrollbar.config(command=self.rules_canvas.yview)
-        self.rules_canvas.config(yscrollcommand=self.rules_scrollbar.set)
-        
-        self.location_rules_frame = tb.Frame(self.rules_canvas)
-        self.rules_canvas_window = self.rules_canvas.create_window((0, 0), window=self.location_rules_frame, anchor="nw")
-        
-        self.location_rules_frame.bind("<Configure>", self.on_rules_frame_configure)
-        self.rules_canvas.bind("<Configure>", self.on_rules_canvas_configure)
+        tb.Button(add_frame, text="X", command=self.delete_selected).pack(side=tk.RIGHT, padx=2)
+        tb.Button(add_frame, text="Edit", command=self.edit_selected).pack(side=tk.RIGHT, padx=2)
+        
+        # Location rules list
+        self.location_rules_list = KeyedTreeList(right_frame, [("Find", 80), ("Replace", 160)], height=4)
+        self.location_rules_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.location_rules_list.tree.bind("<Double-1>", lambda e: self.edit_selected())
+        self.location_rules_list.tree.bind("<Delete>", lambda e: self.delete_selected())
+        
+        # Large tables (symbol listings, CSV exports) are indexed instead of listed
+        table_frame = tb.Frame(right_frame)
+        table_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        tb.Button(table_frame, text="Import Table", command=self.import_table).pack(side=tk.LEFT, padx=2)
+        tb.Button(table_frame, text="Clear Tables", command=self.clear_tables).pack(side=tk.LEFT, padx=2)
+        self.tables_label = tb.Label(table_frame, text="", font=("TkDefaultFont", 8))
+        self.tables_label.pack(side=tk.LEFT, padx=5)
         
         # Initial display
         self.update_affected_patterns([])
         self.update_location_rules_display()
+        self.update_tables_display()
+    
+    def new_location_key(self):
+        self.next_location_key += 1
+        return f"loc{self.next_location_key}"
     
-    def on_rules_frame_configure(self, event):
-        self.rules_canvas.configure(scrollregion=self.rules_canvas.bbox("all"))
+    def selected_index(self):
+        """Index of the selected location rule, or None"""
+        key = self.location_rules_list.selected_key()
+        if key in self.location_rule_keys:
+            return self.location_rule_keys.index(key)
+        return None
+    
+    def edit_selected(self):
+        idx = self.selected_index()
+        if idx is not None:
+            self.edit_location_rule(idx)
     
-    def on_rules_canvas_configure(self, event):
-        self.rules_canvas.itemconfig(self.rules_canvas_window, width=event.width)
+    def delete_selected(self):
+        idx = self.selected_index()
+        if idx is not None:
+            self.delete_location_rule(idx)
     
     def update_affected_patterns(self, pattern_rules):
         """Update display of patterns that contribute to location processing"""
-        # Clear existing widgets
-        for widget in self.affected_patterns_frame.winfo_children():
-            widget.destroy()
-        
-        location_enabled_rules = [rule for rule in pattern_rules if rule.location_enabled]
-        
-        if not location_enabled_rules:
-            tb.Label(self.affected_patterns_frame, 
-                    text="No patterns enabled for location processing", 
-                    foreground="#6c757d", font=("TkDefaultFont", 9, "italic")).pack(pady=20)
-            return
-        
-        for rule in location_enabled_rules:
-            pattern_frame = tb.Frame(self.affected_patterns_frame)
-            pattern_frame.pack(fill=tk.X, padx=5, pady=5)
-            
-            # Pattern display with highlighted selected part
-            pattern_display_frame = tb.Frame(pattern_frame)
-            pattern_display_frame.pack(fill=tk.X, pady=2)
-            
-            tb.Label(pattern_display_frame, text="Pattern:", font=("TkDefaultFont", 9)).pack(side=tk.LEFT)
+        rows = []
+        for rule in pattern_rules:
+            if not rule.location_enabled:
+                continue
             
-            parts = rule.pattern_template.split()
+            # Pattern with the selected wildcards marked
+            location_indices = rule.location_indices()
+            parts = []
             wildcard_idx = 0
-            
-            for part in parts:
+            for part in rule.pattern_template.split():
                 if part == "##":
-                    is_selected = wildcard_idx == rule.selected_part_index
-                    # Use regular tkinter Label for styling
-                    part_label = tk.Label(pattern_display_frame, text=f"#{wildcard_idx+1}",
-                                        background="#007bff" if is_selected else "#e9ecef",
-                                        foreground="white" if is_selected else "#495057",
-                                        font=("Courier", 9, "bold"), relief="raised", bd=1)
-                    part_label.pack(side=tk.LEFT, padx=1)
+                    parts.append(f"[#{wildcard_idx+1}]" if wildcard_idx in location_indices else f"#{wildcard_idx+1}")
                     wildcard_idx += 1
                 else:
-                    tk.Label(pattern_display_frame, text=part, 
-                           font=("Courier", 9), foreground="#495057").pack(side=tk.LEFT, padx=1)
-            
-            # Show which part is selected
-            selected_text = f"Location wildcard: #{rule.selected_part_index + 1}"
-            tb.Label(pattern_frame, text=selected_text, 
-                   font=("TkDefaultFont", 8), foreground="#007bff").pack(anchor="w")
-            
-            # Add separator
-            tb.Separator(pattern_frame, orient="horizontal").pack(fill=tk.X, pady=2)
+                    parts.append(part)
+            rows.append((f"rule{id(rule)}", (" ".join(parts), rule.location_label()), ()))
+        
+        self.affected_patterns_list.sync(rows, "No patterns enabled for location processing")
     
     def add_location_rule(self):
         """Add new location replacement rule"""
@@ -900,6 +1093,7 @@ class LocationRulesFrame(tb.LabelFrame):
         
         if find_text and replace_text:
             self.location_rules.append((find_text, replace_text))
+            self.location_rule_keys.append(self.new_location_key())
             self.update_location_rules_display()
             
             # Clear inputs
@@ -911,50 +1105,10 @@ class LocationRulesFrame(tb.LabelFrame):
             messagebox.showwarning("Warning", "Both find and replace text must be provided")
     
     def update_location_rules_display(self):
-        """Update display of location replacement rules"""
-        # Clear existing widgets
-        for widget in self.location_rules_frame.winfo_children():
-            widget.destroy()
-        
-        if not self.location_rules:
-            tb.Label(self.location_rules_frame, text="No location rules defined", 
-                   foreground="#6c757d", font=("TkDefaultFont", 9, "italic")).pack(pady=10)
-            self.on_rules_frame_configure(None)
-            return
-        
-        for idx, (find_text, replace_text) in enumerate(self.location_rules):
-            rule_frame = tb.Frame(self.location_rules_frame)
-            rule_frame.pack(fill=tk.X, padx=5, pady=2)
-            
-            # Rule display
-            content_frame = tb.Frame(rule_frame)
-            content_frame.pack(fill=tk.X)
-            
-            tb.Label(content_frame, text=f"{idx+1}.", width=3).pack(side=tk.LEFT, padx=2)
-            
-            # Use regular tkinter Labels for styling
-            find_label = tk.Label(content_frame, text=find_text, 
-                                background="#f8f9fa", font=("Courier", 9), 
-                                relief="sunken", bd=1, width=8)
-            find_label.pack(side=tk.LEFT, padx=2)
-            
-            tb.Label(content_frame, text="→").pack(side=tk.LEFT, padx=2)
-            
-            replace_label = tk.Label(content_frame, text=replace_text, 
-                                   background="#e3f2fd", font=("Courier", 9), 
-                                   relief="sunken", bd=1, width=12)
-            replace_label.pack(side=tk.LEFT, padx=2)
-            
-            # Action buttons
-            tb.Button(content_frame, text="Edit", 
-                     command=lambda i=idx: self.edit_location_rule(i)).pack(side=tk.RIGHT, padx=2)
-            tb.Button(content_frame, text="X", 
-                     command=lambda i=idx: self.delete_location_rule(i)).pack(side=tk.RIGHT, padx=2)
-            
-            # Add separator
-            tb.Separator(rule_frame, orient="horizontal").pack(fill=tk.X, pady=1)
-        
-        self.on_rules_frame_configure(None)
+        """Update the location rules list, changing only rows that differ (rows carry no position)"""
+        rows = [(key, (find_text, replace_text), ())
+                for key, (find_text, replace_text) in zip(self.location_rule_keys, self.location_rules)]
+        self.location_rules_list.sync(rows, "No location rules defined")
     
     def edit_location_rule(self, idx):
         """Edit an existing location rule"""
@@ -998,70 +1152,428 @@ class LocationRulesFrame(tb.LabelFrame):
         """Delete a location rule"""
         if idx < len(self.location_rules):
             del self.location_rules[idx]
+            del self.location_rule_keys[idx]
             self.update_location_rules_display()
             self.update_callback()
     
+    def import_table(self):
+        """Index a CSV (key,value) or symbol listing (address ... name) file as a location table"""
+        path = filedialog.askopenfilename(
+            title="Import Location Table",
+            filetypes=[("Location tables", "*.csv *.txt *.sym *.map"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        from hexengine.locations import LocationIndex
+        try:
+            table = LocationIndex.from_file(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to read location table: {str(e)}")
+            return
+        if not len(table):
+            messagebox.showwarning("Warning", "No hex keys found in the table")
+            return
+        self.location_tables.append(table)
+        self.update_tables_display()
+        self.update_callback()
+    
+    def clear_tables(self):
+        if self.location_tables:
+            self.location_tables = []
+            self.update_tables_display()
+            self.update_callback()
+    
+    def update_tables_display(self):
+        if self.location_tables:
+            names = ", ".join(f"{table.name} ({len(table):,})" for table in self.location_tables)
+            self.tables_label.config(text=f"Tables: {names}")
+        else:
+            self.tables_label.config(text="No tables imported")
+    
     def get_rules(self):
-        return self.location_rules
+        """Location rules followed by the imported tables; rules win over tables for the same key"""
+        return self.location_rules + self.location_tables
+    
+    def set_rules(self, location_rules):
+        """Replace the location rules and tables without notifying the callback"""
+        from hexengine.locations import LocationIndex
+        self.location_rules = [pair for pair in location_rules if not isinstance(pair, LocationIndex)]
+        self.location_tables = [table for table in location_rules if isinstance(table, LocationIndex)]
+        self.location_rule_keys = [self.new_location_key() for _ in self.location_rules]
+        self.update_location_rules_display()
+        self.update_tables_display()
 
 
 class OutputFrame(tb.LabelFrame):
     """Frame for displaying transformed output"""
+    PAGE_CHARS = 256 * 1024  # Output computed and inserted per scroll step in lazy mode
+    
     def __init__(self, parent, title="Output"):
         super().__init__(parent, text=title)
+        self.frame_title = title
         self.DEFAULT_COLOR = "#cc7000"
+        self.lazy_output = None  # LazyOutput still being paged in, or None once fully shown
+        self.loaded_chars = 0
+        self.load_pending = False
+        self.pattern_rules = None
+        self.page_tail = ""  # End of the last loaded page, searched again with the next one
         
         self.text_output = scrolledtext.ScrolledText(self, height=6, wrap=tk.WORD)
         self.text_output.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.text_output.config(state=tk.DISABLED)
+        # Watch scrolling so more lazy output is computed before the user reaches the end
+        # and highlights follow the visible region
+        self.text_output.config(yscrollcommand=self.on_output_scroll)
+        self.highlighter = ViewportHighlighter(self.text_output)
     
     def set_output(self, text, pattern_rules=None):
         """Set output text with optional highlighting"""
+        self.lazy_output = None
         self.text_output.config(state=tk.NORMAL)
         self.text_output.delete("1.0", tk.END)
         self.text_output.insert("1.0", text)
         
-        # Remove existing highlight tags
-        for tag in self.text_output.tag_names():
-            if tag.startswith("output_color_"):
-                self.text_output.tag_remove(tag, "1.0", tk.END)
+        # Deleting the text removed the old tags with it
+        self.highlighter.tagged = None
+        self.highlighter.set_ranges(HighlightRanges())
+        self.pattern_rules = pattern_rules
+        self.highlight_rules(text, 0)
+        self.text_output.config(state=tk.DISABLED)
+        self.config(text=self.frame_title)
+    
+    def set_lazy_output(self, lazy_output, pattern_rules=None):
+        """Show a LazyOutput, computing only the first page now and the rest as the user scrolls"""
+        self.set_output("", None)
+        self.lazy_output = lazy_output
+        self.pattern_rules = pattern_rules
+        self.loaded_chars = 0
+        self.page_tail = ""
+        self.load_more()
+    
+    def load_more(self):
+        """Append the next page of lazy output"""
+        self.load_pending = False
+        if self.lazy_output is None:
+            return
         
-        if pattern_rules:
-            for i, rule in enumerate(pattern_rules):
-                try:
-                    # Skip highlighting complex replacement templates
-                    replacement_text = rule.replacement
-                    if any(seq in replacement_text for seq in ['\\n', '\\t', '\\r', '{', '}', '#']):
-                        continue
-                    
-                    tag_name = f"output_color_{i}"
-                    if tag_name not in self.text_output.tag_names():
-                        self.text_output.tag_configure(tag_name, background=rule.color, 
-                                                     foreground="white", font=("TkDefaultFont", 10, "bold"))
-                    else:
-                        self.text_output.tag_configure(tag_name, background=rule.color)
-                    
-                    self.highlight_text(replacement_text, tag_name)
-                except:
-                    continue
+        text = self.lazy_output.segment(self.loaded_chars, self.loaded_chars + self.PAGE_CHARS)
+        previous_chars = self.loaded_chars
+        self.loaded_chars += len(text)
         
+        self.text_output.config(state=tk.NORMAL)
+        self.text_output.insert(tk.END + "-1c", text)
+        # Start a little before the new page so replacements split across pages still get their color
+        self.highlight_rules(self.page_tail + text, previous_chars - len(self.page_tail))
+        self.page_tail = text[-64:]
         self.text_output.config(state=tk.DISABLED)
+        
+        if self.lazy_output.length is not None and self.loaded_chars >= self.lazy_output.length:
+            self.lazy_output = None
+            self.config(text=self.frame_title)
+        else:
+            self.config(text=f"{self.frame_title} - {self.loaded_chars:,} of ~{self.lazy_output.estimated_length():,} characters")
+    
+    def on_output_scroll(self, first, last):
+        self.text_output.vbar.set(first, last)
+        self.highlighter.refresh()
+        if self.lazy_output is not None and not self.load_pending and float(last) > 0.9:
+            self.load_pending = True
+            self.after_idle(self.load_more)
     
-    def highlight_text(self, text_to_highlight, tag_name):
-        """Highlight all occurrences of text with specified tag"""
-        if not text_to_highlight or text_to_highlight.isspace():
+    def recolor_rules(self, pattern_rules):
+        """Apply changed rule colors to the highlight tags already in place"""
+        tag_names = self.text_output.tag_names()
+        for i, rule in enumerate(pattern_rules):
+            if f"output_color_{i}" in tag_names:
+                self.text_output.tag_configure(f"output_color_{i}", background=rule.color)
+    
+    def highlight_rules(self, text, offset):
+        """Color literal replacement texts of the rules found in text, which starts at offset"""
+        if not self.pattern_rules or not text:
             return
+        
+        for i, rule in enumerate(self.pattern_rules):
+            # Skip highlighting complex replacement templates
+            replacement_text = rule.replacement
+            if any(seq in replacement_text for seq in ['\\n', '\\t', '\\r', '{', '}', '#']):
+                continue
+            if not replacement_text or replacement_text.isspace():
+                continue
             
-        start_idx = "1.0"
-        while True:
-            start_idx = self.text_output.search(text_to_highlight, start_idx, 
-                                             stopindex=tk.END, exact=True)
-            if not start_idx:
-                break
-                
-            end_idx = f"{start_idx}+{len(text_to_highlight)}c"
-            self.text_output.tag_add(tag_name, start_idx, end_idx)
-            start_idx = end_idx
+            tag_name = f"output_color_{i}"
+            if tag_name not in self.text_output.tag_names():
+                self.text_output.tag_configure(tag_name, background=rule.color, 
+                                             foreground="white", font=("TkDefaultFont", 10, "bold"))
+            else:
+                self.text_output.tag_configure(tag_name, background=rule.color)
+            
+            self.find_highlights(text, offset, replacement_text, tag_name)
+        
+        # Tags already placed around the view miss the new ranges
+        self.highlighter.clear()
+        self.highlighter.refresh()
+    
+    def find_highlights(self, text, offset, text_to_highlight, tag_name):
+        """Record all occurrences of text_to_highlight; occurrences one space apart merge into one range"""
+        ranges = self.highlighter.ranges
+        length = len(text_to_highlight)
+        position = text.find(text_to_highlight)
+        while position != -1:
+            join_gap = 1 if position > 0 and text[position - 1] == ' ' else 0
+            ranges.add(tag_name, offset + position, offset + position + length, join_gap)
+            position = text.find(text_to_highlight, position + length)
+
+
+class CorpusSearchDialog(tb.Toplevel):
+    """Scan a folder of binaries with the current rules and query the results store"""
+    def __init__(self, parent, get_rules, open_callback):
+        super().__init__(parent)
+        self.title("Corpus Search")
+        self.geometry("800x500")
+        self.get_rules = get_rules
+        self.open_callback = open_callback  # Called with (file path, byte offset)
+        self.scan_thread = None
+        self.scan_result = None
+        
+        # Imported here so the scanner is only loaded when the dialog is used
+        from hexengine.corpus import CORPUS_DB_FILE
+        self.db_path = HexManipulator.app_settings.get('corpus_db', CORPUS_DB_FILE)
+        
+        top_frame = tb.Frame(self)
+        top_frame.pack(fill=tk.X, padx=10, pady=5)
+        self.db_label = tb.Label(top_frame, text=f"Store: {self.db_path}")
+        self.db_label.pack(side=tk.LEFT)
+        tb.Button(top_frame, text="Scan Folder...", command=self.scan_folder).pack(side=tk.RIGHT, padx=5)
+        
+        search_frame = tb.Frame(self)
+        search_frame.pack(fill=tk.X, padx=10, pady=5)
+        tb.Label(search_frame, text="Pattern:").pack(side=tk.LEFT)
+        self.pattern_var = tk.StringVar()
+        self.pattern_combo = tb.Combobox(search_frame, textvariable=self.pattern_var, width=30)
+        self.pattern_combo.pack(side=tk.LEFT, padx=5)
+        tb.Button(search_frame, text="Search", command=self.search).pack(side=tk.LEFT, padx=5)
+        self.status_label = tb.Label(search_frame, text="")
+        self.status_label.pack(side=tk.RIGHT)
+        
+        self.results = tb.Treeview(self, columns=("matches", "first"), show="tree headings")
+        self.results.heading("#0", text="File")
+        self.results.heading("matches", text="Matches")
+        self.results.heading("first", text="First Offset")
+        self.results.column("matches", width=80, anchor="e")
+        self.results.column("first", width=100, anchor="e")
+        self.results.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.results.bind("<Double-1>", self.open_selected)
+        
+        self.refresh_patterns()
+    
+    def open_store(self):
+        from hexengine.corpus import CorpusStore
+        return CorpusStore(self.db_path)
+    
+    def refresh_patterns(self):
+        """Offer the templates that have results in the store"""
+        try:
+            store = self.open_store()
+            try:
+                self.pattern_combo.config(values=store.indexed_patterns())
+            finally:
+                store.close()
+        except Exception as e:
+            self.status_label.config(text=f"Store error: {str(e)}")
+    
+    def scan_folder(self):
+        """Scan a folder in the background with the current pattern rules"""
+        rules = list(self.get_rules())
+        if not rules:
+            messagebox.showwarning("Warning", "No pattern rules to scan with", parent=self)
+            return
+        if self.scan_thread and self.scan_thread.is_alive():
+            return
+        
+        directory = filedialog.askdirectory(
+            title="Select Corpus Folder",
+            initialdir=HexManipulator.app_settings.get('binary_dir', os.path.expanduser('~')),
+            parent=self
+        )
+        if not directory:
+            return
+        
+        import threading
+        self.scan_result = None
+        self.status_label.config(text="Scanning...")
+        self.scan_thread = threading.Thread(target=self.run_scan, args=(directory, rules), daemon=True)
+        self.scan_thread.start()
+        self.after(200, self.poll_scan)
+    
+    def run_scan(self, directory, rules):
+        """Worker thread body; the store connection belongs to this thread"""
+        from hexengine.corpus import CorpusScanner
+        try:
+            store = self.open_store()
+            try:
+                self.scan_result = CorpusScanner(store, rules).scan(directory)
+            finally:
+                store.close()
+        except Exception as e:
+            self.scan_result = e
+    
+    def poll_scan(self):
+        if self.scan_thread.is_alive():
+            self.after(200, self.poll_scan)
+            return
+        
+        if isinstance(self.scan_result, Exception):
+            self.status_label.config(text=f"Scan failed: {str(self.scan_result)}")
+        else:
+            scanned, skipped, failed = self.scan_result
+            self.status_label.config(text=f"Scanned {scanned}, unchanged {skipped}, failed {failed}")
+        self.refresh_patterns()
+    
+    def search(self):
+        """List files containing the pattern, with their matches as children"""
+        self.results.delete(*self.results.get_children())
+        pattern = self.pattern_var.get().strip()
+        if not pattern:
+            return
+        
+        store = self.open_store()
+        try:
+            files = store.files_with_pattern(pattern)
+            for path, count, first_offset in files:
+                file_item = self.results.insert("", tk.END, text=path, values=(count, f"0x{first_offset:X}"))
+                for offset, _, wildcards in store.matches_in_file(path, pattern, limit=1000):
+                    self.results.insert(file_item, tk.END, text=wildcards or pattern, values=("", f"0x{offset:X}"))
+        finally:
+            store.close()
+        self.status_label.config(text=f"{len(files)} files")
+    
+    def open_selected(self, event=None):
+        """Open the selected file (or match) in the input pane"""
+        selection = self.results.selection()
+        if not selection:
+            return
+        
+        item = selection[0]
+        parent = self.results.parent(item)
+        file_item = parent or item
+        offset = int(self.results.item(item, "values")[1], 16)
+        self.open_callback(self.results.item(file_item, "text"), offset)
+
+
+class RuleSetCompareDialog(tb.Toplevel):
+    """Outputs of the current rules and of rule files side by side, matched in one scan, with their differences"""
+    MAX_DIFF_ROWS = 5000  # Differences listed per comparison; the summary counts all of them
+    
+    def __init__(self, parent, model, processor, goto_callback):
+        super().__init__(parent)
+        self.title("Compare Rule Sets")
+        self.geometry("1100x650")
+        self.model = model
+        self.processor = processor
+        self.goto_callback = goto_callback  # Called with a byte offset of the input
+        self.rule_files = []  # (file name, rules) compared with the current rules
+        self.output_frames = []
+        self.differences = {}  # Diff row key -> MatchDifference
+        
+        top_frame = tb.Frame(self)
+        top_frame.pack(fill=tk.X, padx=10, pady=5)
+        tb.Button(top_frame, text="Add Rule Files...", command=self.add_rule_files).pack(side=tk.LEFT, padx=2)
+        tb.Button(top_frame, text="Clear", command=self.clear_rule_files).pack(side=tk.LEFT, padx=2)
+        tb.Button(top_frame, text="Refresh", command=self.compare).pack(side=tk.LEFT, padx=2)
+        self.status_label = tb.Label(top_frame, text="")
+        self.status_label.pack(side=tk.RIGHT)
+        
+        paned = tk.PanedWindow(self, orient=tk.VERTICAL)
+        paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        # One final output per rule set, left to right
+        self.outputs_pane = tk.PanedWindow(paned, orient=tk.HORIZONTAL)
+        paned.add(self.outputs_pane, stretch="always", minsize=150)
+        
+        self.diff_list = KeyedTreeList(paned, [("Offset", 90), ("Bytes", 50), ("Compared with", 140),
+                                               ("Difference", 90), ("Current rule", 200), ("Other rule", 200)], height=8)
+        paned.add(self.diff_list, stretch="always", minsize=100)
+        self.diff_list.tree.bind("<Double-1>", self.goto_selected)
+        
+        self.compare()
+    
+    def add_rule_files(self):
+        file_paths = filedialog.askopenfilenames(
+            title="Add Rule Sets to Compare",
+            filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")],
+            initialdir=HexManipulator.app_settings.get('rules_dir', os.path.expanduser('~')),
+            parent=self
+        )
+        for file_path in file_paths:
+            try:
+                self.rule_files.append((os.path.basename(file_path), load_rules_file(file_path)))
+            except Exception as e:
+                messagebox.showerror("Load Error", f"Error loading rules: {str(e)}", parent=self)
+        if file_paths:
+            self.compare()
+    
+    def clear_rule_files(self):
+        self.rule_files = []
+        self.compare()
+    
+    def compare(self):
+        """Match every rule set in one scan, then show each output and its differences from the current rules"""
+        for frame in self.output_frames:
+            self.outputs_pane.forget(frame)
+            frame.destroy()
+        self.output_frames = []
+        self.differences = {}
+        
+        if not self.model.input_text:
+            self.status_label.config(text="")
+            self.diff_list.sync([], "No input")
+            return
+        
+        rule_sets = [("Current rules", list(self.model.pattern_rules))] + self.rule_files
+        try:
+            input_data = HexLayout.canonicalize(self.model.input_text)
+            text_free = self.processor.exceeds_budget(HexLayout.text_to_byte(len(input_data) + 1))
+            if text_free:
+                input_data = HexLayout.to_bytes(input_data)
+            source, batches = self.processor.prepare_lazy_sets(input_data, [rules for _, rules in rule_sets], text_free)
+        except ValueError as e:
+            self.status_label.config(text=f"Invalid input: {str(e)}")
+            self.diff_list.sync([], "Invalid input")
+            return
+        
+        for (name, rules), rendered in zip(rule_sets, batches):
+            frame = OutputFrame(self.outputs_pane, f"{name} - {len(rendered.accepted):,} replacements")
+            self.outputs_pane.add(frame, stretch="always", minsize=150)
+            frame.set_lazy_output(self.processor.lazy_final(source, rendered, self.model.location_rules), rules)
+            self.output_frames.append(frame)
+        
+        from hexengine.compare import MatchSetDiff
+        rows = []
+        summaries = []
+        first = batches[0]
+        for number, ((name, _), rendered) in enumerate(zip(rule_sets[1:], batches[1:]), 1):
+            diff = MatchSetDiff(first.table, rendered.table, first.accepted, rendered.accepted)
+            summaries.append(f"{name}: {diff.summary()}")
+            for row, difference in enumerate(diff.differences[:self.MAX_DIFF_ROWS]):
+                key = f"diff{number}_{row}"
+                self.differences[key] = difference
+                rows.append((key, (f"0x{difference.byte_offset:X}", difference.byte_length, name, difference.kind,
+                                   self.rule_label(difference.first), self.rule_label(difference.second)), ()))
+        
+        self.diff_list.sync(rows, "Add rule files to compare with the current rules" if not self.rule_files
+                            else "The rule sets replace the same matches")
+        self.status_label.config(text="; ".join(summaries))
+    
+    @staticmethod
+    def rule_label(view):
+        if view is None:
+            return ""
+        return f"{view.rule.pattern_template} → {view.rule.replacement}"
+    
+    def goto_selected(self, event=None):
+        difference = self.differences.get(self.diff_list.selected_key())
+        if difference is not None:
+            self.goto_callback(difference.byte_offset)
 
 
 class HexManipulator(tb.Window):
@@ -1072,7 +1584,10 @@ class HexManipulator(tb.Window):
         'window_is_maximized': False,
         'pane_positions': [],
         'binary_dir': os.path.expanduser('~'),
-        'rules_dir': os.path.expanduser('~')
+        'rules_dir': os.path.expanduser('~'),
+        'memory_budget_mb': 1024,
+        'track_memory': False,
+        'refresh_time_limit': 5.0  # Seconds a refresh may take before loading a file asks first
     }
     
     @classmethod
@@ -1089,6 +1604,7 @@ class HexManipulator(tb.Window):
     def save_settings(cls):
         """Save application settings to file"""
         try:
+            ensure_app_data_dir()
             with open(SETTINGS_FILE, 'wb') as f:
                 pickle.dump(cls.app_settings, f)
         except Exception as e:
@@ -1113,14 +1629,41 @@ class HexManipulator(tb.Window):
         else:
             self.geometry('1200x800')
         
-        self.processor = HexProcessor()
+        # Chunk cache lets a rebuilt binary re-match only the regions that changed;
+        # it is read once the window is up, or before the first match if that comes sooner
+        self.chunk_cache = ChunkMatchCache()
+        self.chunk_cache_loaded = False
+        self.processor = HexProcessor(chunk_cache=self.chunk_cache,
+                                      memory_budget=self.app_settings.get('memory_budget_mb', 1024) * 1024 * 1024)
+        
+        # Edits mark parts of the model dirty; one idle-time flush refreshes only the affected views
+        self.model = DocumentModel(on_dirty=lambda: self.after_idle(self.flush_model))
+        self.pipeline = DocumentPipeline(self.processor)
         self.create_ui()
+        self.after_idle(self.load_chunk_cache)
         
         # Save settings when closing
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
     
     def create_ui(self):
         """Create the enhanced application UI"""
+        menubar = tk.Menu(self)
+        session_menu = tk.Menu(menubar, tearoff=0)
+        session_menu.add_command(label="Open Session...", command=self.open_session)
+        session_menu.add_command(label="Save Session...", command=self.save_session)
+        menubar.add_cascade(label="Session", menu=session_menu)
+        
+        compare_menu = tk.Menu(menubar, tearoff=0)
+        compare_menu.add_command(label="Compare Rule Sets...", command=self.open_rule_set_compare)
+        menubar.add_cascade(label="Compare", menu=compare_menu)
+        
+        # Profiles cover the whole refresh, including the Tk tagging that runs at idle time
+        self.profile_var = tk.BooleanVar(value=False)
+        profile_menu = tk.Menu(menubar, tearoff=0)
+        profile_menu.add_checkbutton(label="Profile Refreshes", variable=self.profile_var)
+        menubar.add_cascade(label="Profile", menu=profile_menu)
+        self.config(menu=menubar)
+        
         main_frame = tb.Frame(self)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
@@ -1128,16 +1671,22 @@ class HexManipulator(tb.Window):
         self.paned_window = tk.PanedWindow(main_frame, orient=tk.VERTICAL)
         self.paned_window.pack(fill=tk.BOTH, expand=True)
         
-        # Input frame
-        self.input_frame = InputFrame(self.paned_window, self.update_output)
-        self.paned_window.add(self.input_frame, stretch="always", minsize=120)
+        # Input frame with its overview minimap alongside
+        input_pane = tk.PanedWindow(self.paned_window, orient=tk.HORIZONTAL)
+        self.paned_window.add(input_pane, stretch="always", minsize=120)
+        self.input_frame = InputFrame(input_pane, self.on_input_change, self.preflight_input)
+        input_pane.add(self.input_frame, stretch="always", minsize=300)
+        self.overview_frame = OverviewFrame(input_pane, self.input_frame.goto_byte)
+        input_pane.add(self.overview_frame, stretch="never", minsize=130)
+        self.input_frame.scroll_callback = self.overview_frame.set_viewport
         
         # Pattern rules frame
-        self.pattern_rules_frame = PatternRulesFrame(self.paned_window, self.update_output)
+        self.pattern_rules_frame = PatternRulesFrame(self.paned_window, self.on_pattern_rules_change,
+                                                     self.open_corpus_search)
         self.paned_window.add(self.pattern_rules_frame, stretch="always", minsize=200)
         
         # Location rules frame
-        self.location_rules_frame = LocationRulesFrame(self.paned_window, self.update_output)
+        self.location_rules_frame = LocationRulesFrame(self.paned_window, self.on_location_rules_change)
         self.paned_window.add(self.location_rules_frame, stretch="always", minsize=150)
         
         # Intermediate output frame
@@ -1148,6 +1697,34 @@ class HexManipulator(tb.Window):
         self.final_output_frame = OutputFrame(self.paned_window, "Final Output (After Locations)")
         self.paned_window.add(self.final_output_frame, stretch="always", minsize=100)
         
+        # Status bar with per-stage timings and memory budget controls
+        status_frame = tb.Frame(main_frame)
+        status_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.track_memory_var = tk.BooleanVar(value=self.app_settings.get('track_memory', False))
+        tb.Checkbutton(status_frame, text="Track memory", variable=self.track_memory_var,
+                       command=self.on_accounting_change).pack(side=tk.RIGHT, padx=5)
+        
+        self.budget_var = tk.IntVar(value=self.app_settings.get('memory_budget_mb', 1024))
+        budget_spinbox = tb.Spinbox(status_frame, from_=64, to=65536, increment=64, width=7,
+                                    textvariable=self.budget_var, command=self.on_accounting_change)
+        budget_spinbox.pack(side=tk.RIGHT, padx=2)
+        budget_spinbox.bind("<Return>", lambda e: self.on_accounting_change())
+        tb.Label(status_frame, text="Memory budget (MB):").pack(side=tk.RIGHT, padx=(15, 2))
+        
+        self.status_label = tb.Label(status_frame, text="", anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        # Each view refreshes only when the parts of the model it shows change
+        model = self.model
+        model.subscribe({model.PATTERNS, model.LOCATIONS},
+                        lambda dirty: self.location_rules_frame.update_affected_patterns(model.pattern_rules))
+        model.subscribe({model.INPUT, model.PATTERNS, model.LOCATIONS}, self.refresh_outputs)
+        # Highlights and the overview reuse the table the outputs were just matched into
+        model.subscribe({model.INPUT, model.PATTERNS}, self.refresh_input_highlight)
+        model.subscribe({model.INPUT, model.PATTERNS}, self.refresh_overview)
+        model.subscribe({model.DISPLAY}, self.refresh_colors)
+        
         # Restore pane positions if available
         if self.app_settings.get('pane_positions') and len(self.app_settings['pane_positions']) >= 4:
             try:
@@ -1158,31 +1735,205 @@ class HexManipulator(tb.Window):
             except Exception as e:
                 print(f"Error restoring pane positions: {str(e)}")
     
-    def update_output(self):
-        """Process input and update all outputs when changes occur"""
-        input_text = self.input_frame.get_input()
-        pattern_rules = self.pattern_rules_frame.get_rules()
-        location_rules = self.location_rules_frame.get_rules()
+    def on_input_change(self):
+        self.model.set_input(self.input_frame.get_input())
+    
+    def on_pattern_rules_change(self, part=DocumentModel.PATTERNS):
+        self.model.set_pattern_rules(self.pattern_rules_frame.get_rules(), part)
+    
+    def on_location_rules_change(self):
+        self.model.set_location_rules(self.location_rules_frame.get_rules())
+    
+    def load_chunk_cache(self):
+        """Read the saved chunk cache the first time it is needed"""
+        if not self.chunk_cache_loaded:
+            self.chunk_cache_loaded = True
+            self.chunk_cache.load(CHUNK_CACHE_FILE)
+    
+    def flush_model(self):
+        """Refresh the views whose inputs changed since the last flush"""
+        self.load_chunk_cache()
+        profiler = StageProfiler(trace_memory=self.track_memory_var.get())
+        self.processor.profiler = profiler
+        
+        capture = None
+        if self.profile_var.get():
+            from hexengine.profiling import ProfileCapture
+            capture = ProfileCapture("refresh")
+        with capture or nullcontext():
+            with profiler.stage("refresh"):
+                self.model.flush()
+            if capture is not None:
+                self.update_idletasks()  # Viewport highlights are tagged at idle time
+        
+        mode = " (matched from bytes, over budget)" if self.pipeline.text_free else ""
+        status = profiler.summary() + mode
+        if capture is not None and capture.folded_path:
+            status += f" | profile: {capture.summary()}, saved as {os.path.basename(capture.folded_path)}"
+        self.status_label.config(text=status)
+    
+    def refresh_input_highlight(self, dirty):
+        with self.processor.stage("highlight"):
+            batches = self.pipeline.batches
+            table = batches.table if batches is not None else None
+            self.input_frame.highlight_patterns(self.model.pattern_rules, table, self.model.INPUT in dirty)
+    
+    def refresh_outputs(self, dirty):
+        """Rebuild the lazy outputs that depend on what changed"""
+        try:
+            intermediate_changed, final_changed = self.pipeline.refresh(self.model, dirty)
+        except ValueError as e:
+            self.intermediate_output_frame.set_output(f"Invalid input: {str(e)}", None)
+            self.final_output_frame.set_output("", None)
+            return
+        
+        pattern_rules = self.model.pattern_rules
+        with self.processor.stage("display"):
+            if self.pipeline.intermediate is None:
+                # Clear outputs
+                self.intermediate_output_frame.set_output("", None)
+                self.final_output_frame.set_output("", None)
+                return
+            
+            # Panes compute only their first page now and the rest on scroll
+            if intermediate_changed:
+                self.intermediate_output_frame.set_lazy_output(self.pipeline.intermediate, pattern_rules)
+            if final_changed:
+                self.final_output_frame.set_lazy_output(self.pipeline.final, pattern_rules)
+    
+    def refresh_overview(self, dirty):
+        """Summarize a new input chunk by chunk; rule changes only recount the matches per chunk"""
+        pipeline = self.pipeline
+        if pipeline.batches is None:
+            self.overview_frame.set_summaries(None)
+            return
         
-        # Update location rules display with current pattern rules
-        self.location_rules_frame.update_affected_patterns(pattern_rules)
+        with self.processor.stage("overview"):
+            summaries = self.overview_frame.summaries
+            same_input = DocumentModel.INPUT not in dirty and summaries is not None
+            if not same_input:
+                from hexengine.overview import ChunkSummaries
+                data = pipeline.source if pipeline.text_free else HexLayout.to_bytes(pipeline.source)
+                summaries = ChunkSummaries(data)
+            summaries.set_matches(pipeline.batches.table)
+            self.overview_frame.set_summaries(summaries, keep_view=same_input)
+    
+    def refresh_colors(self, dirty):
+        """Color-only changes retag the existing highlights"""
+        pattern_rules = self.model.pattern_rules
+        self.input_frame.recolor_patterns(pattern_rules)
+        self.intermediate_output_frame.recolor_rules(pattern_rules)
+        self.final_output_frame.recolor_rules(pattern_rules)
+    
+    def on_accounting_change(self):
+        """Apply the memory budget and tracking settings and refresh"""
+        try:
+            budget_mb = max(int(self.budget_var.get()), 1)
+        except (tk.TclError, ValueError):
+            return
+        self.app_settings['memory_budget_mb'] = budget_mb
+        self.app_settings['track_memory'] = self.track_memory_var.get()
+        self.processor.memory_budget = budget_mb * 1024 * 1024
+        # The budget decides how the input is matched, so match again
+        self.pipeline.invalidate()
+        self.model.mark(DocumentModel.INPUT)
+    
+    def preflight_input(self, data):
+        """Estimate a large file from samples before loading it; asks first if it would exceed the limits"""
+        from hexengine.estimate import CostEstimator
+        estimator = CostEstimator(self.processor)
+        if len(data) <= estimator.sample_bytes:
+            return True  # Small enough that a refresh costs less than estimating
+        
+        estimate = estimator.estimate(data, self.model.pattern_rules, self.model.location_rules, trace_memory=False)
+        problems = estimate.problems(self.processor.memory_budget, self.app_settings.get('refresh_time_limit', 5.0))
+        if not problems:
+            return True
+        return messagebox.askyesno("Large Input", estimate.summary() + "\n\n" + "\n".join(problems) + "\n\nLoad anyway?")
+    
+    def save_session(self):
+        """Save input reference, rules and match results so the workspace reopens without matching"""
+        self.model.flush()  # The match table must be that of the current rules
+        pipeline = self.pipeline
+        if pipeline.batches is None:
+            messagebox.showwarning("Warning", "Nothing to save: the input is empty")
+            return
+        
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+        file_path = filedialog.asksaveasfilename(
+            title="Save Session",
+            defaultextension=".hxsession",
+            filetypes=[("Session Files", "*.hxsession"), ("All Files", "*.*")],
+            initialdir=self.app_settings.get('sessions_dir', SESSIONS_DIR)
+        )
+        if not file_path:
+            return
         
-        # Highlight patterns in input
-        if pattern_rules:
-            self.input_frame.highlight_patterns(pattern_rules)
+        try:
+            self.app_settings['sessions_dir'] = os.path.dirname(file_path)
+            self.save_settings()
+            
+            from hexengine.session import SessionSnapshot
+            input_data = pipeline.source if pipeline.text_free else HexLayout.to_bytes(pipeline.source)
+            snapshot = SessionSnapshot.capture(self.model.pattern_rules, self.model.location_rules,
+                                               pipeline.batches.table, pipeline.batches.accepted,
+                                               {"intermediate": pipeline.intermediate, "final": pipeline.final},
+                                               input_data, self.input_frame.source_path)
+            snapshot.save(file_path)
+            self.status_label.config(text=f"Session saved to {os.path.basename(file_path)}")
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Error saving session: {str(e)}")
+    
+    def open_session(self):
+        """Restore a saved session; its match table is used as is, so nothing is matched again"""
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+        file_path = filedialog.askopenfilename(
+            title="Open Session",
+            filetypes=[("Session Files", "*.hxsession"), ("All Files", "*.*")],
+            initialdir=self.app_settings.get('sessions_dir', SESSIONS_DIR)
+        )
+        if not file_path:
+            return
         
-        if input_text:
-            # Process with clean architecture
-            intermediate_result, final_result = self.processor.process_hex_data(
-                input_text, pattern_rules, location_rules)
+        try:
+            self.app_settings['sessions_dir'] = os.path.dirname(file_path)
+            self.save_settings()
             
-            # Update both output frames
-            self.intermediate_output_frame.set_output(intermediate_result, pattern_rules)
-            self.final_output_frame.set_output(final_result, pattern_rules)
-        else:
-            # Clear outputs
-            self.intermediate_output_frame.set_output("", None)
-            self.final_output_frame.set_output("", None)
+            from hexengine.session import SessionSnapshot
+            snapshot = SessionSnapshot.load(file_path)
+            problem = snapshot.source_problem()
+            if problem:
+                messagebox.showerror("Open Error", f"{problem}; the saved matches no longer apply.")
+                return
+            hex_str = HexLayout.from_bytes(snapshot.read_input())
+        except Exception as e:
+            messagebox.showerror("Open Error", f"Error opening session: {str(e)}")
+            return
+        
+        self.input_frame.set_input(hex_str, snapshot.source_path)
+        self.pattern_rules_frame.set_rules(snapshot.pattern_rules)
+        self.location_rules_frame.set_rules(snapshot.location_rules)
+        
+        self.model.set_input(hex_str)
+        self.model.set_pattern_rules(snapshot.pattern_rules)
+        self.model.set_location_rules(snapshot.location_rules)
+        self.pipeline.restore(self.model, snapshot.table, snapshot.accepted, snapshot.checkpoints)
+    
+    def open_corpus_search(self):
+        """Show the corpus search dialog for the current pattern rules"""
+        CorpusSearchDialog(self, self.pattern_rules_frame.get_rules, self.open_corpus_result)
+    
+    def open_rule_set_compare(self):
+        """Compare the current rules with rule files on the current input"""
+        RuleSetCompareDialog(self, self.model, self.processor, self.input_frame.goto_byte)
+    
+    def open_corpus_result(self, file_path, byte_offset):
+        """Load a file found by corpus search and jump to the match"""
+        try:
+            if self.input_frame.load_file(file_path):
+                self.input_frame.goto_byte(byte_offset)
+        except Exception as e:
+            messagebox.showerror("Import Error", f"Error importing file: {str(e)}")
     
     def on_closing(self):
         """Save settings and close the application"""
@@ -1202,6 +1953,8 @@ class HexManipulator(tb.Window):
         
         # Save all settings
         self.save_settings()
+        if self.chunk_cache_loaded:  # Otherwise nothing was matched and the saved cache stands
+            self.chunk_cache.save(CHUNK_CACHE_FILE)
         
         # Close the window
         self.destroy()
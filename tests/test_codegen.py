@@ -0,0 +1,101 @@
+import random
+import unittest
+
+from hexengine import HexProcessor
+from hexengine.backends import CodegenBackend, BytesRegexBackend, TextRegexBackend, parse_fixed_template
+from hexengine.layout import HexLayout, HexBuffer
+from hexengine.rules import SimplePatternRule
+from hexengine.table import MatchTable
+
+
+def table_rows(table):
+    """Sorted (rule id, start, end, wildcard bytes) of every row"""
+    return sorted((table.rule_ids[index], table.starts[index], table.ends[index], table.wildcard_bytes(index))
+                  for index in range(len(table)))
+
+
+def random_case(rnd, size):
+    """Templates repeating a few literal bytes, and an input with runs of those bytes planted in it"""
+    alphabet = rnd.sample(range(256), 3)  # Few distinct bytes make overlapping and adjacent hits common
+    templates = []
+    for _ in range(rnd.randint(1, 6)):
+        parts = [("##" if rnd.random() < 0.3 else f"{rnd.choice(alphabet):02X}") for _ in range(rnd.randint(1, 6))]
+        if all(part == "##" for part in parts):
+            parts[0] = f"{alphabet[0]:02X}"
+        templates.append(" ".join(parts))
+    
+    data = bytearray(rnd.randbytes(size))
+    for _ in range(200):
+        # Many runs straddle the end of the first verification window
+        if rnd.random() < 0.5:
+            position = CodegenBackend.VERIFY_BYTES + rnd.randint(-64, 64)
+        else:
+            position = rnd.randrange(size - 16)
+        run = bytes(rnd.choice(alphabet) for _ in range(rnd.randint(2, 16)))
+        data[position:position + len(run)] = run
+    return templates, bytes(data)
+
+
+class CodegenAgreementTest(unittest.TestCase):
+    """Generated matchers find the same rows as both regex backends"""
+    TRIALS = 50
+    SIZE = 200 * 1024
+    
+    def test_random_templates(self):
+        rnd = random.Random(0)
+        for trial in range(self.TRIALS):
+            templates, data = random_case(rnd, self.SIZE)
+            rules = [SimplePatternRule(template, "") for template in templates]
+            results = {}
+            for backend in (CodegenBackend(verify=False), BytesRegexBackend(), TextRegexBackend()):
+                table = MatchTable(rules)
+                buffer = HexBuffer(data=data) if backend.name != "regex" else HexBuffer(text=HexLayout.from_bytes(data))
+                backend.add_matches(table, buffer, range(len(rules)))
+                results[backend.name] = table_rows(table)
+            with self.subTest(trial=trial, templates=templates):
+                self.assertEqual(results["codegen"], results["bytes"])
+                self.assertEqual(results["codegen"], results["regex"])
+
+
+class CodegenVerificationTest(unittest.TestCase):
+    """A generated matcher that disagrees with the regex is rejected and reported"""
+    def test_windows_cover_large_inputs(self):
+        backend = CodegenBackend()
+        size = 50 * 1024 * 1024
+        windows = backend.verify_windows(size)
+        self.assertEqual(len(windows), backend.VERIFY_WINDOWS)
+        self.assertEqual(windows[0][0], 0)
+        self.assertEqual(windows[-1][1], size)
+        self.assertEqual(backend.verify_windows(1000), [(0, 1000)])
+    
+    def test_wrong_hits_past_first_window(self):
+        # Hits only near the end of the input, past the first window
+        data = bytes(4 * 1024 * 1024 - 1024) + bytes([1, 2]) * 512
+        templates = [parse_fixed_template("01 02")]
+        _, function = CodegenBackend.compiler.compile(templates, data)
+        backend = CodegenBackend()
+        self.assertTrue(backend.matches_regex(function, templates, data))
+        
+        def missing(sample):
+            # Finds nothing, as a matcher wrong only on content deep into the input would there
+            return [([], b'') for _ in templates]
+        
+        self.assertTrue(backend.matches_regex(missing, templates, data[:backend.VERIFY_BYTES]))
+        self.assertFalse(backend.matches_regex(missing, templates, data))
+    
+    def test_rejection_shown_in_last_backend(self):
+        data = bytes(range(256)) * 1024
+        rules = [SimplePatternRule("10 11 ## 13", "")]
+        fingerprint, _ = CodegenBackend.compiler.compile([parse_fixed_template(rules[0].pattern_template)], data)
+        CodegenBackend.compiler.rejected.add(fingerprint)
+        try:
+            processor = HexProcessor(backend="codegen")
+            table = processor.match_buffer(HexBuffer(data=data), rules)
+        finally:
+            CodegenBackend.compiler.rejected.discard(fingerprint)
+        self.assertIn("rejected", processor.last_backend)
+        self.assertEqual(len(table), 1024)  # Found by the regex fallback
+
+
+if __name__ == "__main__":
+    unittest.main()